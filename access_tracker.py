@@ -0,0 +1,156 @@
+"""
+Batched MediaBlob access accounting
+Media reads bump in-memory counters; a background thread writes them out
+in one executemany UPDATE per interval instead of a commit per read.
+"""
+import atexit
+import logging
+import os
+import random
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class AccessTracker:
+    """Collects access counts and last-access times and flushes them on a timer
+
+    With sample_rate N > 1 the tracker runs in approximate mode: only about
+    one read in N is recorded, and it counts as N accesses, so hot assets
+    cost almost nothing to track while their totals stay statistically right.
+    """
+
+    def __init__(self, flush_interval=30, sample_rate=1, max_pending=100000):
+        self.flush_interval = flush_interval
+        self.sample_rate = max(1, int(sample_rate))
+        self.max_pending = max_pending
+        self.app = None
+        self._counts = {}
+        self._last_access = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushed_rows = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a tracker from MEDIA_ACCESS_* environment variables"""
+        return cls(
+            flush_interval=float(os.getenv('MEDIA_ACCESS_FLUSH_INTERVAL', '30')),
+            sample_rate=int(os.getenv('MEDIA_ACCESS_SAMPLE_RATE', '1'))
+        )
+
+    def init_app(self, app):
+        """Bind the Flask app whose database the counters are flushed to"""
+        self.app = app
+        atexit.register(self.stop)
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def record(self, blob_id):
+        """Count one read of a MediaBlob; never touches the database"""
+        if blob_id is None:
+            return
+        increment = 1
+        if self.sample_rate > 1:
+            if random.random() >= 1.0 / self.sample_rate:
+                return
+            increment = self.sample_rate
+
+        if self.app is None:
+            # Scripts that never called init_app: bind lazily to the active app
+            from flask import current_app, has_app_context
+            if has_app_context():
+                self.app = current_app._get_current_object()
+
+        with self._lock:
+            if blob_id not in self._counts and len(self._counts) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._counts[blob_id] = self._counts.get(blob_id, 0) + increment
+            self._last_access[blob_id] = datetime.utcnow()
+
+        self._ensure_started()
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+    def flush(self):
+        """Write pending counters in a single batched UPDATE; returns rows written"""
+        with self._lock:
+            if not self._counts:
+                return 0
+            counts, self._counts = self._counts, {}
+            last_access, self._last_access = self._last_access, {}
+
+        if self.app is None:
+            logger.warning(f"[ACCESS] No app bound, discarding {len(counts)} pending access counters")
+            return 0
+
+        rows = [
+            {'b_id': blob_id, 'b_count': count, 'b_last': last_access[blob_id]}
+            for blob_id, count in counts.items()
+        ]
+        try:
+            from sqlalchemy import bindparam, func, update
+            from models import MediaBlob, db
+
+            table = MediaBlob.__table__
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam('b_id'))
+                .values(
+                    access_count=func.coalesce(table.c.access_count, 0) + bindparam('b_count'),
+                    last_accessed=bindparam('b_last')
+                )
+            )
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(stmt, rows)
+            self.flushed_rows += len(rows)
+            return len(rows)
+        except Exception as e:
+            logger.error(f"[ACCESS] Failed to flush {len(rows)} access counters: {e}")
+            # Put the counters back so the next flush retries them
+            with self._lock:
+                for blob_id, count in counts.items():
+                    self._counts[blob_id] = self._counts.get(blob_id, 0) + count
+                    self._last_access.setdefault(blob_id, last_access[blob_id])
+            return 0
+
+    def stop(self):
+        """Stop the flusher and write whatever is still pending"""
+        self._stop.set()
+        self.flush()
+
+    def get_stats(self):
+        with self._lock:
+            pending = len(self._counts)
+        return {
+            'pending': pending,
+            'flushed_rows': self.flushed_rows,
+            'dropped': self.dropped,
+            'flush_interval': self.flush_interval,
+            'sample_rate': self.sample_rate
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='media-access-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+
+# Global tracker instance
+access_tracker = AccessTracker.from_env()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Add blob store columns to media_blobs and move existing BLOBs to disk
+Rows keep their metadata; media_data is cleared once the bytes are in the blob store
+"""
+
+import os
+import sys
+from sqlalchemy import inspect, text
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from blob_store import BACKEND_FILESYSTEM, blob_store
+from models import MediaBlob
+
+NEW_COLUMNS = {
+    "content_key": "VARCHAR(80) NULL",
+    "storage_backend": "VARCHAR(20) NULL",
+}
+
+BATCH_SIZE = 50
+
+
+def make_media_data_nullable():
+    """Allow media_data to be NULL for rows stored in the blob store"""
+    dialect = db.engine.dialect.name
+    if dialect == "mssql":
+        db.session.execute(text("ALTER TABLE media_blobs ALTER COLUMN media_data VARBINARY(MAX) NULL"))
+    elif dialect == "postgresql":
+        db.session.execute(text("ALTER TABLE media_blobs ALTER COLUMN media_data DROP NOT NULL"))
+    elif dialect == "mysql":
+        db.session.execute(text("ALTER TABLE media_blobs MODIFY media_data LONGBLOB NULL"))
+    else:
+        # SQLite cannot alter constraints; rows are moved with an empty payload instead
+        print("  [SKIP] media_data nullability unchanged on SQLite")
+        return False
+    print("  [OK] media_data is now nullable")
+    return True
+
+
+def move_blobs_to_store(nullable):
+    """Copy media_data into the blob store in id-ordered batches"""
+    moved = 0
+    last_id = 0
+    while True:
+        ids = [
+            row.id
+            for row in db.session.query(MediaBlob.id)
+            .filter(MediaBlob.id > last_id)
+            .filter(db.or_(MediaBlob.storage_backend.is_(None), MediaBlob.storage_backend != BACKEND_FILESYSTEM))
+            .order_by(MediaBlob.id)
+            .limit(BATCH_SIZE)
+        ]
+        if not ids:
+            break
+
+        for blob_id in ids:
+            blob = db.session.get(MediaBlob, blob_id)
+            if blob.media_data:
+                key, sha, _ = blob_store.put_bytes(blob.media_data, owner_id=blob.user_id)
+                blob.content_key = key
+                blob.file_hash = blob.file_hash or sha
+                blob.storage_backend = BACKEND_FILESYSTEM
+                blob.media_data = None if nullable else b""
+                moved += 1
+
+        db.session.commit()
+        db.session.expunge_all()
+        last_id = ids[-1]
+        print(f"  ... moved {moved} blobs")
+
+    return moved
+
+
+def add_blob_store_columns(move=True):
+    """Add content_key/storage_backend and optionally move BLOBs out of the database"""
+
+    print("Adding blob store columns to media_blobs...")
+
+    with app.app_context():
+        try:
+            columns = [col["name"] for col in inspect(db.engine).get_columns("media_blobs")]
+            for name, ddl in NEW_COLUMNS.items():
+                if name not in columns:
+                    print(f"Adding {name} column...")
+                    db.session.execute(text(f"ALTER TABLE media_blobs ADD {name} {ddl}"))
+                    print(f"  [OK] {name} column added")
+                else:
+                    print(f"  [SKIP] {name} column already exists")
+
+            if "content_key" not in columns:
+                db.session.execute(
+                    text("CREATE INDEX ix_media_blobs_content_key ON media_blobs (content_key)")
+                )
+                print("  [OK] content_key index created")
+
+            nullable = make_media_data_nullable()
+            db.session.execute(
+                text("UPDATE media_blobs SET storage_backend = 'database' WHERE storage_backend IS NULL")
+            )
+            db.session.commit()
+
+            if move:
+                moved = move_blobs_to_store(nullable)
+                print(f"  [OK] Moved {moved} blobs to {blob_store.root}")
+
+            print("\n[SUCCESS] Database schema updated successfully!")
+
+        except Exception as e:
+            print(f"\n[ERROR] Failed to update schema: {e}")
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    add_blob_store_columns(move="--no-move" not in sys.argv)
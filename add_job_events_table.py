@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Create the append-only job_events table used for live job logs
+Jobs created before it existed keep reading their legacy live_updates column
+"""
+
+import os
+import sys
+from sqlalchemy import inspect
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+
+
+def add_job_events_table():
+    """Create job_events and its (job_id, id) cursor index"""
+
+    print("Adding job_events table...")
+
+    with app.app_context():
+        try:
+            if "job_events" in inspect(db.engine).get_table_names():
+                print("  [SKIP] job_events table already exists")
+            else:
+                # create_all only creates tables that are missing (with their indexes)
+                db.create_all()
+                print("  [OK] job_events table created")
+
+            indexes = [index["name"] for index in inspect(db.engine).get_indexes("job_events")]
+            if "ix_job_events_job_id_id" in indexes:
+                print("  [OK] ix_job_events_job_id_id index ready")
+            else:
+                from models import JobEvent
+                for index in JobEvent.__table__.indexes:
+                    index.create(db.engine, checkfirst=True)
+                print("  [OK] ix_job_events_job_id_id index added")
+
+            print("\n[SUCCESS] Database schema updated successfully!")
+
+        except Exception as e:
+            print(f"\n[ERROR] Failed to update schema: {e}")
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    add_job_events_table()
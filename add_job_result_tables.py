@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Add normalized job result tables and summary columns to scrape_jobs
+Moves the per-file list out of existing ScrapeJob.results blobs
+"""
+
+import json
+import os
+import sys
+from sqlalchemy import inspect, text
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from db_job_manager import _store_job_results
+from models import ScrapeJob
+
+SUMMARY_COLUMNS = {
+    "sources_succeeded": "INTEGER DEFAULT 0",
+    "sources_failed": "INTEGER DEFAULT 0",
+    "total_bytes": "BIGINT DEFAULT 0",
+}
+
+
+def widen_original_url():
+    """Make job_file_results.original_url unbounded (it was VARCHAR(1000))"""
+    dialect = db.engine.dialect.name
+    if dialect == "mssql":
+        db.session.execute(text("ALTER TABLE job_file_results ALTER COLUMN original_url NVARCHAR(MAX) NULL"))
+    elif dialect == "postgresql":
+        db.session.execute(text("ALTER TABLE job_file_results ALTER COLUMN original_url TYPE TEXT"))
+    elif dialect == "mysql":
+        db.session.execute(text("ALTER TABLE job_file_results MODIFY original_url TEXT NULL"))
+    else:
+        # SQLite does not enforce VARCHAR lengths
+        print("  [SKIP] original_url unchanged on SQLite")
+        return
+    print("  [OK] original_url widened to TEXT")
+
+
+def add_job_result_tables(backfill=True):
+    """Create job_file_results/job_source_results and backfill from results JSON"""
+
+    print("Adding job result tables...")
+
+    with app.app_context():
+        try:
+            # create_all only creates tables that are missing
+            db.create_all()
+            print("  [OK] job_file_results / job_source_results ready")
+
+            columns = [col["name"] for col in inspect(db.engine).get_columns("scrape_jobs")]
+            for name, ddl in SUMMARY_COLUMNS.items():
+                if name not in columns:
+                    print(f"Adding {name} column...")
+                    db.session.execute(text(f"ALTER TABLE scrape_jobs ADD {name} {ddl}"))
+                    print(f"  [OK] {name} column added")
+                else:
+                    print(f"  [SKIP] {name} column already exists")
+            widen_original_url()
+            db.session.commit()
+
+            if backfill:
+                migrated = 0
+                job_ids = [
+                    row.id for row in db.session.query(ScrapeJob.id).filter(ScrapeJob.results.isnot(None))
+                ]
+                for job_id in job_ids:
+                    job = db.session.get(ScrapeJob, job_id)
+                    try:
+                        results = json.loads(job.results)
+                    except (TypeError, json.JSONDecodeError):
+                        continue
+                    if "files" not in results and "source_stats" not in results:
+                        continue
+                    _store_job_results(job, results)
+                    migrated += 1
+                    if migrated % 50 == 0:
+                        db.session.commit()
+                db.session.commit()
+                print(f"  [OK] Backfilled {migrated} jobs")
+
+            print("\n[SUCCESS] Database schema updated successfully!")
+
+        except Exception as e:
+            print(f"\n[ERROR] Failed to update schema: {e}")
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    add_job_result_tables(backfill="--no-backfill" not in sys.argv)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Create the job_statistics aggregate table and backfill it from scrape_jobs
+Run once before relying on cleanup_old_jobs to archive history
+"""
+
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from db_job_manager import rebuild_job_statistics
+
+
+def add_job_statistics():
+    """Create job_statistics and rebuild all rows from existing jobs"""
+
+    print("Adding job_statistics table...")
+
+    with app.app_context():
+        try:
+            # create_all only creates tables that are missing
+            db.create_all()
+            print("  [OK] job_statistics table ready")
+
+            rows = rebuild_job_statistics()
+            print(f"  [OK] Rebuilt {rows} aggregate rows")
+
+            print("\n[SUCCESS] Job statistics backfilled successfully!")
+
+        except Exception as e:
+            print(f"\n[ERROR] Failed to build job statistics: {e}")
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    add_job_statistics()
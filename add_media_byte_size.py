@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Add byte_size column to media_blobs
+Lets size checks and Content-Length use a stored value instead of loading media_data
+"""
+
+import os
+import sys
+from sqlalchemy import inspect, text
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from blob_store import blob_store
+from models import MediaBlob
+
+
+def add_media_byte_size(backfill=True):
+    """Add media_blobs.byte_size and fill it in from existing payloads"""
+
+    print("Adding byte_size column to media_blobs...")
+
+    with app.app_context():
+        try:
+            columns = [col["name"] for col in inspect(db.engine).get_columns("media_blobs")]
+            if "byte_size" not in columns:
+                db.session.execute(text("ALTER TABLE media_blobs ADD byte_size BIGINT NULL"))
+                db.session.commit()
+                print("  [OK] byte_size column added")
+            else:
+                print("  [SKIP] byte_size column already exists")
+
+            if backfill:
+                # Database payloads: measured by the server, the BLOB never leaves it
+                length_fn = "DATALENGTH" if db.engine.dialect.name == "mssql" else "LENGTH"
+                result = db.session.execute(
+                    text(
+                        f"UPDATE media_blobs SET byte_size = {length_fn}(media_data) "
+                        "WHERE byte_size IS NULL AND media_data IS NOT NULL"
+                    )
+                )
+                db.session.commit()
+                print(f"  [OK] Sized {result.rowcount} database payloads")
+
+                # Blob store payloads: stat the file
+                sized = 0
+                for blob in MediaBlob.query.filter(
+                    MediaBlob.byte_size.is_(None), MediaBlob.content_key.isnot(None)
+                ).all():
+                    if blob_store.exists(blob.content_key):
+                        blob.byte_size = blob_store.size(blob.content_key)
+                        sized += 1
+                db.session.commit()
+                print(f"  [OK] Sized {sized} blob store payloads")
+
+            print("\n[SUCCESS] Database schema updated successfully!")
+
+        except Exception as e:
+            print(f"\n[ERROR] Failed to update schema: {e}")
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    add_media_byte_size(backfill="--no-backfill" not in sys.argv)
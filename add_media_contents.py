@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Add the shared media_contents table for cross-user deduplication
+Backfills one row per blob store key with its current reference count
+"""
+
+import os
+import sys
+from sqlalchemy import func
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from blob_store import blob_store
+from models import MediaBlob, MediaContent
+
+
+def add_media_contents(backfill=True):
+    """Create media_contents and rebuild reference counts from media_blobs"""
+
+    print("Adding media_contents table...")
+
+    with app.app_context():
+        try:
+            # create_all only creates tables that are missing
+            db.create_all()
+            print("  [OK] media_contents ready")
+
+            if backfill:
+                created = 0
+                updated = 0
+                rows = (
+                    db.session.query(MediaBlob.content_key, func.min(MediaBlob.file_hash), func.count(MediaBlob.id))
+                    .filter(MediaBlob.content_key.isnot(None))
+                    .group_by(MediaBlob.content_key)
+                    .all()
+                )
+                for content_key, file_hash, ref_count in rows:
+                    content = MediaContent.query.filter_by(content_key=content_key).first()
+                    if content:
+                        if content.ref_count != ref_count:
+                            content.ref_count = ref_count
+                            updated += 1
+                        continue
+                    if not blob_store.exists(content_key):
+                        print(f"  [SKIP] {content_key[:12]} missing from blob store")
+                        continue
+                    db.session.add(
+                        MediaContent(
+                            content_key=content_key,
+                            file_hash=file_hash or content_key[:64],
+                            byte_size=blob_store.size(content_key),
+                            ref_count=ref_count,
+                        )
+                    )
+                    created += 1
+                    if created % 100 == 0:
+                        db.session.commit()
+                db.session.commit()
+                print(f"  [OK] Backfilled {created} content rows, corrected {updated} reference counts")
+
+                savings = MediaContent.get_savings()
+                print(f"  [OK] {savings['references']} references share {savings['unique_files']} files, "
+                      f"saving {savings['bytes_saved'] / (1024 * 1024):.1f} MB")
+
+            print("\n[SUCCESS] Database schema updated successfully!")
+
+        except Exception as e:
+            print(f"\n[ERROR] Failed to update schema: {e}")
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    add_media_contents(backfill="--no-backfill" not in sys.argv)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Index assets by dimensions/duration and backfill width, height and duration
+Values come from file headers and container metadata (no full decode)
+"""
+
+import mimetypes
+import os
+import sys
+from sqlalchemy import inspect
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from models import Asset, MediaBlob
+from utils.media_info import probe_media
+
+BATCH_SIZE = 200
+
+
+def _probe_asset(asset):
+    """Probe an asset from its blob store file, file path or DB payload"""
+    media_blob = MediaBlob.query.filter_by(asset_id=asset.id).first()
+    content_type = media_blob.mime_type if media_blob else mimetypes.guess_type(asset.filename or "")[0]
+
+    path = media_blob.get_file_path() if media_blob else None
+    if not path and asset.file_path and os.path.exists(asset.file_path):
+        path = asset.file_path
+    if path:
+        return probe_media(path, content_type)
+
+    if media_blob and content_type and content_type.startswith("image/"):
+        # Image headers can be read from a stream; videos need a real path
+        with media_blob.open_stream() as stream:
+            return probe_media(stream, content_type)
+    return None
+
+
+def add_media_dimensions(backfill=True):
+    """Create the dimension indexes and fill in missing width/height/duration"""
+
+    print("Adding asset dimension indexes...")
+
+    with app.app_context():
+        try:
+            existing = {ix["name"] for ix in inspect(db.engine).get_indexes("assets")}
+            for index in Asset.__table__.indexes:
+                if index.name in ("ix_assets_user_type_dims", "ix_assets_user_type_duration"):
+                    if index.name in existing:
+                        print(f"  [SKIP] {index.name} already exists")
+                    else:
+                        index.create(db.engine)
+                        print(f"  [OK] {index.name} created")
+
+            if backfill:
+                probed = 0
+                missing = 0
+                last_id = 0
+                while True:
+                    batch = (
+                        Asset.query.filter(
+                            Asset.id > last_id,
+                            Asset.is_deleted == False,  # noqa: E712
+                            Asset.width.is_(None),
+                            Asset.file_type.in_(["image", "video"]),
+                        )
+                        .order_by(Asset.id)
+                        .limit(BATCH_SIZE)
+                        .all()
+                    )
+                    if not batch:
+                        break
+                    for asset in batch:
+                        info = _probe_asset(asset)
+                        if info and info.get("width"):
+                            asset.width = info["width"]
+                            asset.height = info["height"]
+                            asset.duration = info["duration"]
+                            probed += 1
+                        else:
+                            missing += 1
+                    db.session.commit()
+                    last_id = batch[-1].id
+                    print(f"  ... probed {probed} assets")
+                print(f"  [OK] Filled dimensions for {probed} assets ({missing} unreadable)")
+
+            print("\n[SUCCESS] Database schema updated successfully!")
+
+        except Exception as e:
+            print(f"\n[ERROR] Failed to update schema: {e}")
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    add_media_dimensions(backfill="--no-backfill" not in sys.argv)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Create the media_thumbnails table
+Holds the small/medium/large thumbnail pyramid in each output format, generated once at ingest
+"""
+
+import os
+import sys
+from sqlalchemy import inspect
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from models import MediaThumbnail
+
+
+def add_media_thumbnails():
+    """Create media_thumbnails; existing assets are filled by regenerate_all_thumbnails.py"""
+
+    print("Creating media_thumbnails table...")
+
+    with app.app_context():
+        try:
+            if "media_thumbnails" not in inspect(db.engine).get_table_names():
+                MediaThumbnail.__table__.create(db.engine)
+                print("  [OK] media_thumbnails table created")
+            else:
+                print("  [SKIP] media_thumbnails table already exists")
+
+            print("\n[SUCCESS] Database schema updated successfully!")
+            print("Run regenerate_all_thumbnails.py to build pyramids for existing assets.")
+
+        except Exception as e:
+            print(f"\n[ERROR] Failed to update schema: {e}")
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    add_media_thumbnails()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Add perceptual hash columns to assets and backfill them for images
+Enables near-duplicate detection and the similar-assets API
+"""
+
+import os
+import sys
+from sqlalchemy import inspect, text
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db
+from models import Asset, MediaBlob
+from utils.perceptual_hash import compute_hashes
+
+HASH_COLUMNS = ("ahash", "dhash", "phash")
+BATCH_SIZE = 100
+
+
+def add_perceptual_hashes(backfill=True):
+    """Add ahash/dhash/phash to assets and compute them for existing images"""
+
+    print("Adding perceptual hash columns to assets...")
+
+    with app.app_context():
+        try:
+            columns = [col["name"] for col in inspect(db.engine).get_columns("assets")]
+            for name in HASH_COLUMNS:
+                if name not in columns:
+                    db.session.execute(text(f"ALTER TABLE assets ADD {name} VARCHAR(16) NULL"))
+                    print(f"  [OK] {name} column added")
+                else:
+                    print(f"  [SKIP] {name} column already exists")
+            if "phash" not in columns:
+                db.session.execute(text("CREATE INDEX ix_assets_phash ON assets (phash)"))
+                print("  [OK] phash index created")
+            db.session.commit()
+
+            if backfill:
+                hashed = 0
+                failed = 0
+                last_id = 0
+                while True:
+                    batch = (
+                        Asset.query.filter(
+                            Asset.id > last_id,
+                            Asset.file_type == "image",
+                            Asset.is_deleted == False,  # noqa: E712
+                            Asset.phash.is_(None),
+                        )
+                        .order_by(Asset.id)
+                        .limit(BATCH_SIZE)
+                        .all()
+                    )
+                    if not batch:
+                        break
+                    for asset in batch:
+                        hashes = None
+                        media_blob = MediaBlob.query.filter_by(asset_id=asset.id).first()
+                        if media_blob:
+                            with media_blob.open_stream() as stream:
+                                hashes = compute_hashes(stream)
+                        elif asset.file_path and os.path.exists(asset.file_path):
+                            hashes = compute_hashes(asset.file_path)
+                        if hashes:
+                            asset.ahash = hashes["ahash"]
+                            asset.dhash = hashes["dhash"]
+                            asset.phash = hashes["phash"]
+                            hashed += 1
+                        else:
+                            failed += 1
+                    db.session.commit()
+                    last_id = batch[-1].id
+                    print(f"  ... hashed {hashed} images")
+                print(f"  [OK] Hashed {hashed} images ({failed} could not be decoded)")
+
+            print("\n[SUCCESS] Database schema updated successfully!")
+
+        except Exception as e:
+            print(f"\n[ERROR] Failed to update schema: {e}")
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    add_perceptual_hashes(backfill="--no-backfill" not in sys.argv)
@@ -306,6 +306,14 @@ try:
 except ImportError:
     logger.warning("Request timeout middleware not available")
 
+# Batched MediaBlob access accounting
+try:
+    from access_tracker import access_tracker
+
+    access_tracker.init_app(app)
+except ImportError:
+    logger.warning("Media access tracker not available")
+
 # Import database error handler
 try:
     from db_error_handler import handle_db_error, with_retry
@@ -956,8 +964,9 @@ def dashboard_stats():
 
     # Get user stats - ONLY count non-deleted assets
     total_assets = db.session.query(Asset).filter_by(user_id=user_id, is_deleted=False).count()
-    total_jobs = db.session.query(ScrapeJob).filter_by(user_id=user_id).count()
-    completed_jobs = db.session.query(ScrapeJob).filter_by(user_id=user_id, status='completed').count()
+    job_stats = db_job_manager.get_job_statistics(user_id=user_id)
+    total_jobs = job_stats.get('total_jobs', 0)
+    completed_jobs = job_stats.get('completed_jobs', 0)
     pending_jobs = db.session.query(ScrapeJob).filter_by(user_id=user_id, status='pending').count()
 
     # Get recent activity - ONLY non-deleted assets
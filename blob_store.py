@@ -0,0 +1,226 @@
+"""
+Content-Addressed Blob Store
+Keeps media bytes on disk under a SHA-256 sharded path instead of in
+media_blobs.media_data; MediaBlob only stores metadata and the content key.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    ENCRYPTION_AVAILABLE = True
+except ImportError:
+    ENCRYPTION_AVAILABLE = False
+    logger.warning("cryptography not available - blob encryption at rest disabled")
+
+# Storage backends for MediaBlob rows
+BACKEND_DATABASE = 'database'
+BACKEND_FILESYSTEM = 'filesystem'
+
+# Encrypted blob file layout: MAGIC + 16-byte CTR nonce + ciphertext
+ENCRYPTED_MAGIC = b'EMS1'
+NONCE_SIZE = 16
+HEADER_SIZE = len(ENCRYPTED_MAGIC) + NONCE_SIZE
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class FileSystemBlobStore:
+    """Content-addressed store: root/ab/cd/<sha256>[.u<owner>]
+
+    Plain blobs are keyed by the SHA-256 of their bytes, so identical content
+    is written once. With a master key, blobs are encrypted per owner with
+    AES-256-CTR (seekable, so byte ranges can be read without decrypting the
+    whole file) and the key is scoped to the owner: '<sha256>.u<owner_id>'.
+    """
+
+    def __init__(self, root, master_key=None):
+        self.root = root
+        self.master_key = master_key.encode() if isinstance(master_key, str) else master_key
+        if self.master_key and not ENCRYPTION_AVAILABLE:
+            logger.error("MEDIA_ENCRYPTION_KEY is set but cryptography is missing; storing blobs unencrypted")
+            self.master_key = None
+
+    @property
+    def encrypts(self):
+        return bool(self.master_key)
+
+    # ------------------------------------------------------------------
+    # Keys and paths
+    # ------------------------------------------------------------------
+    def make_key(self, sha256_hex, owner_id=None):
+        """Content key for a hash, scoped to the owner when encrypting"""
+        if self.encrypts:
+            return f"{sha256_hex}.u{owner_id if owner_id is not None else 'guest'}"
+        return sha256_hex
+
+    def path_for(self, key):
+        """Sharded on-disk path for a content key"""
+        if not key or len(key) < 64 or not all(c in '0123456789abcdef' for c in key[:64]):
+            raise ValueError(f"Invalid content key: {key!r}")
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    @staticmethod
+    def is_encrypted_key(key):
+        return '.u' in (key or '')
+
+    def plain_path(self, key):
+        """Path that can be served byte-for-byte, or None for encrypted blobs"""
+        if self.is_encrypted_key(key):
+            return None
+        path = self.path_for(key)
+        return path if os.path.exists(path) else None
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def hash_file(self, src_path):
+        """SHA-256 and size of a file, read in CHUNK_SIZE pieces; returns (sha256_hex, size)"""
+        hasher = hashlib.sha256()
+        size = 0
+        with open(src_path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                size += len(chunk)
+        return hasher.hexdigest(), size
+
+    def put_file(self, src_path, owner_id=None):
+        """Stream a file into the store; returns (key, sha256_hex, size)
+
+        The file is hashed and copied in CHUNK_SIZE pieces, so memory use is
+        bounded regardless of file size. Existing content is not rewritten.
+        """
+        with open(src_path, 'rb') as src:
+            return self.put_stream(src, owner_id=owner_id)
+
+    def put_bytes(self, data, owner_id=None):
+        """Store an in-memory payload; returns (key, sha256_hex, size)"""
+        from io import BytesIO
+        return self.put_stream(BytesIO(data), owner_id=owner_id)
+
+    def put_stream(self, stream, owner_id=None):
+        """Store a readable binary stream; returns (key, sha256_hex, size)"""
+        os.makedirs(self.root, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        nonce = os.urandom(NONCE_SIZE) if self.encrypts else None
+        encryptor = self._cipher(owner_id, nonce).encryptor() if self.encrypts else None
+
+        fd, tmp_path = tempfile.mkstemp(prefix='.incoming_', dir=self.root)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if encryptor:
+                    tmp.write(ENCRYPTED_MAGIC + nonce)
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    tmp.write(encryptor.update(chunk) if encryptor else chunk)
+                if encryptor:
+                    tmp.write(encryptor.finalize())
+
+            sha256_hex = hasher.hexdigest()
+            key = self.make_key(sha256_hex, owner_id)
+            dest = self.path_for(key)
+            if os.path.exists(dest):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp_path, dest)
+            return key, sha256_hex, size
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, key):
+        """Remove a blob file; callers must check references first"""
+        try:
+            os.remove(self.path_for(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def exists(self, key):
+        return os.path.exists(self.path_for(key))
+
+    def size(self, key):
+        """Plaintext size of a blob"""
+        size = os.path.getsize(self.path_for(key))
+        return size - HEADER_SIZE if self.is_encrypted_key(key) else size
+
+    def read(self, key):
+        """Whole blob as bytes (prefer iter_chunks for large files)"""
+        return b''.join(self.iter_chunks(key))
+
+    def iter_chunks(self, key, start=0, end=None, chunk_size=CHUNK_SIZE):
+        """Yield plaintext bytes [start, end) of a blob in chunks"""
+        path = self.path_for(key)
+        encrypted = self.is_encrypted_key(key)
+        with open(path, 'rb') as f:
+            decryptor = None
+            if encrypted:
+                header = f.read(HEADER_SIZE)
+                if not header.startswith(ENCRYPTED_MAGIC):
+                    raise ValueError(f"Blob {key} is not a valid encrypted blob")
+                nonce = header[len(ENCRYPTED_MAGIC):]
+                owner_id = key.rsplit('.u', 1)[1]
+                block_start = start - (start % 16)
+                decryptor = self._cipher(owner_id, nonce, block_offset=block_start // 16).decryptor()
+                f.seek(HEADER_SIZE + block_start)
+                skip = start - block_start
+            else:
+                f.seek(start)
+                skip = 0
+
+            remaining = None if end is None else end - start
+            while remaining is None or remaining > 0:
+                to_read = chunk_size + skip if remaining is None else min(chunk_size, remaining) + skip
+                chunk = f.read(to_read)
+                if not chunk:
+                    break
+                if decryptor:
+                    chunk = decryptor.update(chunk)
+                if skip:
+                    chunk = chunk[skip:]
+                    skip = 0
+                if remaining is not None:
+                    chunk = chunk[:remaining]
+                    remaining -= len(chunk)
+                yield chunk
+
+    # ------------------------------------------------------------------
+    # Encryption
+    # ------------------------------------------------------------------
+    def _cipher(self, owner_id, nonce, block_offset=0):
+        """AES-256-CTR cipher with a per-owner key derived from the master key"""
+        owner = owner_id if owner_id is not None else 'guest'
+        user_key = hmac.new(self.master_key, f"user:{owner}".encode(), hashlib.sha256).digest()
+        counter = (int.from_bytes(nonce, 'big') + block_offset) % (1 << 128)
+        return Cipher(algorithms.AES(user_key), modes.CTR(counter.to_bytes(16, 'big')))
+
+
+def get_storage_backend():
+    """Backend for new MediaBlob rows: 'filesystem' (default) or 'database'"""
+    backend = os.getenv('MEDIA_STORAGE_BACKEND', BACKEND_FILESYSTEM).lower()
+    return BACKEND_DATABASE if backend == BACKEND_DATABASE else BACKEND_FILESYSTEM
+
+
+# Global blob store instance
+blob_store = FileSystemBlobStore(
+    root=os.getenv('MEDIA_BLOB_DIR', os.path.join('downloads', '.blobs')),
+    master_key=os.getenv('MEDIA_ENCRYPTION_KEY') or None
+)
@@ -35,6 +35,18 @@ def cleanup():
         return fail(str(e))
 
 
+@admin_bp.route("/thumbnail-cache")
+@admin_required
+def thumbnail_cache_stats():
+    """Size, budget and hit rate of the on-disk thumbnail cache."""
+    try:
+        from utils.thumbnail_generator import get_cache_stats
+
+        return success(cache=get_cache_stats())
+    except Exception as e:
+        return fail(str(e))
+
+
 @admin_bp.route("/users")
 @admin_required
 def list_users():
@@ -1,11 +1,12 @@
+import hashlib
+import json
 import mimetypes
 import os
-import zipfile
+import struct
 import io
-import secrets
 import urllib.parse
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 
 from flask import (
     Blueprint,
@@ -17,10 +18,27 @@ from flask import (
     send_file,
 )
 from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
 
 from auth import optional_auth, user_or_admin_required
-from models import Asset, MediaBlob, User, db
-from watermark import watermark_overlay
+from models import Asset, MediaBlob, MediaThumbnail, User, db
+from utils.http_range import (
+    bytes_reader,
+    file_range_response,
+    not_modified_response,
+    offload_response,
+    range_response,
+)
+from utils.thumbnail_generator import (
+    NEGOTIATED_IMAGE_FORMATS,
+    NEGOTIATED_THUMBNAIL_FORMATS,
+    PYRAMID_FORMATS,
+    can_encode,
+    negotiate_format,
+    transcode_image,
+)
+from utils.zip_stream import ZipEntry, file_chunks, stream_zip
+from watermark import should_watermark_for, watermark_overlay
 
 # Import the correct database-backed asset manager
 import db_asset_manager
@@ -37,16 +55,28 @@ download_progress = {}
 def get_assets():
     """Get all downloaded assets with user-based filtering"""
     try:
-        try:
-            from simple_media_server import get_simple_assets
-
-            result = get_simple_assets()
-            if result.get("success"):
-                return jsonify(result)
-        except Exception as e:
-            current_app.logger.debug(
-                f"[ASSETS] Simple asset server failed: {e}; using database"
-            )
+        # Dimension/duration filters (served by the database only)
+        range_filters = {
+            "min_width": request.args.get("min_width", type=int),
+            "max_width": request.args.get("max_width", type=int),
+            "min_height": request.args.get("min_height", type=int),
+            "max_height": request.args.get("max_height", type=int),
+            "min_duration": request.args.get("min_duration", type=float),
+            "max_duration": request.args.get("max_duration", type=float),
+        }
+        range_filters = {k: v for k, v in range_filters.items() if v is not None}
+
+        if not range_filters:
+            try:
+                from simple_media_server import get_simple_assets
+
+                result = get_simple_assets()
+                if result.get("success"):
+                    return jsonify(result)
+            except Exception as e:
+                current_app.logger.debug(
+                    f"[ASSETS] Simple asset server failed: {e}; using database"
+                )
 
         file_type = request.args.get("type")
         page = int(request.args.get("page", 1))
@@ -66,7 +96,7 @@ def get_assets():
 
         print(f"[ASSETS API] Calling get_assets with user_id={user_id}, file_type={file_type}")
         assets_data = db_asset_manager.get_assets(
-            user_id=user_id, file_type=file_type, limit=limit, offset=offset
+            user_id=user_id, file_type=file_type, limit=limit, offset=offset, **range_filters
         )
         print(f"[ASSETS API] Got {len(assets_data)} assets back")
 
@@ -101,6 +131,9 @@ def get_assets():
                     "user_id": asset_data.get("user_id"),
                     "user_email": user_email,
                     "job_id": asset_data.get("job_id"),
+                    "width": asset_data.get("width"),
+                    "height": asset_data.get("height"),
+                    "duration": asset_data.get("duration"),
                     "url": f"/scraper/serve/{asset_data['id']}",
                 }
             )
@@ -117,6 +150,7 @@ def get_assets():
                 },
                 "page": page,
                 "limit": limit,
+                "filters": range_filters,
             }
         )
     except Exception as e:
@@ -149,6 +183,41 @@ def delete_asset(asset_id):
         return jsonify({"success": False, "error": str(e)})
 
 
+@assets_bp.route("/api/assets/<int:asset_id>/similar")
+@optional_auth
+def get_similar_assets(asset_id):
+    """Near-duplicates of an asset by perceptual hash distance"""
+    try:
+        asset = Asset.query.filter_by(id=asset_id, is_deleted=False).first()
+        if not asset:
+            return jsonify({"success": False, "error": "Asset not found"}), 404
+        if asset.user_id is not None:
+            not_owner = asset.user_id != getattr(current_user, "id", None)
+            not_admin = not getattr(current_user, "is_admin", lambda: False)()
+            if not current_user.is_authenticated or (not_owner and not_admin):
+                return jsonify({"success": False, "error": "Access denied"}), 403
+
+        max_distance = min(max(request.args.get("max_distance", 10, type=int), 0), 32)
+        limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+        similar = db_asset_manager.find_similar_assets(
+            asset_id, max_distance=max_distance, limit=limit
+        )
+        for item in similar:
+            item["url"] = f"/scraper/serve/{item['id']}"
+            item["thumbnail_url"] = f"/scraper/api/media/{item['id']}/thumbnail"
+        return jsonify(
+            {
+                "success": True,
+                "asset_id": asset_id,
+                "phash": asset.phash,
+                "max_distance": max_distance,
+                "similar": similar,
+            }
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
 @assets_bp.route("/api/assets/bulk-delete", methods=["POST"])
 @optional_auth
 def bulk_delete_assets():
@@ -230,108 +299,218 @@ def delete_asset_by_path(asset_path):
         return jsonify({"success": False, "error": str(e)})
 
 
+def _validators(asset, file_hash=None, created_at=None, variant=None):
+    """Strong ETag and Last-Modified for a representation of an asset
+
+    Built from metadata only (the content hash, else the file's size and
+    mtime) plus the variant being served (watermark version, thumbnail
+    size/format), so a 304 can be answered before any payload is read.
+    """
+    last_modified = created_at or asset.downloaded_at
+    content = file_hash
+    if not content:
+        try:
+            stat = os.stat(asset.file_path)
+            content = f"{asset.id}-{stat.st_size}-{int(stat.st_mtime)}"
+            last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+        except (OSError, TypeError):
+            content = f"{asset.id}-{asset.file_size}"
+    if last_modified is not None and last_modified.tzinfo is None:
+        # Timestamps are stored as naive UTC
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0)
+    etag = f'"{content}-{variant}"' if variant else f'"{content}"'
+    return etag, last_modified
+
+
+def _in_app_context(app, chunks):
+    """Drive a database-backed chunk iterator while a response streams
+
+    Runs after the request context is gone; each chunk's query gets its
+    own short-lived app context.
+    """
+    while True:
+        with app.app_context():
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _blob_chunks(app, media_blob, size):
+    """ZipEntry open_chunks callable for a payload read window by window from the store"""
+    return lambda: _in_app_context(app, media_blob.iter_range(0, size))
+
+
+def _read_original(asset, media_blob):
+    """Whole original payload of an asset (small images only)"""
+    if media_blob:
+        with media_blob.open_stream() as stream:
+            return stream.read()
+    with open(asset.file_path, "rb") as f:
+        return f.read()
+
+
+def _watermarked_variant(asset, media_blob, image_format="jpeg"):
+    """Path of the cached watermarked image for an image asset, rendered on first use
+
+    Keyed by content hash + watermark version + format, so identical content
+    shares one rendition and a watermark change never serves stale output.
+    File-only assets without a stored hash are keyed by path, size and mtime
+    instead (as in _validators), so serving them never reads the whole file.
+    """
+    content_hash = media_blob.file_hash if media_blob and media_blob.file_hash else None
+    if not content_hash and not media_blob and asset.file_path:
+        try:
+            stat = os.stat(asset.file_path)
+            identity = f"{os.path.abspath(asset.file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+            content_hash = hashlib.sha256(identity.encode()).hexdigest()
+        except OSError:
+            pass
+    if not content_hash:
+        content_hash = hashlib.sha256(_read_original(asset, media_blob)).hexdigest()
+    return watermark_overlay.get_cached_variant(
+        content_hash, lambda: _read_original(asset, media_blob), image_format=image_format
+    )
+
+
 @assets_bp.route("/serve/<int:asset_id>")
 @assets_bp.route("/api/media/<int:asset_id>")
 @optional_auth
 def serve_media_blob(asset_id):
+    """Serve an asset's bytes with Range/If-Range and conditional GET support
+
+    Only the requested byte windows are read from the blob store, the
+    media_blobs row or the file; watermarked images are served from the
+    watermark variant cache the same way. Revalidations get a 304 before
+    any of that.
+    """
     try:
         asset = Asset.query.get_or_404(asset_id)
 
         MAX_MEMORY_SIZE = 50 * 1024 * 1024
         media_blob = MediaBlob.query.filter_by(asset_id=asset_id).first()
 
+        should_watermark = should_watermark_for(current_user)
+
+        disposition = "attachment" if request.args.get("download") == "true" else "inline"
+        headers = {
+            "Content-Disposition": f'{disposition}; filename="{asset.filename}"',
+            "Cache-Control": "private, max-age=3600",
+        }
+
         if media_blob:
-            blob_size = len(media_blob.media_data) if media_blob.media_data else 0
-            if blob_size > MAX_MEMORY_SIZE:
-
-                def generate_blob_chunks():
-                    chunk_size = 8192
-                    data = media_blob.media_data
-                    for i in range(0, len(data), chunk_size):
-                        yield data[i : i + chunk_size]
-
-                return Response(
-                    generate_blob_chunks(),
-                    mimetype=media_blob.mime_type,
-                    headers={
-                        "Content-Length": str(blob_size),
-                        "Accept-Ranges": "bytes",
-                        "Cache-Control": "private, max-age=3600",
-                        "ETag": f'"{asset.id}-{asset.file_size}"',
-                    },
-                )
-            else:
-                file_data = media_blob.get_file_data()
-                mime_type = media_blob.mime_type
+            blob_size = media_blob.get_file_size()
+            mime_type = media_blob.mime_type
+            blob_path = media_blob.get_file_path()
         else:
             if not asset.file_path or not os.path.exists(asset.file_path):
                 return jsonify({"error": "Media file not found"}), 404
-            file_size = os.path.getsize(asset.file_path)
-            if file_size > MAX_MEMORY_SIZE:
-                mime_type, _ = mimetypes.guess_type(asset.file_path)
-                if not mime_type:
-                    mime_type = "application/octet-stream"
-                return send_file(
-                    asset.file_path,
-                    mimetype=mime_type,
-                    as_attachment=request.args.get("download") == "true",
-                    download_name=asset.filename,
-                    conditional=True,
-                    etag=f"{asset.id}-{asset.file_size}",
-                )
-            else:
-                with open(asset.file_path, "rb") as f:
-                    file_data = f.read()
-                mime_type, _ = mimetypes.guess_type(asset.file_path)
-                if not mime_type:
-                    mime_type = "application/octet-stream"
+            blob_size = os.path.getsize(asset.file_path)
+            blob_path = asset.file_path
+            mime_type, _ = mimetypes.guess_type(asset.file_path)
+            if not mime_type:
+                mime_type = "application/octet-stream"
 
-        should_watermark = False
-        if current_user.is_authenticated:
-            if (
-                current_user.subscription_plan == "trial"
-                or not current_user.is_subscribed()
-            ):
-                should_watermark = True
-        else:
-            should_watermark = True
-
-        if (
-            should_watermark
-            and asset.file_type == "image"
-            and "file_data" in locals()
-            and len(file_data) < MAX_MEMORY_SIZE
-        ):
-            try:
-                file_data = watermark_overlay.apply_watermark_to_image_bytes(file_data)
-            except Exception as e:
-                current_app.logger.warning(f"Watermark application failed: {e}")
-
-        if "file_data" in locals():
-            response = make_response(file_data)
-            response.headers["Content-Type"] = mime_type
-            if request.args.get("download") == "true":
-                response.headers["Content-Disposition"] = (
-                    f'attachment; filename="{asset.filename}"'
+        if media_blob:
+            media_blob.record_access()
+
+        watermarked = should_watermark and asset.file_type == "image" and blob_size < MAX_MEMORY_SIZE
+        image_format = "jpeg"
+        if watermarked:
+            # The rendition is re-encoded anyway: use WebP/AVIF where the browser takes it
+            headers["Vary"] = "Accept"
+            if disposition == "inline":
+                image_format = negotiate_format(request.accept_mimetypes, NEGOTIATED_IMAGE_FORMATS)
+        file_hash = media_blob.file_hash if media_blob else None
+        created_at = media_blob.created_at if media_blob else None
+        variant = None
+        if watermarked:
+            variant = f"wm{watermark_overlay.version}"
+            if image_format != "jpeg":
+                variant = f"{variant}-{image_format}"
+        etag, last_modified = _validators(asset, file_hash, created_at, variant=variant)
+        # Revalidation: answered from metadata, before any payload is touched
+        not_modified = not_modified_response(etag, last_modified, headers)
+        if not_modified:
+            return not_modified
+
+        if watermarked:
+            watermarked_path = _watermarked_variant(asset, media_blob, image_format)
+            if watermarked_path:
+                headers["X-Watermarked"] = "true"
+                variant_type = PYRAMID_FORMATS[image_format][1]
+                offloaded = offload_response(
+                    watermarked_path, variant_type, etag=etag, headers=headers, last_modified=last_modified
                 )
-            else:
-                response.headers["Content-Disposition"] = (
-                    f'inline; filename="{asset.filename}"'
+                if offloaded:
+                    return offloaded
+                return file_range_response(
+                    watermarked_path, variant_type, etag=etag, headers=headers, last_modified=last_modified
                 )
-            response.headers["Cache-Control"] = "private, max-age=3600"
-            response.headers["ETag"] = f'"{asset.id}-{asset.file_size}"'
-            if should_watermark:
-                response.headers["X-Watermarked"] = "true"
-            del file_data
-            return response
-
-        # If streaming, a response was already returned
-        return jsonify({"error": "Unexpected state"}), 500
+
+            current_app.logger.warning(f"Watermark application failed for asset {asset_id}")
+            etag, last_modified = _validators(asset, file_hash, created_at)
+            file_data = _read_original(asset, media_blob)
+            return range_response(
+                len(file_data), bytes_reader(file_data), mime_type,
+                etag=etag, last_modified=last_modified, headers=headers,
+            )
+
+        if blob_path:
+            # Auth and watermark checks are done: let the web server send the file
+            offloaded = offload_response(
+                blob_path, mime_type, etag=etag, headers=headers, last_modified=last_modified
+            )
+            if offloaded:
+                return offloaded
+            return file_range_response(
+                blob_path, mime_type, etag=etag, headers=headers, last_modified=last_modified
+            )
+        # Encrypted blob store entry or media_blobs.media_data: read windows from the store
+        app = current_app._get_current_object()
+
+        def read_blob_range(start, end):
+            return _in_app_context(app, media_blob.iter_range(start, end))
+
+        return range_response(
+            blob_size, read_blob_range, mime_type, etag=etag, last_modified=last_modified, headers=headers
+        )
     except Exception as e:
         current_app.logger.exception("Error serving media")
         return jsonify({"error": str(e)}), 500
 
 
+def _transcoded_thumbnail(thumbnail, image_format):
+    """Pyramid level re-encoded as image_format, stored next to it on first request
+
+    Covers assets whose pyramid was built before (or without) that format,
+    so each (asset, size, format) is transcoded once.
+    """
+    data = transcode_image(thumbnail.data, image_format)
+    if not data:
+        return None
+    transcoded = MediaThumbnail(
+        asset_id=thumbnail.asset_id,
+        size=thumbnail.size,
+        format=image_format,
+        mime_type=PYRAMID_FORMATS[image_format][1],
+        width=thumbnail.width,
+        height=thumbnail.height,
+        byte_size=len(data),
+        data=data,
+    )
+    db.session.add(transcoded)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request stored it first
+        db.session.rollback()
+        return MediaThumbnail.find(thumbnail.asset_id, thumbnail.size, (image_format,), with_data=False)
+    return transcoded
+
+
 @assets_bp.route("/api/media/<int:asset_id>/thumbnail")
 @optional_auth
 def serve_media_thumbnail(asset_id):
@@ -357,46 +536,88 @@ def serve_media_thumbnail(asset_id):
         if size not in ['small', 'medium', 'large']:
             size = 'medium'
 
-        # Try to serve thumbnail from MediaBlob
-        media_blob = MediaBlob.query.filter_by(asset_id=asset_id).first()
-        if media_blob and media_blob.thumbnail_data:
-            response = make_response(media_blob.thumbnail_data)
-            response.headers["Content-Type"] = media_blob.thumbnail_mime_type or "image/jpeg"
-            response.headers["Cache-Control"] = "public, max-age=86400"
-            response.headers["ETag"] = f'thumb-{asset.id}-{size}'
-            response.headers["Content-Disposition"] = f'inline; filename="thumb_{asset.filename}"'
-            return response
+        # Validators come from the blob's metadata; no payload column is loaded
+        blob_row = (
+            db.session.query(
+                MediaBlob.file_hash,
+                MediaBlob.created_at,
+                MediaBlob.thumbnail_data.isnot(None).label("has_thumbnail"),
+            )
+            .filter(MediaBlob.asset_id == asset_id)
+            .first()
+        )
+        file_hash = blob_row.file_hash if blob_row else None
+        created_at = blob_row.created_at if blob_row else None
+        thumb_headers = {
+            "Cache-Control": "public, max-age=86400",
+            "Content-Disposition": f'inline; filename="thumb_{asset.filename}"',
+        }
+
+        def conditional(variant, modified=None):
+            etag, last_modified = _validators(asset, file_hash, modified or created_at, variant=variant)
+            return etag, last_modified, not_modified_response(etag, last_modified, thumb_headers)
+
+        # An explicit ?format= wins; otherwise negotiate WebP/AVIF from Accept
+        requested_format = request.args.get("format", "").lower()
+        if not requested_format:
+            requested_format = negotiate_format(request.accept_mimetypes, NEGOTIATED_THUMBNAIL_FORMATS)
+            thumb_headers["Vary"] = "Accept"
+
+        # Pyramid generated at ingest: pick the stored size, never regenerate
+        formats = (requested_format, "jpeg") if requested_format != "jpeg" else ("jpeg",)
+        thumbnail = MediaThumbnail.find(asset_id, size, formats, with_data=False)
+        if thumbnail and thumbnail.format != requested_format and can_encode(requested_format):
+            thumbnail = _transcoded_thumbnail(thumbnail, requested_format) or thumbnail
+        if thumbnail:
+            etag, last_modified, not_modified = conditional(
+                f"{size}-{thumbnail.format}-{thumbnail.byte_size}", thumbnail.created_at
+            )
+            if not_modified:
+                return not_modified
+            return range_response(
+                len(thumbnail.data), bytes_reader(thumbnail.data), thumbnail.mime_type,
+                etag=etag, last_modified=last_modified, headers=thumb_headers,
+            )
+
+        # Legacy single thumbnail on MediaBlob (loads the thumbnail, never the payload)
+        if blob_row and blob_row.has_thumbnail:
+            etag, last_modified, not_modified = conditional("thumb")
+            if not_modified:
+                return not_modified
+            thumbnail_data, thumbnail_mime_type = (
+                db.session.query(MediaBlob.thumbnail_data, MediaBlob.thumbnail_mime_type)
+                .filter(MediaBlob.asset_id == asset_id)
+                .first()
+            )
+            return range_response(
+                len(thumbnail_data), bytes_reader(thumbnail_data), thumbnail_mime_type or "image/jpeg",
+                etag=etag, last_modified=last_modified, headers=thumb_headers,
+            )
 
         # For images, generate optimized thumbnail
         if asset.file_type == "image":
             try:
                 # Import thumbnail generator
-                from utils.thumbnail_generator import generate_thumbnail, get_thumbnail_path
+                from utils.thumbnail_generator import generate_thumbnail
 
                 # Check if file exists
                 if not asset.file_path or not os.path.exists(asset.file_path):
                     # Fallback to full image from blob
-                    if media_blob:
+                    if blob_row:
                         return serve_media_blob(asset_id)
                     return "Image file not found", 404
 
-                # Check if thumbnail exists in cache
-                thumbnail_path = get_thumbnail_path(asset.file_path, size)
+                etag, last_modified, not_modified = conditional(f"{size}-cached")
+                if not_modified:
+                    return not_modified
 
-                if not os.path.exists(thumbnail_path):
-                    # Generate thumbnail
-                    thumbnail_path = generate_thumbnail(asset.file_path, size)
+                # Served from the LRU thumbnail cache, generated on a miss
+                thumbnail_path = generate_thumbnail(asset.file_path, size)
 
                 if thumbnail_path and os.path.exists(thumbnail_path):
-                    # Serve cached thumbnail with aggressive caching
-                    return send_file(
-                        thumbnail_path,
-                        mimetype='image/jpeg',
-                        as_attachment=False,
-                        download_name=f'thumb_{asset.filename}',
-                        conditional=True,
-                        etag=f'thumb-{asset.id}-{size}',
-                        max_age=86400  # Cache for 24 hours
+                    return file_range_response(
+                        thumbnail_path, "image/jpeg", etag=etag, headers=thumb_headers,
+                        last_modified=last_modified,
                     )
                 else:
                     # Fallback to full image
@@ -431,6 +652,128 @@ def serve_media_thumbnail(asset_id):
         return "Error serving thumbnail", 500
 
 
+# Upper bound on assets per batch thumbnail request (a few grid pages)
+MAX_BATCH_THUMBNAILS = 200
+
+
+def _pack_thumbnails(index, payloads):
+    """Thumbnail pack: 4-byte big-endian index length, JSON index, then the images
+
+    Each index item's offset/length locate its image in the data that
+    follows the index.
+    """
+    header = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    return b"".join([struct.pack(">I", len(header)), header, *payloads])
+
+
+@assets_bp.route("/api/media/thumbnails")
+@optional_auth
+def serve_media_thumbnails():
+    """Many pyramid thumbnails in one response, for a page of the grid
+
+    GET /api/media/thumbnails?ids=1,2,3&size=small&format=webp
+
+    The body is a thumbnail pack (see _pack_thumbnails). Its index lists
+    id, offset, length, mime_type, width and height for every thumbnail
+    found, in request order. Ids that are unknown, not accessible, or have
+    no stored pyramid go under "missing", and the client falls back to
+    /api/media/<id>/thumbnail for those. The ETag covers the thumbnail rows
+    picked, so a revisited page is answered with a 304 before any
+    thumbnail bytes are read. Without ?format= the encoding is negotiated
+    from Accept; levels missing in that format are sent as JPEG (the
+    single-thumbnail endpoint transcodes them).
+    """
+    try:
+        try:
+            ids = [int(part) for part in request.args.get("ids", "").split(",") if part.strip()]
+        except ValueError:
+            return jsonify({"error": "ids must be a comma-separated list of asset ids"}), 400
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return jsonify({"error": "No asset ids given"}), 400
+        if len(ids) > MAX_BATCH_THUMBNAILS:
+            return jsonify({"error": f"At most {MAX_BATCH_THUMBNAILS} thumbnails per request"}), 400
+
+        size = request.args.get("size", "medium")
+        if size not in ["small", "medium", "large"]:
+            size = "medium"
+        headers = {"Cache-Control": "private, max-age=86400"}
+        requested_format = request.args.get("format", "").lower()
+        if not requested_format:
+            requested_format = negotiate_format(request.accept_mimetypes, NEGOTIATED_THUMBNAIL_FORMATS)
+            headers["Vary"] = "Accept"
+        formats = (requested_format, "jpeg") if requested_format != "jpeg" else ("jpeg",)
+
+        # Same access rules as the single-thumbnail endpoint
+        query = db.session.query(Asset.id).filter(Asset.id.in_(ids), Asset.is_deleted.is_(False))
+        if not current_user.is_authenticated:
+            query = query.filter(Asset.user_id.is_(None))
+        elif not current_user.is_admin():
+            query = query.filter((Asset.user_id.is_(None)) | (Asset.user_id == current_user.id))
+        allowed = {row.id for row in query}
+
+        # Thumbnail metadata only; the bytes stay deferred until after the 304 check
+        best = {}
+        if allowed:
+            rows = MediaThumbnail.query.filter(
+                MediaThumbnail.asset_id.in_(allowed),
+                MediaThumbnail.size == size,
+                MediaThumbnail.format.in_(list(formats)),
+            ).all()
+            for row in rows:
+                current = best.get(row.asset_id)
+                if current is None or formats.index(row.format) < formats.index(current.format):
+                    best[row.asset_id] = row
+
+        found = [asset_id for asset_id in ids if asset_id in best]
+        missing = [asset_id for asset_id in ids if asset_id not in best]
+
+        digest = hashlib.sha1(f"{size}|{','.join(map(str, missing))}".encode())
+        for asset_id in found:
+            row = best[asset_id]
+            digest.update(f"|{asset_id}:{row.id}:{row.format}:{row.byte_size}:{row.created_at}".encode())
+        etag = f'"thumbs-{digest.hexdigest()}"'
+        created = [best[asset_id].created_at for asset_id in found if best[asset_id].created_at]
+        last_modified = max(created).replace(tzinfo=timezone.utc, microsecond=0) if created else None
+
+        not_modified = not_modified_response(etag, last_modified, headers)
+        if not_modified:
+            return not_modified
+
+        data_by_id = {}
+        if found:
+            data_by_id = dict(
+                db.session.query(MediaThumbnail.id, MediaThumbnail.data)
+                .filter(MediaThumbnail.id.in_([best[asset_id].id for asset_id in found]))
+                .all()
+            )
+
+        items, payloads, offset = [], [], 0
+        for asset_id in found:
+            row = best[asset_id]
+            data = data_by_id.get(row.id) or b""
+            items.append({
+                "id": asset_id,
+                "offset": offset,
+                "length": len(data),
+                "mime_type": row.mime_type,
+                "width": row.width,
+                "height": row.height,
+            })
+            payloads.append(data)
+            offset += len(data)
+
+        body = _pack_thumbnails({"size": size, "items": items, "missing": missing}, payloads)
+        response = Response(body, mimetype="application/vnd.scraper.thumbnail-pack", headers=headers)
+        response.headers["ETag"] = etag
+        if last_modified:
+            response.last_modified = last_modified
+        return response
+    except Exception as e:
+        current_app.logger.warning(f"Error serving thumbnail batch: {e}")
+        return jsonify({"error": "Error serving thumbnails"}), 500
+
+
 @assets_bp.route("/downloads/<path:asset_path>")
 @optional_auth
 def download_asset_legacy(asset_path):
@@ -468,35 +811,50 @@ def download_media(asset_id):
             if not current_user.is_authenticated or (not_owner and not_admin):
                 return jsonify({"error": "Access denied"}), 403
         media_blob = MediaBlob.query.filter_by(asset_id=asset_id).first()
+        if not media_blob and (not asset.file_path or not os.path.exists(asset.file_path)):
+            return jsonify({"error": "Media file not found"}), 404
+        should_watermark = should_watermark_for(current_user)
+        watermarked = should_watermark and asset.file_type == "image"
+        file_hash = media_blob.file_hash if media_blob else None
+        created_at = media_blob.created_at if media_blob else None
+        headers = {
+            "Content-Disposition": f'attachment; filename="{asset.filename}"',
+            "Cache-Control": "private, max-age=3600",
+        }
+        etag, last_modified = _validators(
+            asset, file_hash, created_at,
+            variant=f"wm{watermark_overlay.version}" if watermarked else None,
+        )
+        not_modified = not_modified_response(etag, last_modified, headers)
+        if not_modified:
+            return not_modified
+        if watermarked:
+            watermarked_path = _watermarked_variant(asset, media_blob)
+            if watermarked_path:
+                if media_blob:
+                    media_blob.record_access()
+                headers["X-Watermarked"] = "true"
+                return file_range_response(
+                    watermarked_path, "image/jpeg", etag=etag, headers=headers, last_modified=last_modified
+                )
+            etag, last_modified = _validators(asset, file_hash, created_at)
         if media_blob:
             file_data = media_blob.get_file_data()
             mime_type = media_blob.mime_type
         else:
-            if not asset.file_path or not os.path.exists(asset.file_path):
-                return jsonify({"error": "Media file not found"}), 404
             with open(asset.file_path, "rb") as f:
                 file_data = f.read()
             mime_type, _ = mimetypes.guess_type(asset.file_path)
             if not mime_type:
                 mime_type = "application/octet-stream"
-        should_watermark = False
-        if current_user.is_authenticated:
-            if (
-                current_user.subscription_plan == "trial"
-                or not current_user.is_subscribed()
-            ):
-                should_watermark = True
-        else:
-            should_watermark = True
-        if should_watermark and asset.file_type == "image":
-            file_data = watermark_overlay.apply_watermark_to_image_bytes(file_data)
         response = make_response(file_data)
         response.headers["Content-Type"] = mime_type
         response.headers["Content-Disposition"] = (
             f'attachment; filename="{asset.filename}"'
         )
         response.headers["Cache-Control"] = "private, max-age=3600"
-        response.headers["ETag"] = f'"{asset.id}-{asset.file_size}"'
+        response.set_etag(etag.strip('"'))
+        response.last_modified = last_modified
         if should_watermark:
             response.headers["X-Watermarked"] = "true"
         return response
@@ -508,8 +866,14 @@ def download_media(asset_id):
 @assets_bp.route("/api/media/bulk-download", methods=["POST"])
 @optional_auth
 def bulk_download_media():
-    """Download multiple assets as a ZIP file using streaming"""
-    import tempfile
+    """Download multiple assets as a ZIP archive streamed as it is built
+
+    Entries are read in chunks from disk, the blob store or the database
+    and written straight into the response (ZIP64, data descriptors), so
+    the first bytes leave immediately and no temp file is needed. Already
+    compressed media is stored, not deflated, and the next few assets are
+    read ahead in background threads (BULK_DOWNLOAD_PREFETCH).
+    """
     import time
 
     # Security limits
@@ -556,182 +920,173 @@ def bulk_download_media():
         assets = Asset.query.filter(Asset.id.in_(asset_ids)).all()
         asset_map = {a.id: a for a in assets}
 
+        # Metadata only; each payload is loaded (and released) as it is zipped
         blobs = MediaBlob.query.filter(MediaBlob.asset_id.in_(asset_ids)).all()
         blob_map = {b.asset_id: b for b in blobs}
 
-        # Create secure temporary directory and file
-        temp_dir = tempfile.mkdtemp(prefix='bulk_download_')
-        temp_path = os.path.join(temp_dir, f'assets_{secrets.token_hex(8)}.zip')
+        # Plan the archive inside the request (access checks, names, sizes);
+        # the bytes are read while the response streams
+        app = current_app._get_current_object()
+        entries = []
+        used_names = set()
+        failed_count = 0
+        total_size = 0
 
-        try:
-            with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                added_count = 0
-                failed_count = 0
-                total_size = 0
-
-                for asset_id in asset_ids:
-                    try:
-                        # Validate asset_id
-                        try:
-                            asset_id = int(asset_id)
-                        except (ValueError, TypeError):
-                            current_app.logger.warning(f"Invalid asset_id: {asset_id}")
-                            failed_count += 1
-                            continue
-
-                        asset = asset_map.get(asset_id)
-                        if not asset:
-                            current_app.logger.warning(f"Asset {asset_id} not found")
-                            failed_count += 1
-                            continue
-
-                        # Access control
-                        if asset.user_id is not None:
-                            not_owner = asset.user_id != getattr(current_user, "id", None)
-                            not_admin = not getattr(current_user, "is_admin", lambda: False)()
-                            if not current_user.is_authenticated or (not_owner and not_admin):
-                                current_app.logger.warning(f"Access denied for asset {asset_id}")
-                                failed_count += 1
-                                continue
-
-                        # Size checks
-                        file_size = asset.file_size or 0
-                        if file_size > MAX_SINGLE_FILE_SIZE:
-                            current_app.logger.warning(f"File too large: {asset_id} ({file_size} bytes)")
-                            failed_count += 1
-                            continue
-
-                        total_size += file_size
-                        if total_size > MAX_TOTAL_DOWNLOAD_SIZE:
-                            current_app.logger.warning(f"Total size limit exceeded at asset {asset_id}")
-                            break
-
-                        # Get file data
-                        media_blob = blob_map.get(asset_id)
-                        if media_blob:
-                            file_data = media_blob.get_file_data()
-                        else:
-                            if not asset.file_path or not os.path.exists(asset.file_path):
-                                current_app.logger.warning(f"File not found for asset {asset_id}")
-                                failed_count += 1
-                                continue
-
-                            with open(asset.file_path, "rb") as f:
-                                file_data = f.read()
-
-                        # Sanitize filename to prevent path traversal
-                        base_filename = asset.filename or f"asset_{asset_id}"
-                        base_filename = os.path.basename(base_filename)  # Remove path components
-                        base_filename = base_filename.replace('..', '')   # Remove parent refs
-                        base_filename = ''.join(c for c in base_filename if c.isprintable() and c not in '"\\')
-                        base_filename = base_filename[:200]  # Limit length
-                        if not base_filename:
-                            base_filename = f"asset_{asset_id}"
-
-                        zip_filename = base_filename
-
-                        # Handle duplicates
-                        counter = 1
-                        while zip_filename in zip_file.namelist():
-                            name, ext = os.path.splitext(base_filename)
-                            zip_filename = f"{name}_{counter}{ext}"
-                            counter += 1
-
-                        # Add file to ZIP
-                        zip_file.writestr(zip_filename, file_data)
-                        added_count += 1
-
-                        # Update progress
-                        download_progress[job_id] = {
-                            'total': len(asset_ids),
-                            'processed': added_count + failed_count,
-                            'added': added_count,
-                            'failed': failed_count,
-                            'status': 'processing',
-                            'message': f'Adding files to ZIP... ({added_count}/{len(asset_ids)})'
-                        }
-
-                    except (IOError, OSError) as e:
-                        current_app.logger.error(f"I/O error for asset {asset_id}: {e}")
-                        failed_count += 1
-                    except Exception as e:
-                        current_app.logger.error(f"Error adding asset {asset_id} to ZIP: {e}")
+        for asset_id in asset_ids:
+            try:
+                # Validate asset_id
+                try:
+                    asset_id = int(asset_id)
+                except (ValueError, TypeError):
+                    current_app.logger.warning(f"Invalid asset_id: {asset_id}")
+                    failed_count += 1
+                    continue
+
+                asset = asset_map.get(asset_id)
+                if not asset:
+                    current_app.logger.warning(f"Asset {asset_id} not found")
+                    failed_count += 1
+                    continue
+
+                # Access control
+                if asset.user_id is not None:
+                    not_owner = asset.user_id != getattr(current_user, "id", None)
+                    not_admin = not getattr(current_user, "is_admin", lambda: False)()
+                    if not current_user.is_authenticated or (not_owner and not_admin):
+                        current_app.logger.warning(f"Access denied for asset {asset_id}")
                         failed_count += 1
+                        continue
+
+                # Size checks
+                file_size = asset.file_size or 0
+                if file_size > MAX_SINGLE_FILE_SIZE:
+                    current_app.logger.warning(f"File too large: {asset_id} ({file_size} bytes)")
+                    failed_count += 1
+                    continue
+
+                total_size += file_size
+                if total_size > MAX_TOTAL_DOWNLOAD_SIZE:
+                    current_app.logger.warning(f"Total size limit exceeded at asset {asset_id}")
+                    break
+
+                # Chunk source: plain files are read from disk, encrypted or
+                # database payloads window by window from the store
+                media_blob = blob_map.get(asset_id)
+                source_path = media_blob.get_file_path() if media_blob else None
+                if media_blob and source_path:
+                    open_chunks = file_chunks(source_path)
+                    entry_size = os.path.getsize(source_path)
+                elif media_blob:
+                    entry_size = media_blob.get_file_size()
+                    open_chunks = _blob_chunks(app, media_blob, entry_size)
+                elif asset.file_path and os.path.exists(asset.file_path):
+                    open_chunks = file_chunks(asset.file_path)
+                    entry_size = os.path.getsize(asset.file_path)
+                else:
+                    current_app.logger.warning(f"File not found for asset {asset_id}")
+                    failed_count += 1
+                    continue
+
+                # Sanitize filename to prevent path traversal
+                base_filename = asset.filename or f"asset_{asset_id}"
+                base_filename = os.path.basename(base_filename)  # Remove path components
+                base_filename = base_filename.replace('..', '')   # Remove parent refs
+                base_filename = ''.join(c for c in base_filename if c.isprintable() and c not in '"\\')
+                base_filename = base_filename[:200]  # Limit length
+                if not base_filename:
+                    base_filename = f"asset_{asset_id}"
+
+                zip_filename = base_filename
+
+                # Handle duplicates
+                counter = 1
+                while zip_filename in used_names:
+                    name, ext = os.path.splitext(base_filename)
+                    zip_filename = f"{name}_{counter}{ext}"
+                    counter += 1
+                used_names.add(zip_filename)
+
+                # Stored or deflated per entry: JPEG/MP4 etc. are not worth deflating
+                mime_type = media_blob.mime_type if media_blob else mimetypes.guess_type(zip_filename)[0]
+                entries.append(ZipEntry(
+                    zip_filename,
+                    open_chunks,
+                    size=entry_size,
+                    modified=asset.downloaded_at,
+                    mime_type=mime_type,
+                ))
+                if media_blob:
+                    media_blob.record_access()
+
+            except (IOError, OSError) as e:
+                current_app.logger.error(f"I/O error for asset {asset_id}: {e}")
+                failed_count += 1
+            except Exception as e:
+                current_app.logger.error(f"Error adding asset {asset_id} to ZIP: {e}")
+                failed_count += 1
 
-            # Update progress to complete
+        if not entries:
+            download_progress.pop(job_id, None)
+            return jsonify({"error": "No files could be added to download"}), 404
+
+        # Create filename with timestamp
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        zip_filename = f"assets_download_{timestamp}.zip"
+        user_label = getattr(current_user, 'id', 'anonymous')
+        counts = {'added': 0, 'failed': failed_count}
+
+        def on_entry(entry, ok):
+            counts['added' if ok else 'failed'] += 1
             download_progress[job_id] = {
                 'total': len(asset_ids),
-                'processed': len(asset_ids),
-                'added': added_count,
-                'failed': failed_count,
-                'status': 'complete' if added_count > 0 else 'failed',
-                'message': f'ZIP created: {added_count} files' if added_count > 0 else 'No files added'
+                'processed': counts['added'] + counts['failed'],
+                'added': counts['added'],
+                'failed': counts['failed'],
+                'status': 'processing',
+                'message': f"Adding files to ZIP... ({counts['added']}/{len(asset_ids)})"
             }
 
-            if added_count == 0:
-                os.unlink(temp_path)
-                os.rmdir(temp_dir)
-                # Clean up progress
-                download_progress.pop(job_id, None)
-                return jsonify({"error": "No files could be added to download"}), 404
-
-            # Create filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            zip_filename = f"assets_download_{timestamp}.zip"
-
-            duration = time.time() - start_time
-            current_app.logger.info(
-                f"Bulk download complete: user={getattr(current_user, 'id', 'anonymous')}, "
-                f"added={added_count}, failed={failed_count}, size={total_size} bytes, "
-                f"duration={duration:.2f}s"
-            )
-
-            # Stream the file and delete after
-            def generate():
-                try:
-                    with open(temp_path, 'rb') as f:
-                        while True:
-                            chunk = f.read(8192)
-                            if not chunk:
-                                break
-                            yield chunk
-                finally:
-                    # Clean up temp file and directory
-                    try:
-                        os.unlink(temp_path)
-                        os.rmdir(temp_dir)
-                    except Exception as e:
-                        current_app.logger.error(f"Failed to cleanup temp files: {e}")
-
-            # Use RFC 5987 encoding for filename to prevent header injection
-            encoded_filename = urllib.parse.quote(zip_filename.encode('utf-8'))
-
-            response = Response(generate(), mimetype='application/zip')
-            response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{encoded_filename}"
-            response.headers['X-Files-Added'] = str(added_count)
-            response.headers['X-Files-Failed'] = str(failed_count)
-            response.headers['X-Job-ID'] = job_id  # Send job_id for progress tracking
-
-            # Clean up progress after a delay (30 seconds)
-            import threading
-            def cleanup_progress():
-                import time
-                time.sleep(30)
-                download_progress.pop(job_id, None)
-            threading.Thread(target=cleanup_progress, daemon=True).start()
-
-            return response
-
-        except Exception as e:
-            # Clean up on error
+        def generate():
+            # Archive bytes go out as each entry is read; nothing is staged on disk
+            status = 'failed'
             try:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-                if os.path.exists(temp_dir):
-                    os.rmdir(temp_dir)
-            except Exception as cleanup_error:
-                current_app.logger.error(f"Cleanup error: {cleanup_error}")
-            raise
+                yield from stream_zip(entries, on_entry=on_entry)
+                status = 'complete' if counts['added'] else 'failed'
+            except Exception as e:
+                app.logger.error(f"Bulk download stream error: {e}")
+            finally:
+                download_progress[job_id] = {
+                    'total': len(asset_ids),
+                    'processed': len(asset_ids),
+                    'added': counts['added'],
+                    'failed': counts['failed'],
+                    'status': status,
+                    'message': f"ZIP streamed: {counts['added']} files" if counts['added'] else 'No files added'
+                }
+                app.logger.info(
+                    f"Bulk download complete: user={user_label}, "
+                    f"added={counts['added']}, failed={counts['failed']}, size={total_size} bytes, "
+                    f"duration={time.time() - start_time:.2f}s"
+                )
+
+                # Clean up progress after a delay (30 seconds)
+                import threading
+                def cleanup_progress():
+                    time.sleep(30)
+                    download_progress.pop(job_id, None)
+                threading.Thread(target=cleanup_progress, daemon=True).start()
+
+        # Use RFC 5987 encoding for filename to prevent header injection
+        encoded_filename = urllib.parse.quote(zip_filename.encode('utf-8'))
+
+        response = Response(generate(), mimetype='application/zip')
+        response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{encoded_filename}"
+        response.headers['X-Files-Added'] = str(len(entries))
+        response.headers['X-Files-Failed'] = str(failed_count)
+        response.headers['X-Job-ID'] = job_id  # Send job_id for progress tracking
+        # Ask reverse proxies not to buffer the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
 
     except Exception as e:
         current_app.logger.error(f"Bulk download error: {e}")
@@ -99,6 +99,62 @@ def get_jobs():
         return jsonify({"success": False, "error": str(e)})
 
 
+@jobs_bp.route("/api/jobs/<job_id>/results")
+@optional_auth
+def get_job_results(job_id):
+    """Paged per-file results for a job; list/status endpoints never load these"""
+    try:
+        job = db_job_manager.get_job(job_id)
+        if not job:
+            return jsonify({"success": False, "error": "Job not found"}), 404
+        if job.get("user_id") is not None:
+            if not current_user.is_authenticated or (
+                job.get("user_id") != current_user.id and not current_user.is_admin()
+            ):
+                return jsonify({"success": False, "error": "Access denied"}), 403
+
+        limit = min(int(request.args.get("limit", 100)), 1000)
+        offset = max(int(request.args.get("offset", 0)), 0)
+        include_files = request.args.get("files", "true") != "false"
+        results = db_job_manager.get_job_results(
+            job_id, include_files=include_files, limit=limit, offset=offset
+        )
+        return jsonify(
+            {
+                "success": True,
+                "job_id": job_id,
+                "results": results or {},
+                "limit": limit,
+                "offset": offset,
+            }
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
+@jobs_bp.route("/api/jobs/<job_id>/events")
+@optional_auth
+def get_job_events(job_id):
+    """Tail a job's live log; pass back `cursor` as `after` to get only new events"""
+    try:
+        job = db_job_manager.get_job(job_id)
+        if not job:
+            return jsonify({"success": False, "error": "Job not found"}), 404
+        if job.get("user_id") is not None:
+            if not current_user.is_authenticated or (
+                job.get("user_id") != current_user.id and not current_user.is_admin()
+            ):
+                return jsonify({"success": False, "error": "Access denied"}), 403
+
+        after = request.args.get("after", type=int)
+        limit = request.args.get("limit", 100, type=int)
+        kind = request.args.get("kind")
+        page = db_job_manager.get_job_events(job_id, after=after, limit=limit, kind=kind)
+        return jsonify({"success": True, "job_id": job_id, **page})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+
+
 @jobs_bp.route("/api/jobs/<job_id>", methods=["DELETE"])
 @optional_auth
 def cancel_job(job_id):
@@ -861,10 +861,12 @@ def get_job_progress(job_id):
         try:
             if job.get("sources_data"):
                 metadata = json.loads(job.get("sources_data"))
-            elif job.get("live_updates"):
-                metadata = {"log_entries": json.loads(job.get("live_updates"))}
         except Exception:
             metadata = {}
+        if "log_entries" not in metadata:
+            # Newest first, matching the legacy live_updates ordering
+            events = db_job_manager.get_job_events(job_id, limit=20, kind="update")["events"]
+            metadata["log_entries"] = list(reversed(events))
         # Calculate elapsed time
         import time as time_module
         job_data = job.get("data", {})
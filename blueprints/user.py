@@ -162,6 +162,7 @@ def get_stats():
         total_images = 0
         total_videos = 0
         total_size = 0
+        storage_saved = 0
         success_rate = 85
 
         if current_user.is_authenticated:
@@ -174,16 +175,18 @@ def get_stats():
                 total_images = stats.get("total_images", 0)
                 total_videos = stats.get("total_videos", 0)
                 total_size = stats.get("total_size_bytes", 0)
+                storage_saved = stats.get("storage", {}).get("bytes_saved", 0)
             except Exception:
                 # Use defaults if asset manager fails
                 pass
 
-            # Try to get job statistics
+            # Try to get job statistics (single aggregate row)
             try:
-                user_jobs = db_job_manager.get_user_jobs(user_id, limit=100)
-                if user_jobs:
-                    completed_jobs = [j for j in user_jobs if j.get("status") == "completed"]
-                    success_rate = int((len(completed_jobs) / len(user_jobs)) * 100)
+                job_stats = db_job_manager.get_job_statistics(user_id=user_id)
+                if job_stats.get("total_jobs"):
+                    success_rate = int(
+                        (job_stats.get("completed_jobs", 0) / job_stats["total_jobs"]) * 100
+                    )
             except Exception:
                 # Use default success rate if job manager fails
                 pass
@@ -197,6 +200,7 @@ def get_stats():
                     "total_images": total_images,
                     "total_videos": total_videos,
                     "total_size": total_size,
+                    "storage_saved": storage_saved,
                     "success_rate": success_rate,
                 },
             }
@@ -211,6 +215,7 @@ def get_stats():
                     "total_images": 0,
                     "total_videos": 0,
                     "total_size": 0,
+                    "storage_saved": 0,
                     "success_rate": 85,
                 },
             }
@@ -381,19 +381,18 @@ class DatabaseAssetManager:
     @staticmethod
     def generate_thumbnail(asset_id, max_size=(200, 200)):
         """
-        Generate and store a thumbnail for an asset
+        Generate and store the thumbnail pyramid for an asset
 
         Args:
             asset_id: ID of the asset
-            max_size: Maximum size tuple (width, height)
+            max_size: Unused; sizes come from THUMBNAIL_SIZES
 
         Returns:
             True if successful, False otherwise
         """
         try:
-            import io
-
-            from PIL import Image
+            from db_asset_manager import generate_thumbnail_pyramid
+            from models import MediaThumbnail
 
             asset = Asset.query.get(asset_id)
             if not asset:
@@ -404,30 +403,15 @@ class DatabaseAssetManager:
                 return False
 
             # Get the original image data
-            content, _ = DatabaseAssetManager.get_asset_content(asset_id)
+            content, content_type = DatabaseAssetManager.get_asset_content(asset_id)
             if not content:
                 return False
 
-            # Create thumbnail
-            img = Image.open(io.BytesIO(content))
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-            # Save thumbnail to bytes
-            thumb_io = io.BytesIO()
-            img.save(thumb_io, format='JPEG', quality=85, optimize=True)
-            thumb_data = thumb_io.getvalue()
-
-            # Store thumbnail in database
-            thumb_blob = MediaBlob(
-                data=thumb_data,
-                content_type='image/jpeg',
-                file_size=len(thumb_data)
-            )
-            db.session.add(thumb_blob)
-            db.session.flush()
-
-            # Update asset with thumbnail reference
-            asset.thumbnail_blob_id = thumb_blob.id
+            # One decode for every size/format
+            variants = generate_thumbnail_pyramid(content, content_type or 'image/jpeg')
+            if not variants:
+                return False
+            MediaThumbnail.store_pyramid(asset_id, variants)
             db.session.commit()
 
             print(f"[SUCCESS] Generated thumbnail for asset: {asset_id}")
@@ -5,10 +5,22 @@ import os
 import uuid
 import json
 import mimetypes
-import hashlib
+import shutil
+import tempfile
+from contextlib import contextmanager
 from datetime import datetime
 from sqlalchemy import func
-from models import Asset, MediaBlob, db
+from models import Asset, MediaBlob, MediaContent, MediaThumbnail, db
+from blob_store import BACKEND_FILESYSTEM, CHUNK_SIZE, get_storage_backend
+from utils.media_info import probe_media
+from utils.perceptual_hash import NEAR_DUPLICATE_DISTANCE, compute_hashes, perceptual_index
+from utils.thumbnail_generator import (
+    NEGOTIATED_IMAGE_FORMATS,
+    THUMBNAIL_SIZES,
+    can_encode,
+    generate_pyramid,
+    open_for_thumbnail,
+)
 from io import BytesIO
 from PIL import Image
 import logging
@@ -16,11 +28,74 @@ import logging
 # Setup logger
 logger = logging.getLogger(__name__)
 
-def generate_thumbnail(file_data, content_type, max_size=(200, 200)):
+class DroppedAsset:
+    """add_asset/save_asset result for a file dropped as a near-duplicate
+
+    Falsy like a failed add (no asset was created), but distinguishable from
+    one, so downloaders can leave the file out of their counts.
+    """
+
+    def __init__(self, duplicate_of):
+        self.duplicate_of = duplicate_of
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"<DroppedAsset duplicate_of={self.duplicate_of}>"
+
+@contextmanager
+def _local_media_path(source):
+    """Yield a file path for a source; only non-path sources are copied to a temp file"""
+    if isinstance(source, str):
+        yield source
+        return
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
+        if isinstance(source, (bytes, bytearray)):
+            tmp_file.write(source)
+        else:
+            shutil.copyfileobj(source, tmp_file, CHUNK_SIZE)
+        tmp_path = tmp_file.name
+    try:
+        yield tmp_path
+    finally:
+        # Clean up temp file
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def generate_thumbnail_pyramid(source, content_type):
+    """All thumbnail sizes/formats for an image or video from a single decode
+
+    Returns:
+        list of variant dicts (see utils.thumbnail_generator.generate_pyramid)
+    """
+    try:
+        if content_type and content_type.startswith('image/'):
+            return generate_pyramid(source)
+
+        if content_type and content_type.startswith('video/'):
+            from utils.video_thumbnail import generate_video_thumbnail
+
+            # One frame at the largest size, then the pyramid is built from it
+            with _local_media_path(source) as video_path:
+                frame = generate_video_thumbnail(video_path, THUMBNAIL_SIZES['large'])
+            return generate_pyramid(frame) if frame else []
+    except Exception as e:
+        logger.error(f"Error generating thumbnail pyramid: {e}")
+    return []
+
+def store_thumbnail_pyramid(asset_id, source, content_type):
+    """Generate and stage an asset's thumbnail pyramid (caller commits); returns variant count"""
+    variants = generate_thumbnail_pyramid(source, content_type)
+    if variants:
+        MediaThumbnail.store_pyramid(asset_id, variants)
+    return len(variants)
+
+def generate_thumbnail(source, content_type, max_size=(200, 200)):
     """Generate thumbnail for images and videos
 
     Args:
-        file_data: Raw bytes of the file
+        source: File path, readable binary file object, or raw bytes of the file
         content_type: MIME type of the file
         max_size: Maximum size of thumbnail (width, height)
 
@@ -30,17 +105,8 @@ def generate_thumbnail(file_data, content_type, max_size=(200, 200)):
     try:
         # Handle images
         if content_type and content_type.startswith('image/'):
-            # Open image from bytes
-            img = Image.open(BytesIO(file_data))
-
-            # Convert RGBA to RGB if needed (for JPEG output)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # Create a white background
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
+            # Reduced-resolution JPEG decode, flattened to RGB for JPEG output
+            img = open_for_thumbnail(source, max_size)
 
             # Generate thumbnail maintaining aspect ratio
             img.thumbnail(max_size, Image.Resampling.LANCZOS)
@@ -52,75 +118,211 @@ def generate_thumbnail(file_data, content_type, max_size=(200, 200)):
 
             return thumbnail_bytes, 'image/jpeg'
 
-        # Handle videos (extract first frame)
+        # Handle videos (representative frame, decoded straight from the file)
         elif content_type and content_type.startswith('video/'):
+            from utils.video_thumbnail import generate_video_thumbnail
+
             try:
-                # Try using opencv if available
-                import cv2
-                import numpy as np
-                import tempfile
-
-                # Write video data to temp file (cv2 needs file path)
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-                    tmp_file.write(file_data)
-                    tmp_path = tmp_file.name
-
-                try:
-                    # Open video
-                    cap = cv2.VideoCapture(tmp_path)
-
-                    # Read first frame
-                    ret, frame = cap.read()
-                    cap.release()
-
-                    if ret:
-                        # Convert BGR to RGB
-                        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-                        # Convert to PIL Image
-                        img = Image.fromarray(frame)
-
-                        # Generate thumbnail
-                        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-                        # Save to bytes
-                        output = BytesIO()
-                        img.save(output, format='JPEG', quality=85, optimize=True)
-                        thumbnail_bytes = output.getvalue()
-
-                        return thumbnail_bytes, 'image/jpeg'
-                finally:
-                    # Clean up temp file
-                    if os.path.exists(tmp_path):
-                        os.remove(tmp_path)
-
-            except ImportError:
-                logger.warning("OpenCV not available for video thumbnail generation")
+                with _local_media_path(source) as video_path:
+                    thumbnail_bytes = generate_video_thumbnail(video_path, max_size)
+                if thumbnail_bytes:
+                    return thumbnail_bytes, 'image/jpeg'
             except Exception as e:
-                logger.warning(f"Failed to generate video thumbnail with OpenCV: {e}")
+                logger.warning(f"Failed to generate video thumbnail: {e}")
 
     except Exception as e:
         logger.error(f"Error generating thumbnail: {e}")
 
     return None, None
 
+def sniff_content_type(filepath):
+    """Detect content type from the file signature (reads only the header)"""
+    try:
+        with open(filepath, 'rb') as f:
+            header = f.read(16)
+    except OSError:
+        return None
+
+    if len(header) < 12:
+        return None
+    # Check common image/video signatures
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    elif header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    elif header.startswith(b'GIF87a') or header.startswith(b'GIF89a'):
+        return 'image/gif'
+    elif header.startswith(b'RIFF') and header[8:12] == b'WEBP':
+        return 'image/webp'
+    elif header.startswith(b'BM'):
+        return 'image/bmp'
+    elif header[4:12] == b'ftypmp42' or header[4:12] == b'ftypisom':
+        return 'video/mp4'
+    elif header.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'video/webm'
+    return None
+
+def _build_media_blob(asset_id, user_id, filepath, content_type):
+    """Create and flush the MediaBlob for a new asset in the configured storage backend
+
+    The file is never read whole: the bytes are hashed and written in
+    CHUNK_SIZE pieces, either into the content-addressed blob store or
+    appended to media_data in the database. Thumbnails live in
+    media_thumbnails (see store_thumbnail_pyramid).
+    """
+    if get_storage_backend() == BACKEND_FILESYSTEM:
+        # Content already stored for any user is referenced, not written again
+        content_key, file_hash, byte_size, deduplicated = MediaContent.acquire_file(filepath, owner_id=user_id)
+        if deduplicated:
+            logger.info(f"Reusing stored content {content_key[:12]} for asset {asset_id}")
+        media_blob = MediaBlob(
+            asset_id=asset_id,
+            user_id=user_id,
+            mime_type=content_type,
+            byte_size=byte_size,
+            file_hash=file_hash,
+            content_key=content_key,
+            storage_backend=BACKEND_FILESYSTEM,
+            created_at=datetime.utcnow()
+        )
+        db.session.add(media_blob)
+        db.session.flush()
+    else:
+        media_blob = MediaBlob(
+            asset_id=asset_id,
+            user_id=user_id,
+            media_data=b'',
+            mime_type=content_type,
+            created_at=datetime.utcnow()
+        )
+        db.session.add(media_blob)
+        db.session.flush()
+        with open(filepath, 'rb') as f:
+            media_blob.file_hash, media_blob.byte_size = media_blob.write_media_stream(f)
+    return media_blob
+
+def _prerender_watermark(user_id, media_blob, filepath, file_type):
+    """Render the watermarked variants at ingest for owners who will be shown it
+
+    Renders the JPEG plus every format inline views negotiate
+    (IMAGE_NEGOTIATE_FORMATS), reading the original once. Enabled with
+    WATERMARK_PRERENDER=true; otherwise each variant is rendered on first
+    view and cached then.
+    """
+    if file_type != 'image' or not media_blob or not media_blob.file_hash:
+        return
+    if os.getenv('WATERMARK_PRERENDER', 'false').lower() != 'true':
+        return
+    from models import User
+    from watermark import should_watermark_for, watermark_overlay
+
+    owner = User.query.get(user_id) if user_id is not None else None
+    if owner is not None and not should_watermark_for(owner):
+        return
+
+    original = []
+
+    def load_original():
+        if not original:
+            with open(filepath, 'rb') as f:
+                original.append(f.read())
+        return original[0]
+
+    image_formats = ['jpeg'] + [name for name in NEGOTIATED_IMAGE_FORMATS if name != 'jpeg' and can_encode(name)]
+    for image_format in image_formats:
+        try:
+            watermark_overlay.get_cached_variant(media_blob.file_hash, load_original, image_format=image_format)
+        except Exception as e:
+            logger.warning(f"Failed to pre-render {image_format} watermark for {filepath}: {e}")
+
+def _near_duplicate_drop_default():
+    return os.getenv('NEAR_DUPLICATE_DROP', 'false').lower() == 'true'
+
+def _find_near_duplicate(user_id, phash, max_distance=NEAR_DUPLICATE_DISTANCE):
+    """Id of a live asset of this user that looks like the same picture, or None"""
+    for distance, candidate_id in perceptual_index.find(user_id, phash, max_distance):
+        # The index can hold assets deleted since it was built
+        if Asset.query.filter_by(id=candidate_id, is_deleted=False).count():
+            return candidate_id
+    return None
+
+def _drop_near_duplicate(user_id, filepath, hashes):
+    """Remove a freshly downloaded file that near-duplicates an existing asset
+
+    Returns the existing asset id when the file was dropped, otherwise None.
+    """
+    if not hashes:
+        return None
+    duplicate_of = _find_near_duplicate(user_id, hashes['phash'])
+    if duplicate_of is None:
+        return None
+    try:
+        os.remove(filepath)
+    except OSError as e:
+        logger.warning(f"Could not remove near-duplicate file {filepath}: {e}")
+    print(f"[ASSETS] Dropped near-duplicate {os.path.basename(filepath)} (matches asset {duplicate_of})")
+    return duplicate_of
+
+def find_similar_assets(asset_id, max_distance=NEAR_DUPLICATE_DISTANCE, limit=20):
+    """Assets of the same owner whose pHash is within max_distance of this one
+
+    Returns:
+        list of asset dicts with an added 'distance' (Hamming bits, 0 = identical)
+    """
+    try:
+        asset = Asset.query.get(int(asset_id))
+        if not asset or asset.is_deleted or not asset.phash:
+            return []
+
+        matches = [
+            (distance, candidate_id)
+            for distance, candidate_id in perceptual_index.find(asset.user_id, asset.phash, max_distance)
+            if candidate_id != asset.id
+        ]
+        if not matches:
+            return []
+
+        distances = dict((candidate_id, distance) for distance, candidate_id in reversed(matches))
+        candidates = Asset.query.filter(
+            Asset.id.in_(list(distances.keys())), Asset.is_deleted == False
+        ).all()
+        candidates.sort(key=lambda a: (distances[a.id], a.id))
+
+        result = []
+        for candidate in candidates[:limit]:
+            data = candidate.to_dict()
+            data['id'] = str(candidate.id)
+            data['distance'] = distances[candidate.id]
+            result.append(data)
+        return result
+
+    except Exception as e:
+        print(f"[ERROR] Failed to find similar assets: {e}")
+        return []
+
 def add_asset(job_id, filepath, file_type, metadata=None):
-    """Add asset to database"""
+    """Add asset to database
+
+    Returns the new asset id as a string, a DroppedAsset if the file was
+    dropped as a near-duplicate, or None on failure.
+    """
     try:
         # Extract user_id from metadata or default
         user_id = 1  # Default user for testing
+        drop_near_duplicates = _near_duplicate_drop_default()
         if metadata and isinstance(metadata, dict):
             user_id = metadata.get('user_id', 1)
+            if 'drop_near_duplicates' in metadata:
+                metadata = dict(metadata)
+                requested = metadata.pop('drop_near_duplicates')
+                if requested is not None:
+                    drop_near_duplicates = bool(requested)
         
         filename = os.path.basename(filepath)
         
-        # Read file if exists
-        file_data = None
-        file_size = 0
-        if os.path.exists(filepath):
-            with open(filepath, 'rb') as f:
-                file_data = f.read()
-            file_size = len(file_data)
+        # Check file without reading it into memory
+        has_file = os.path.exists(filepath)
+        file_size = os.path.getsize(filepath) if has_file else 0
         
         # Determine content type - ALWAYS detect from file, not from generic file_type parameter
         content_type = None
@@ -130,22 +332,8 @@ def add_asset(job_id, filepath, file_type, metadata=None):
             content_type, _ = mimetypes.guess_type(filename)
 
         # If that fails, detect from file signature (magic bytes)
-        if not content_type and file_data and len(file_data) >= 12:
-            # Check common image/video signatures
-            if file_data.startswith(b'\xff\xd8\xff'):
-                content_type = 'image/jpeg'
-            elif file_data.startswith(b'\x89PNG\r\n\x1a\n'):
-                content_type = 'image/png'
-            elif file_data.startswith(b'GIF87a') or file_data.startswith(b'GIF89a'):
-                content_type = 'image/gif'
-            elif file_data.startswith(b'RIFF') and file_data[8:12] == b'WEBP':
-                content_type = 'image/webp'
-            elif file_data.startswith(b'BM'):
-                content_type = 'image/bmp'
-            elif file_data[4:12] == b'ftypmp42' or file_data[4:12] == b'ftypisom':
-                content_type = 'video/mp4'
-            elif file_data.startswith(b'\x1a\x45\xdf\xa3'):
-                content_type = 'video/webm'
+        if not content_type and has_file:
+            content_type = sniff_content_type(filepath)
 
         # Last resort: use generic type
         if not content_type:
@@ -163,6 +351,16 @@ def add_asset(job_id, filepath, file_type, metadata=None):
         file_extension = os.path.splitext(filename)[1].lower()
         if file_extension.startswith('.'):
             file_extension = file_extension[1:]
+
+        # Perceptual hashes for near-duplicate detection
+        hashes = compute_hashes(filepath) if has_file and file_type_category == 'image' else None
+        if drop_near_duplicates:
+            duplicate_of = _drop_near_duplicate(user_id, filepath, hashes)
+            if duplicate_of is not None:
+                return DroppedAsset(duplicate_of)
+
+        # Dimensions and duration from headers, so queries can filter on them
+        media_info = probe_media(filepath, content_type) if has_file else {}
         
         # Create Asset record
         asset = Asset(
@@ -176,33 +374,21 @@ def add_asset(job_id, filepath, file_type, metadata=None):
             source_name=metadata.get('source', 'unknown') if metadata else 'unknown',
             source_url=metadata.get('original_url', '') if metadata else '',
             downloaded_at=datetime.utcnow(),
-            stored_in_db=bool(file_data),
-            asset_metadata=json.dumps(metadata) if metadata else None
+            stored_in_db=has_file and file_size > 0,
+            asset_metadata=json.dumps(metadata) if metadata else None,
+            **media_info,
+            **(hashes or {})
         )
         
         db.session.add(asset)
         db.session.flush()
         
         # Create MediaBlob if we have file data
-        if file_data:
-            file_hash = hashlib.sha256(file_data).hexdigest()
-
-            # Generate thumbnail
-            thumbnail_data, thumbnail_mime = generate_thumbnail(file_data, content_type)
-
-            media_blob = MediaBlob(
-                asset_id=asset.id,
-                user_id=user_id,
-                media_data=file_data,
-                mime_type=content_type,
-                file_hash=file_hash,
-                thumbnail_data=thumbnail_data,
-                thumbnail_mime_type=thumbnail_mime,
-                created_at=datetime.utcnow()
-            )
-            db.session.add(media_blob)
-
-            if thumbnail_data:
+        media_blob = None
+        if asset.stored_in_db:
+            media_blob = _build_media_blob(asset.id, user_id, filepath, content_type)
+
+            if store_thumbnail_pyramid(asset.id, filepath, content_type):
                 # Mark this as a thumbnail by updating asset metadata
                 metadata_dict = json.loads(asset.asset_metadata) if asset.asset_metadata else {}
                 metadata_dict['has_thumbnail'] = True
@@ -210,6 +396,9 @@ def add_asset(job_id, filepath, file_type, metadata=None):
                 logger.info(f"Generated thumbnail for asset {asset.id}")
 
         db.session.commit()
+        if hashes:
+            perceptual_index.add(user_id, asset.id, hashes['phash'])
+        _prerender_watermark(user_id, media_blob, filepath, file_type_category)
         print(f"[ASSETS] Added asset {asset.id}: {filename}")
         return str(asset.id)
         
@@ -218,8 +407,22 @@ def add_asset(job_id, filepath, file_type, metadata=None):
         db.session.rollback()
         return None
 
-def get_assets(user_id=None, file_type=None, limit=100, offset=0):
-    """Get assets from database"""
+# get_assets range filters: keyword -> (column, comparison)
+RANGE_FILTERS = {
+    'min_width': ('width', '>='),
+    'max_width': ('width', '<='),
+    'min_height': ('height', '>='),
+    'max_height': ('height', '<='),
+    'min_duration': ('duration', '>='),
+    'max_duration': ('duration', '<='),
+}
+
+def get_assets(user_id=None, file_type=None, limit=100, offset=0, **range_filters):
+    """Get assets from database
+
+    Optional min_/max_ width, height and duration filters are applied in
+    SQL (backed by the composite dimension indexes).
+    """
     try:
         print(f"[DEBUG] get_assets called with user_id={user_id}, file_type={file_type}, limit={limit}, offset={offset}")
         query = Asset.query.filter_by(is_deleted=False)
@@ -232,6 +435,13 @@ def get_assets(user_id=None, file_type=None, limit=100, offset=0):
         
         if file_type:
             query = query.filter_by(file_type=file_type)
+
+        for name, value in range_filters.items():
+            if value is None or name not in RANGE_FILTERS:
+                continue
+            column_name, op = RANGE_FILTERS[name]
+            column = getattr(Asset, column_name)
+            query = query.filter(column >= value if op == '>=' else column <= value)
         
         query = query.order_by(Asset.downloaded_at.desc())
         
@@ -255,7 +465,10 @@ def get_assets(user_id=None, file_type=None, limit=100, offset=0):
                 'file_extension': asset.file_extension or '',
                 'metadata': json.loads(asset.asset_metadata) if asset.asset_metadata else {},
                 'created_at': asset.downloaded_at.isoformat() if asset.downloaded_at else None,
-                'file_size': asset.file_size
+                'file_size': asset.file_size,
+                'width': asset.width,
+                'height': asset.height,
+                'duration': asset.duration
             })
         
         return result
@@ -336,6 +549,7 @@ def bulk_delete_assets(asset_ids, user_id=None):
     try:
         deleted_count = 0
         deleted_files = []
+        released_keys = []
 
         for asset_id in asset_ids:
             query = Asset.query.filter_by(id=int(asset_id), is_deleted=False)
@@ -356,6 +570,7 @@ def bulk_delete_assets(asset_ids, user_id=None):
                 # Delete MediaBlob if exists
                 media_blob = MediaBlob.query.filter_by(asset_id=asset.id).first()
                 if media_blob:
+                    released_keys.append(media_blob.content_key)
                     db.session.delete(media_blob)
                     logger.info(f"Deleted MediaBlob for asset {asset.id}")
 
@@ -364,6 +579,8 @@ def bulk_delete_assets(asset_ids, user_id=None):
                 deleted_count += 1
 
         db.session.commit()
+        # Drop blob store files no longer referenced by any MediaBlob
+        MediaBlob.release_content(released_keys)
         logger.info(f"Bulk deleted {deleted_count} assets, removed {len(deleted_files)} files")
         return deleted_count
 
@@ -449,13 +666,9 @@ def save_asset(**kwargs):
         metadata = kwargs.get('metadata', {})
         title = kwargs.get('title', '')
         
-        # Read file if exists
-        file_data = None
-        file_size = kwargs.get('file_size', 0)
-        if file_path and os.path.exists(file_path):
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
-            file_size = len(file_data)
+        # Check file without reading it into memory
+        has_file = bool(file_path) and os.path.exists(file_path)
+        file_size = os.path.getsize(file_path) if has_file else kwargs.get('file_size', 0)
         
         # Auto-detect content type - prioritize actual file detection over passed parameter
         detected_type = None
@@ -465,22 +678,8 @@ def save_asset(**kwargs):
             detected_type, _ = mimetypes.guess_type(filename)
 
         # If that fails, detect from file signature (magic bytes)
-        if not detected_type and file_data and len(file_data) >= 12:
-            # Check common image/video signatures
-            if file_data.startswith(b'\xff\xd8\xff'):
-                detected_type = 'image/jpeg'
-            elif file_data.startswith(b'\x89PNG\r\n\x1a\n'):
-                detected_type = 'image/png'
-            elif file_data.startswith(b'GIF87a') or file_data.startswith(b'GIF89a'):
-                detected_type = 'image/gif'
-            elif file_data.startswith(b'RIFF') and file_data[8:12] == b'WEBP':
-                detected_type = 'image/webp'
-            elif file_data.startswith(b'BM'):
-                detected_type = 'image/bmp'
-            elif file_data[4:12] == b'ftypmp42' or file_data[4:12] == b'ftypisom':
-                detected_type = 'video/mp4'
-            elif file_data.startswith(b'\x1a\x45\xdf\xa3'):
-                detected_type = 'video/webm'
+        if not detected_type and has_file:
+            detected_type = sniff_content_type(file_path)
 
         # Use detected type if found, otherwise use passed content_type, otherwise default
         if detected_type:
@@ -505,6 +704,19 @@ def save_asset(**kwargs):
         full_metadata = metadata.copy() if metadata else {}
         if title:
             full_metadata['title'] = title
+        drop_near_duplicates = full_metadata.pop('drop_near_duplicates', None)
+        if drop_near_duplicates is None:
+            drop_near_duplicates = _near_duplicate_drop_default()
+
+        # Perceptual hashes for near-duplicate detection
+        hashes = compute_hashes(file_path) if has_file and file_type == 'image' else None
+        if drop_near_duplicates:
+            duplicate_of = _drop_near_duplicate(user_id, file_path, hashes)
+            if duplicate_of is not None:
+                return DroppedAsset(duplicate_of)
+
+        # Dimensions and duration from headers, so queries can filter on them
+        media_info = probe_media(file_path, content_type) if has_file else {}
         
         # Create Asset record
         asset = Asset(
@@ -518,33 +730,21 @@ def save_asset(**kwargs):
             source_url=original_url,
             source_name=source,
             downloaded_at=datetime.utcnow(),
-            stored_in_db=bool(file_data),
-            asset_metadata=json.dumps(full_metadata) if full_metadata else None
+            stored_in_db=has_file and file_size > 0,
+            asset_metadata=json.dumps(full_metadata) if full_metadata else None,
+            **media_info,
+            **(hashes or {})
         )
         
         db.session.add(asset)
         db.session.flush()
         
         # Create MediaBlob if we have file data
-        if file_data:
-            file_hash = hashlib.sha256(file_data).hexdigest()
-
-            # Generate thumbnail
-            thumbnail_data, thumbnail_mime = generate_thumbnail(file_data, content_type)
-
-            media_blob = MediaBlob(
-                asset_id=asset.id,
-                user_id=user_id,
-                media_data=file_data,
-                mime_type=content_type,
-                file_hash=file_hash,
-                thumbnail_data=thumbnail_data,
-                thumbnail_mime_type=thumbnail_mime,
-                created_at=datetime.utcnow()
-            )
-            db.session.add(media_blob)
-
-            if thumbnail_data:
+        media_blob = None
+        if asset.stored_in_db:
+            media_blob = _build_media_blob(asset.id, user_id, file_path, content_type)
+
+            if store_thumbnail_pyramid(asset.id, file_path, content_type):
                 # Mark this as a thumbnail by updating asset metadata
                 metadata_dict = full_metadata.copy() if full_metadata else {}
                 metadata_dict['has_thumbnail'] = True
@@ -552,6 +752,9 @@ def save_asset(**kwargs):
                 logger.info(f"Generated thumbnail for asset {asset.id}")
         
         db.session.commit()
+        if hashes:
+            perceptual_index.add(user_id, asset.id, hashes['phash'])
+        _prerender_watermark(user_id, media_blob, file_path, file_type)
         print(f"[ASSETS] Saved asset {asset.id}: {filename} from {source}")
         return str(asset.id)
         
@@ -569,6 +772,7 @@ class DBAssetManager:
     delete_asset = staticmethod(delete_asset)
     cleanup_missing_files = staticmethod(cleanup_missing_files)
     save_asset = staticmethod(save_asset)
+    find_similar_assets = staticmethod(find_similar_assets)
 
     @staticmethod
     def get_asset_statistics(user_id=None):
@@ -610,6 +814,13 @@ class DBAssetManager:
                     'file_size': asset.file_size
                 })
             
+            # Space saved by sharing identical content across users and jobs
+            try:
+                storage = MediaContent.get_savings()
+            except Exception as e:
+                logger.warning(f"Failed to get storage savings: {e}")
+                storage = {}
+
             stats = {
                 'total_assets': total_assets,
                 'total_images': image_count,
@@ -621,7 +832,8 @@ class DBAssetManager:
                     'other': other_count
                 },
                 'by_source': source_counts,
-                'recent_assets': recent_assets
+                'recent_assets': recent_assets,
+                'storage': storage
             }
             
             return stats
@@ -635,7 +847,8 @@ class DBAssetManager:
                 'total_size': 0,
                 'by_type': {},
                 'by_source': {},
-                'recent_assets': []
+                'recent_assets': [],
+                'storage': {}
             }
 
 # Create instance for import
@@ -7,10 +7,126 @@ import logging
 from datetime import datetime
 from flask import has_app_context
 
+from memory_job_store import BoundedJobStore
+
 logger = logging.getLogger(__name__)
 
 # Fallback in-memory storage for when database is unavailable
-MEMORY_JOBS = {}
+# (bounded LRU/TTL store, optionally spilled to SQLite via MEMORY_JOBS_SPILL_PATH)
+MEMORY_JOBS = BoundedJobStore.from_env()
+
+# Live events kept per job in the memory fallback
+MEMORY_EVENTS_PER_JOB = 200
+
+# Status buckets tracked by the rolling job statistics (JobStatistic)
+STATUS_COUNTERS = {
+    'pending': 'running_jobs',
+    'starting': 'running_jobs',
+    'running': 'running_jobs',
+    'downloading': 'running_jobs',
+    'processing': 'running_jobs',
+    'completed': 'completed_jobs',
+    'failed': 'failed_jobs',
+    'error': 'failed_jobs',
+    'cancelled': 'cancelled_jobs',
+}
+
+# Statuses whose downloads count towards total_downloaded
+FINISHED_JOB_STATUSES = tuple(
+    status for status, counter in STATUS_COUNTERS.items()
+    if counter in ('completed_jobs', 'failed_jobs', 'cancelled_jobs')
+)
+
+def _status_deltas(old_status, new_status):
+    """Counter deltas for a job moving from old_status to new_status"""
+    deltas = {}
+    old_counter = STATUS_COUNTERS.get(old_status)
+    new_counter = STATUS_COUNTERS.get(new_status)
+    if old_counter != new_counter:
+        if old_counter:
+            deltas[old_counter] = -1
+        if new_counter:
+            deltas[new_counter] = deltas.get(new_counter, 0) + 1
+    return deltas
+
+def _downloaded_delta(old_status, old_downloaded, new_status, new_downloaded):
+    """total_downloaded delta for a job update
+
+    Only finished jobs count, so the hot aggregate rows are written once when
+    a job finishes rather than on every progress tick.
+    """
+    old_total = old_downloaded if old_status in FINISHED_JOB_STATUSES else 0
+    new_total = new_downloaded if new_status in FINISHED_JOB_STATUSES else 0
+    return new_total - old_total
+
+def _count_job_statistics(scope, period):
+    """Counters for one (scope, period) aggregate, counted from scrape_jobs
+
+    Seeds a JobStatistic row when it is first created, so it starts from the
+    jobs that already exist rather than from zero. Pending changes in the
+    session (the job being created or updated) are flushed and included.
+    """
+    from models import JobStatistic, ScrapeJob, db
+    from datetime import timedelta
+    from sqlalchemy import case, func, select
+
+    finished_downloads = case((ScrapeJob.status.in_(FINISHED_JOB_STATUSES), ScrapeJob.downloaded), else_=0)
+    stmt = select(ScrapeJob.status, func.count(), func.sum(finished_downloads)).group_by(ScrapeJob.status)
+    if scope != 'all':
+        stmt = stmt.where(ScrapeJob.user_id == int(scope.split(':', 1)[1]))
+    if period != 'all':
+        day = datetime.strptime(period, '%Y-%m-%d')
+        stmt = stmt.where(ScrapeJob.created_at >= day, ScrapeJob.created_at < day + timedelta(days=1))
+
+    db.session.flush()
+    counters = {key: 0 for key in JobStatistic.COUNTERS}
+    for status, count, downloaded in db.session.execute(stmt):
+        counters['total_jobs'] += count
+        if STATUS_COUNTERS.get(status):
+            counters[STATUS_COUNTERS[status]] += count
+        counters['total_downloaded'] += downloaded or 0
+    return counters
+
+def _record_job_statistics(user_id, created_at, deltas):
+    """Apply counter deltas to the global/user, all-time/daily aggregate rows
+
+    Runs inside the caller's transaction (in a savepoint), so counters move
+    together with the job row. Failures are logged and never block the job update.
+    """
+    from models import JobStatistic, db
+    from sqlalchemy import update
+    from sqlalchemy.exc import IntegrityError
+
+    deltas = {key: value for key, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    day = (created_at or datetime.utcnow()).strftime('%Y-%m-%d')
+    scopes = ['all'] if user_id is None else ['all', f'user:{user_id}']
+    try:
+        with db.session.begin_nested():
+            for scope in scopes:
+                for period in ('all', day):
+                    values = {key: getattr(JobStatistic, key) + value for key, value in deltas.items()}
+                    values['updated_at'] = datetime.utcnow()
+                    stmt = (
+                        update(JobStatistic)
+                        .where(JobStatistic.scope == scope, JobStatistic.period == period)
+                        .values(**values)
+                        .execution_options(synchronize_session=False)
+                    )
+                    if db.session.execute(stmt).rowcount:
+                        continue
+                    try:
+                        with db.session.begin_nested():
+                            # First row for this scope/period: the count already includes this change
+                            counters = _count_job_statistics(scope, period)
+                            db.session.add(JobStatistic(scope=scope, period=period, **counters))
+                    except IntegrityError:
+                        # Another worker created the row first
+                        db.session.execute(stmt)
+    except Exception as e:
+        logger.error(f"[DB JOBS] Failed to update job statistics: {e}")
 
 def create_job(job_type, data):
     """Create a new job in database"""
@@ -40,6 +156,7 @@ def create_job(job_type, data):
             )
             logger.info(f"[DB JOBS] ScrapeJob object created, adding to session...")
             db.session.add(job)
+            _record_job_statistics(job.user_id, datetime.utcnow(), {'total_jobs': 1, 'running_jobs': 1})
             logger.info(f"[DB JOBS] Added to session, committing...")
             db.session.commit()
             logger.info(f"[DB JOBS] SUCCESS! Created job {job_id} in database")
@@ -71,22 +188,91 @@ def create_job(job_type, data):
     logger.warning(f"[MEMORY JOBS] Created job {job_id} in memory (database unavailable)")
     return job_id
 
+def _store_job_results(job, results):
+    """Split a results dict into per-file/per-source rows plus a small summary
+
+    The 'files' list and 'source_stats' map go to JobFileResult/JobSourceResult;
+    only the remaining summary is kept in ScrapeJob.results.
+    """
+    from models import JobFileResult, JobSourceResult, db
+
+    if isinstance(results, str):
+        try:
+            results = json.loads(results)
+        except json.JSONDecodeError:
+            results = {}
+    summary = dict(results or {})
+    files = summary.pop('files', None) or []
+    source_stats = summary.pop('source_stats', None) or {}
+
+    # Results are written once at completion; replace any earlier rows
+    JobFileResult.query.filter_by(job_id=job.id).delete(synchronize_session=False)
+    JobSourceResult.query.filter_by(job_id=job.id).delete(synchronize_session=False)
+
+    total_bytes = 0
+    file_rows = []
+    for file_info in files:
+        if not isinstance(file_info, dict):
+            continue
+        total_bytes += file_info.get('file_size') or 0
+        file_rows.append(JobFileResult.from_file_info(job.id, file_info))
+    db.session.add_all(file_rows)
+
+    source_rows = []
+    for source, stats in source_stats.items():
+        error = stats.get('error')
+        source_rows.append(JobSourceResult(
+            job_id=job.id,
+            source=source,
+            downloaded=stats.get('downloaded', 0),
+            images=stats.get('images', 0),
+            videos=stats.get('videos', 0),
+            success=bool(stats.get('success')),
+            error=str(error)[:500] if error else None
+        ))
+    db.session.add_all(source_rows)
+
+    summary['file_count'] = len(file_rows)
+    job.results = json.dumps(summary, default=str)
+    job.total_bytes = total_bytes
+    job.sources_succeeded = sum(1 for row in source_rows if row.success)
+    job.sources_failed = len(source_rows) - job.sources_succeeded
+
 def update_job(job_id, **kwargs):
     """Update job status in database"""
+    _update_job(job_id, kwargs)
+
+def _update_job(job_id, kwargs, event=None):
+    """Apply job field changes, plus an optional 'update' event, in one commit"""
     # Try database first
     if has_app_context():
         try:
-            from models import ScrapeJob, db
+            from models import JobEvent, ScrapeJob, db
             job = db.session.get(ScrapeJob, job_id)
             if job:
+                old_status, old_downloaded = job.status, job.downloaded or 0
                 for key, value in kwargs.items():
-                    if hasattr(job, key):
+                    if key == 'results':
+                        _store_job_results(job, value)
+                    elif hasattr(job, key):
                         setattr(job, key, value)
+                deltas = _status_deltas(old_status, job.status)
+                deltas['total_downloaded'] = _downloaded_delta(
+                    old_status, old_downloaded, job.status, job.downloaded or 0
+                )
+                _record_job_statistics(job.user_id, job.created_at, deltas)
+                if event:
+                    db.session.add(JobEvent(job_id=job_id, kind='update', message=str(event)[:1000]))
                 db.session.commit()
-                logger.debug(f"[DB JOBS] Updated job {job_id}: {kwargs}")
+                logger.debug(f"[DB JOBS] Updated job {job_id}: {list(kwargs)}")
                 return
         except Exception as e:
             logger.error(f"[DB JOBS] Failed to update job in database: {e}")
+            try:
+                from models import db
+                db.session.rollback()
+            except Exception:
+                pass
             # Fall through to memory storage
 
     # Fallback to memory storage
@@ -95,6 +281,9 @@ def update_job(job_id, **kwargs):
         for key, value in kwargs.items():
             job[key] = value
         job['updated_at'] = datetime.utcnow().isoformat()
+        if event:
+            _append_memory_event(job, event, 'update')
+        MEMORY_JOBS[job_id] = job  # Refresh size accounting and spill copy
         logger.debug(f"[MEMORY JOBS] Updated job {job_id}: {kwargs}")
     else:
         logger.warning(f"[JOBS] Warning: Job {job_id} not found in memory or database")
@@ -125,7 +314,6 @@ def get_job(job_id):
                     'updated_at': job.created_at.isoformat() if job.created_at else None,  # Use created_at as fallback
                     'enabled_sources': job.enabled_sources,
                     'sources_data': job.sources_data,
-                    'live_updates': job.live_updates,
                     'data': {'query': job.query, 'user_id': job.user_id}  # Add data dict for compatibility
                 }
         except Exception as e:
@@ -134,6 +322,42 @@ def get_job(job_id):
     # Fallback to memory
     return MEMORY_JOBS.get(job_id)
 
+def get_job_results(job_id, include_files=True, limit=None, offset=0):
+    """Get a job's results summary, per-source stats and (optionally) a page of files"""
+    if has_app_context():
+        try:
+            from models import JobFileResult, JobSourceResult, ScrapeJob, db
+            job = db.session.get(ScrapeJob, job_id)
+            if job:
+                result = job.get_results()
+                result['source_stats'] = {
+                    row.source: row.to_dict()
+                    for row in JobSourceResult.query.filter_by(job_id=job_id)
+                }
+                result['file_count'] = job.file_results.count()
+                if include_files:
+                    files_query = JobFileResult.query.filter_by(job_id=job_id).order_by(JobFileResult.id)
+                    if offset:
+                        files_query = files_query.offset(offset)
+                    if limit:
+                        files_query = files_query.limit(limit)
+                    result['files'] = [row.to_dict() for row in files_query]
+                return result
+        except Exception as e:
+            logger.error(f"[DB JOBS] Failed to get job results from database: {e}")
+
+    # Fallback to memory
+    job = MEMORY_JOBS.get(job_id)
+    if not job:
+        return None
+    result = dict(job.get('results') or {})
+    files = result.pop('files', None) or []
+    result['file_count'] = len(files)
+    if include_files:
+        end = offset + limit if limit else None
+        result['files'] = files[offset:end]
+    return result
+
 def get_recent_jobs(limit=10):
     """Get recent jobs from database or memory"""
     # Try database first
@@ -161,19 +385,27 @@ def get_recent_jobs(limit=10):
     return jobs_list[:limit]
 
 def cleanup_old_jobs(days=30):
-    """Cleanup old jobs from database or memory"""
+    """Cleanup old jobs from database or memory
+
+    Historical counts survive in JobStatistic, which is maintained on every
+    state transition, so finished jobs can be archived freely.
+    """
     # Try database first
     if has_app_context():
         try:
-            from models import ScrapeJob, db
+            from models import JobEvent, JobFileResult, JobSourceResult, ScrapeJob, db
             from datetime import timedelta
             from sqlalchemy import select, delete
 
             cutoff_date = datetime.utcnow() - timedelta(days=days)
-            stmt = delete(ScrapeJob).where(
+            old_jobs = select(ScrapeJob.id).where(
                 ScrapeJob.created_at < cutoff_date,
                 ScrapeJob.status.in_(['completed', 'error'])
             )
+            # Bulk deletes skip ORM cascades, so clear child rows first
+            for child in (JobFileResult, JobSourceResult, JobEvent):
+                db.session.execute(delete(child).where(child.job_id.in_(old_jobs)))
+            stmt = delete(ScrapeJob).where(ScrapeJob.id.in_(old_jobs))
             result = db.session.execute(stmt)
             db.session.commit()
             deleted = result.rowcount
@@ -183,15 +415,9 @@ def cleanup_old_jobs(days=30):
             logger.error(f"[DB JOBS] Failed to cleanup jobs from database: {e}")
 
     # Fallback to memory cleanup
-    to_remove = []
-    for job_id, job in MEMORY_JOBS.items():
-        if job.get('status') in ['completed', 'error']:
-            to_remove.append(job_id)
-
-    for job_id in to_remove[:10]:
-        del MEMORY_JOBS[job_id]
-
-    return len(to_remove[:10])
+    removed = MEMORY_JOBS.purge_finished(max_age_seconds=days * 86400)
+    logger.info(f"[MEMORY JOBS] Cleaned up {removed} old jobs from memory")
+    return removed
 
 def get_user_jobs(user_id=None, limit=20, status_filter=None):
     """Get jobs for a user or all jobs if user_id is None"""
@@ -278,35 +504,21 @@ def get_job_statistics(user_id=None):
     # Try database first
     if has_app_context():
         try:
-            from models import ScrapeJob, db
-            from sqlalchemy import func, select
-
-            # Base query
-            base_stmt = select(ScrapeJob)
-            if user_id:
-                base_stmt = base_stmt.where(ScrapeJob.user_id == user_id)
-
-            # Total jobs
-            stats['total_jobs'] = db.session.execute(select(func.count()).select_from(base_stmt.subquery())).scalar()
-
-            # Completed jobs
-            completed_stmt = base_stmt.where(ScrapeJob.status == 'completed')
-            stats['completed_jobs'] = db.session.execute(select(func.count()).select_from(completed_stmt.subquery())).scalar()
-
-            # Failed jobs
-            failed_stmt = base_stmt.where(ScrapeJob.status == 'failed')
-            stats['failed_jobs'] = db.session.execute(select(func.count()).select_from(failed_stmt.subquery())).scalar()
-
-            # Running jobs
-            running_stmt = base_stmt.where(ScrapeJob.status.in_(['running', 'pending', 'downloading']))
-            stats['running_jobs'] = db.session.execute(select(func.count()).select_from(running_stmt.subquery())).scalar()
-
-            # Total downloaded
-            downloaded_stmt = select(func.sum(ScrapeJob.downloaded))
-            if user_id:
-                downloaded_stmt = downloaded_stmt.where(ScrapeJob.user_id == user_id)
-            stats['total_downloaded'] = db.session.execute(downloaded_stmt).scalar() or 0
+            from models import JobStatistic, db
+            from sqlalchemy import select
 
+            # Rolling aggregate: a single row per scope
+            scope = f'user:{user_id}' if user_id else 'all'
+            row = db.session.execute(
+                select(JobStatistic).where(JobStatistic.scope == scope, JobStatistic.period == 'all')
+            ).scalar_one_or_none()
+            if row:
+                stats.update(row.to_dict())
+                stats.pop('period', None)
+                return stats
+
+            # No aggregate yet (no job recorded since deploy): count directly
+            stats.update(_count_job_statistics(scope, 'all'))
             return stats
         except Exception as e:
             logger.error(f"[DB JOBS] Failed to get job statistics: {e}")
@@ -317,16 +529,61 @@ def get_job_statistics(user_id=None):
             continue
 
         stats['total_jobs'] += 1
-        if job.get('status') == 'completed':
-            stats['completed_jobs'] += 1
-        elif job.get('status') == 'failed':
-            stats['failed_jobs'] += 1
-        elif job.get('status') in ['running', 'pending', 'downloading']:
-            stats['running_jobs'] += 1
+        counter = STATUS_COUNTERS.get(job.get('status'))
+        if counter in stats:
+            stats[counter] += 1
         stats['total_downloaded'] += job.get('downloaded', 0)
 
     return stats
 
+def get_daily_job_statistics(user_id=None, days=30):
+    """Get per-day job counters for the last `days` days, oldest first"""
+    if not has_app_context():
+        return []
+    try:
+        from models import JobStatistic, db
+        from datetime import timedelta
+        from sqlalchemy import select
+
+        scope = f'user:{user_id}' if user_id else 'all'
+        first_day = (datetime.utcnow() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+        stmt = select(JobStatistic).where(
+            JobStatistic.scope == scope,
+            JobStatistic.period != 'all',
+            JobStatistic.period >= first_day
+        ).order_by(JobStatistic.period)
+        return [row.to_dict() for row in db.session.execute(stmt).scalars()]
+    except Exception as e:
+        logger.error(f"[DB JOBS] Failed to get daily job statistics: {e}")
+        return []
+
+def rebuild_job_statistics():
+    """Recompute all JobStatistic rows from scrape_jobs (one-off backfill)"""
+    from models import JobStatistic, ScrapeJob, db
+    from sqlalchemy import delete, select
+
+    totals = {}
+    stmt = select(ScrapeJob.user_id, ScrapeJob.created_at, ScrapeJob.status, ScrapeJob.downloaded)
+    for user_id, created_at, status, downloaded in db.session.execute(stmt).yield_per(1000):
+        day = (created_at or datetime.utcnow()).strftime('%Y-%m-%d')
+        scopes = ['all'] if user_id is None else ['all', f'user:{user_id}']
+        deltas = {'total_jobs': 1, 'total_downloaded': _downloaded_delta(None, 0, status, downloaded or 0)}
+        deltas.update(_status_deltas(None, status))
+        for scope in scopes:
+            for period in ('all', day):
+                counters = totals.setdefault((scope, period), {key: 0 for key in JobStatistic.COUNTERS})
+                for key, value in deltas.items():
+                    counters[key] += value
+
+    db.session.execute(delete(JobStatistic))
+    db.session.add_all(
+        JobStatistic(scope=scope, period=period, **counters)
+        for (scope, period), counters in totals.items()
+    )
+    db.session.commit()
+    logger.info(f"[DB JOBS] Rebuilt {len(totals)} job statistic rows")
+    return len(totals)
+
 def cancel_job(job_id, user_id=None):
     """Cancel a job"""
     # Try database first
@@ -339,9 +596,13 @@ def cancel_job(job_id, user_id=None):
                 if user_id and job.user_id != user_id:
                     return False
 
-                # Update status
+                # Update status (same accounting as update_job)
+                old_status, downloaded = job.status, job.downloaded or 0
                 job.status = 'cancelled'
                 job.message = 'Job cancelled by user'
+                deltas = _status_deltas(old_status, job.status)
+                deltas['total_downloaded'] = _downloaded_delta(old_status, downloaded, job.status, downloaded)
+                _record_job_statistics(job.user_id, job.created_at, deltas)
                 db.session.commit()
                 logger.info(f"[DB JOBS] Cancelled job {job_id}")
                 return True
@@ -356,21 +617,108 @@ def cancel_job(job_id, user_id=None):
 
         job['status'] = 'cancelled'
         job['message'] = 'Job cancelled by user'
+        MEMORY_JOBS[job_id] = job
         logger.info(f"[MEMORY JOBS] Cancelled job {job_id}")
         return True
 
     return False
 
+def add_job_event(job_id, message, kind='update'):
+    """Append a live event to a job's log (O(1), never rewrites earlier events)"""
+    if not message:
+        return
+    # Try database first
+    if has_app_context():
+        try:
+            from models import JobEvent, db
+            db.session.add(JobEvent(job_id=job_id, kind=kind, message=str(message)[:1000]))
+            db.session.commit()
+            return
+        except Exception as e:
+            logger.error(f"[DB JOBS] Failed to add job event: {e}")
+            try:
+                from models import db
+                db.session.rollback()
+            except Exception:
+                pass
+
+    # Fallback to memory storage
+    job = MEMORY_JOBS.get(job_id)
+    if job is None:
+        return
+    _append_memory_event(job, message, kind)
+    MEMORY_JOBS[job_id] = job
+
+def _append_memory_event(job, message, kind):
+    """Append an event to a memory-fallback job dict (caller stores the job)"""
+    events = job.setdefault('events', [])
+    job['event_seq'] = job.get('event_seq', 0) + 1
+    events.append({
+        'id': job['event_seq'],
+        'kind': kind,
+        'timestamp': datetime.now().strftime("%H:%M:%S"),
+        'message': str(message),
+        'created_at': datetime.utcnow().isoformat()
+    })
+    if len(events) > MEMORY_EVENTS_PER_JOB * 2:
+        del events[:-MEMORY_EVENTS_PER_JOB]
+
+def get_job_events(job_id, after=None, limit=100, kind=None):
+    """Cursor-based read of a job's live events
+
+    With after=None the latest `limit` events are returned so a client can
+    start tailing; afterwards pass the returned cursor to get only new ones.
+    Events are always returned oldest first.
+    """
+    limit = max(1, min(int(limit), 1000))
+
+    # Try database first
+    if has_app_context():
+        try:
+            from models import JobEvent, db
+            from sqlalchemy import select
+
+            stmt = select(JobEvent).where(JobEvent.job_id == job_id)
+            if kind:
+                stmt = stmt.where(JobEvent.kind == kind)
+            if after is None:
+                stmt = stmt.order_by(JobEvent.id.desc()).limit(limit)
+                events = list(reversed(db.session.execute(stmt).scalars().all()))
+            else:
+                stmt = stmt.where(JobEvent.id > int(after)).order_by(JobEvent.id).limit(limit)
+                events = db.session.execute(stmt).scalars().all()
+            return {
+                'events': [event.to_dict() for event in events],
+                'cursor': events[-1].id if events else after
+            }
+        except Exception as e:
+            logger.error(f"[DB JOBS] Failed to get job events from database: {e}")
+
+    # Fallback to memory
+    job = MEMORY_JOBS.get(job_id) or {}
+    events = [e for e in job.get('events', []) if not kind or e['kind'] == kind]
+    if after is None:
+        events = events[-limit:]
+    else:
+        events = [e for e in events if e['id'] > int(after)][:limit]
+    return {
+        'events': events,
+        'cursor': events[-1]['id'] if events else after
+    }
+
 def add_progress_update(job_id, message, progress, downloaded, images, videos, current_file):
-    """Add a progress update to a job"""
-    update_job(
+    """Add a progress update to a job (fields and log event in one commit)"""
+    _update_job(
         job_id,
-        message=message,
-        progress=progress,
-        downloaded=downloaded,
-        images=images,
-        videos=videos,
-        current_file=current_file
+        dict(
+            message=message,
+            progress=progress,
+            downloaded=downloaded,
+            images=images,
+            videos=videos,
+            current_file=current_file
+        ),
+        event=message
     )
 
 # Create a class-like interface for compatibility
@@ -380,11 +728,15 @@ class DBJobManager:
     update_job = staticmethod(update_job)
     get_job = staticmethod(get_job)
     get_job_status = staticmethod(get_job)  # Alias for compatibility
+    get_job_results = staticmethod(get_job_results)
     get_recent_jobs = staticmethod(get_recent_jobs)
     cleanup_old_jobs = staticmethod(cleanup_old_jobs)
     add_progress_update = staticmethod(add_progress_update)
+    add_job_event = staticmethod(add_job_event)
+    get_job_events = staticmethod(get_job_events)
     get_user_jobs = staticmethod(get_user_jobs)
     get_job_statistics = staticmethod(get_job_statistics)
+    get_daily_job_statistics = staticmethod(get_daily_job_statistics)
     cancel_job = staticmethod(cancel_job)
 
 # Create instance for import
@@ -16,6 +16,11 @@ from working_media_downloader import media_downloader
 from db_job_manager import db_job_manager
 # Import simple asset manager as default
 from simple_asset_manager import simple_asset_manager
+# Result marker for files the database asset manager drops as near-duplicates
+try:
+    from db_asset_manager import DroppedAsset
+except ImportError:
+    DroppedAsset = None
 # Import improved adult scraper
 try:
     from improved_adult_scraper import ImprovedAdultScraper
@@ -757,27 +762,8 @@ def run_download_job(job_id, query, sources, max_content, total_file_limit=0, to
                                     source_success, source_error
                                 )
 
-                            # Update statistics
-                            with stats_lock:
-                                total_downloaded += source_result['downloaded']
-                                total_images += source_result['images']
-                                total_videos += source_result['videos']
-                                all_results.extend(source_result['files'])
-
-                                source_stats[source] = {
-                                    'downloaded': source_result['downloaded'],
-                                    'images': source_result['images'],
-                                    'videos': source_result['videos'],
-                                    'success': source_result['success'],
-                                    'error': source_result.get('error')
-                                }
-
-                                if source_result['success']:
-                                    successful_sources.append(source)
-                                else:
-                                    failed_sources.append(source)
-
-                            # Add files to database
+                            # Add files to database (before counting: near-duplicates are dropped here)
+                            near_duplicates = []
                             for file_info in source_result['files']:
                                 if file_info.get('filepath') and os.path.exists(file_info['filepath']):
                                     file_type = 'image'
@@ -787,11 +773,10 @@ def run_download_job(job_id, query, sources, max_content, total_file_limit=0, to
                                     # Track file size
                                     try:
                                         file_size = os.path.getsize(file_info['filepath'])
-                                        total_size_downloaded += file_size
                                     except Exception:
                                         file_size = 0
 
-                                    get_asset_manager().add_asset(
+                                    added = get_asset_manager().add_asset(
                                         job_id=job_id,
                                         filepath=file_info['filepath'],
                                         file_type=file_type,
@@ -800,10 +785,44 @@ def run_download_job(job_id, query, sources, max_content, total_file_limit=0, to
                                             'original_url': file_info.get('original_url', ''),
                                             'query': query,
                                             'user_id': user_id,
-                                            'downloaded_via': 'parallel_processor'
+                                            'downloaded_via': 'parallel_processor',
+                                            'drop_near_duplicates': quality_settings.get('drop_near_duplicates')
                                         }
                                     )
 
+                                    if DroppedAsset is not None and isinstance(added, DroppedAsset):
+                                        near_duplicates.append(file_info)
+                                    else:
+                                        total_size_downloaded += file_size
+
+                            if near_duplicates:
+                                error_logger.info(f"NEAR-DUPLICATES: {source} | Dropped {len(near_duplicates)} images matching existing assets")
+                                source_result['files'] = [f for f in source_result['files'] if f not in near_duplicates]
+                                # Update counts
+                                source_result['downloaded'] = len(source_result['files'])
+                                source_result['images'] = sum(1 for f in source_result['files'] if any(f.get('filepath', '').endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']))
+                                source_result['videos'] = sum(1 for f in source_result['files'] if any(f.get('filepath', '').endswith(ext) for ext in ['.mp4', '.webm']))
+
+                            # Update statistics
+                            with stats_lock:
+                                total_downloaded += source_result['downloaded']
+                                total_images += source_result['images']
+                                total_videos += source_result['videos']
+                                all_results.extend(source_result['files'])
+
+                                source_stats[source] = {
+                                    'downloaded': source_result['downloaded'],
+                                    'images': source_result['images'],
+                                    'videos': source_result['videos'],
+                                    'success': source_result['success'],
+                                    'error': source_result.get('error')
+                                }
+
+                                if source_result['success']:
+                                    successful_sources.append(source)
+                                else:
+                                    failed_sources.append(source)
+
                             # Update job progress
                             # For infinite mode (no limits), don't show percentage - use -1 to indicate infinite
                             if total_file_limit == 0 and total_size_limit == 0:
@@ -3,14 +3,13 @@ Fixed Database Asset Manager - Works with existing Asset model
 Maps fields correctly between downloader and database models
 """
 
-import hashlib
-import json
 import mimetypes
 import os
-from datetime import datetime
 
 from sqlalchemy import func
 
+from db_asset_manager import add_asset as _add_asset
+from db_asset_manager import save_asset as _save_asset
 from models import Asset, MediaBlob, db
 
 
@@ -19,79 +18,36 @@ class FixedAssetManager:
 
     @staticmethod
     def save_asset(user_id, filename, file_path, source, content_type=None,
-                   original_url=None, title=None, metadata=None):
+                   original_url=None, title=None, metadata=None, **kwargs):
         """
         Save an asset to the database with correct field mapping
+
+        Ingest goes through db_asset_manager.save_asset, so the file is
+        streamed into the configured storage backend (never read whole) and
+        gets its content hash, dimensions, perceptual hashes and thumbnails.
+        Returns the Asset, or a falsy result (None, or DroppedAsset for a
+        dropped near-duplicate).
         """
         try:
-            # Read file content if exists
-            file_data = None
-            file_size = 0
-
-            if os.path.exists(file_path):
-                with open(file_path, 'rb') as f:
-                    file_data = f.read()
-                file_size = len(file_data)
-            else:
+            if not os.path.exists(file_path or ''):
                 print(f"[WARNING] File not found, creating reference only: {file_path}")
 
-            # Auto-detect content type if not provided
-            if not content_type:
-                content_type, _ = mimetypes.guess_type(filename)
-                if not content_type:
-                    content_type = 'application/octet-stream'
-
-            # Determine file type category for Asset model
-            file_type = 'other'
-            if content_type:
-                if content_type.startswith('image/'):
-                    file_type = 'image'
-                elif content_type.startswith('video/'):
-                    file_type = 'video'
-                elif content_type.startswith('audio/'):
-                    file_type = 'audio'
-
-            # Get file extension
-            file_extension = os.path.splitext(filename)[1].lower()
-            if file_extension.startswith('.'):
-                file_extension = file_extension[1:]
-
-            # Create Asset record with correct field names
-            asset = Asset(
+            asset_id = _save_asset(
                 user_id=user_id,
                 filename=filename,
                 file_path=file_path,
-                file_type=file_type,
-                file_size=file_size,
-                file_extension=file_extension,
-                source_url=original_url,  # Map original_url to source_url
-                source_name=source,        # Map source to source_name
-                downloaded_at=datetime.utcnow(),
-                stored_in_db=bool(file_data),  # Mark if we have the actual data
-                asset_metadata=json.dumps(metadata) if metadata else None
+                source=source,
+                content_type=content_type,
+                original_url=original_url or kwargs.get('url') or '',
+                title=title,
+                metadata=metadata,
+                job_id=kwargs.get('job_id')
             )
+            if not asset_id:
+                return asset_id
 
-            db.session.add(asset)
-            db.session.flush()  # Get the asset ID
-
-            # Create MediaBlob if we have file data
-            if file_data:
-                # Calculate hash
-                file_hash = hashlib.sha256(file_data).hexdigest()
-
-                media_blob = MediaBlob(
-                    asset_id=asset.id,
-                    user_id=user_id,
-                    media_data=file_data,
-                    mime_type=content_type,
-                    file_hash=file_hash,
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(media_blob)
-
-            db.session.commit()
-
-            print(f"[SUCCESS] Asset saved: {asset.id} - {filename} ({file_size} bytes)")
+            asset = db.session.get(Asset, int(asset_id))
+            print(f"[SUCCESS] Asset saved: {asset.id} - {filename} ({asset.file_size} bytes)")
             return asset
 
         except Exception as e:
@@ -103,32 +59,22 @@ class FixedAssetManager:
     def add_asset(job_id, filepath, file_type, metadata=None):
         """
         Add asset using job_id and filepath (compatibility wrapper for add_asset calls)
-        Converts parameters to save_asset format
+
+        Delegates to db_asset_manager.add_asset, whose chunked ingest keeps
+        peak memory per file at a fixed buffer. Callers here name the source
+        fields source_name/source_url; they are mapped to the keys it reads.
         """
         try:
-            # Extract user_id from metadata or default
-            user_id = 1  # Default user for testing
-            if metadata and isinstance(metadata, dict):
-                user_id = metadata.get('user_id', 1)
-
-            filename = os.path.basename(filepath)
+            metadata = dict(metadata) if isinstance(metadata, dict) else {}
+            if 'source' not in metadata:
+                metadata['source'] = metadata.get('source_name') or 'unknown'
+            if 'original_url' not in metadata:
+                metadata['original_url'] = metadata.get('source_url') or ''
 
-            # Get source and original_url from metadata
-            source = metadata.get('source_name', 'unknown') if metadata else 'unknown'
-            original_url = metadata.get('source_url', '') if metadata else ''
-            title = metadata.get('title', '') if metadata else ''
-
-            # Call save_asset with converted parameters
-            return FixedAssetManager.save_asset(
-                user_id=user_id,
-                filename=filename,
-                file_path=filepath,
-                source=source,
-                content_type=None,  # Auto-detect
-                original_url=original_url,
-                title=title,
-                metadata=metadata
-            )
+            asset_id = _add_asset(job_id, filepath, file_type, metadata)
+            if not asset_id:
+                return asset_id
+            return db.session.get(Asset, int(asset_id))
 
         except Exception as e:
             print(f"[ERROR] Failed to add asset: {e}")
@@ -142,10 +88,11 @@ class FixedAssetManager:
             if not asset:
                 return None, None
 
-            # Try to get from MediaBlob first
+            # Try to get from MediaBlob first (blob store or media_data)
             media_blob = MediaBlob.query.filter_by(asset_id=asset_id).first()
             if media_blob:
-                return media_blob.media_data, media_blob.mime_type
+                with media_blob.open_stream() as stream:
+                    return stream.read(), media_blob.mime_type
 
             # Fallback to file system if exists
             if asset.file_path and os.path.exists(asset.file_path):
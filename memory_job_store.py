@@ -0,0 +1,332 @@
+"""
+Bounded job store for the db_job_manager memory fallback
+LRU + TTL eviction with a byte budget and an optional SQLite spill file
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('completed', 'error', 'failed', 'cancelled')
+
+# Returned by spill reads that failed (as opposed to finding no row)
+_SPILL_ERROR = object()
+
+
+class BoundedJobStore(MutableMapping):
+    """Dict-like job store that cannot grow without bound
+
+    - At most max_jobs entries and roughly max_bytes of serialized job data
+      are kept in memory. Finished jobs are evicted first (least recently
+      used first); active jobs are only evicted when they are safe in the
+      spill file, so without one the limits can be exceeded rather than
+      lose a running job.
+    - Finished jobs expire ttl_seconds after their last update.
+    - With spill_path set, the SQLite file is the source of truth: every
+      write goes through to it and bumps the row's version, and every read
+      checks that version, reloading the job if another worker process
+      changed it. Evicted jobs are reloaded on access, survive a worker
+      recycle, and values()/items() list every job in the file.
+
+    Callers that mutate a job dict in place must assign it back
+    (store[job_id] = job) so its size and spill copy are refreshed.
+    """
+
+    def __init__(self, max_jobs=500, max_bytes=50 * 1024 * 1024, ttl_seconds=3600, spill_path=None):
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill_path = spill_path
+        self._jobs = OrderedDict()
+        self._sizes = {}
+        self._touched = {}
+        self._versions = {}
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self.evictions = 0
+
+        if self.spill_path:
+            self._init_spill()
+            self._warm_from_spill()
+
+    @classmethod
+    def from_env(cls):
+        """Build a store from MEMORY_JOBS_* environment variables"""
+        return cls(
+            max_jobs=int(os.getenv('MEMORY_JOBS_MAX', '500')),
+            max_bytes=int(os.getenv('MEMORY_JOBS_MAX_MB', '50')) * 1024 * 1024,
+            ttl_seconds=int(os.getenv('MEMORY_JOBS_TTL', '3600')),
+            spill_path=os.getenv('MEMORY_JOBS_SPILL_PATH') or None
+        )
+
+    # ------------------------------------------------------------------
+    # Mapping interface
+    # ------------------------------------------------------------------
+    def __getitem__(self, job_id):
+        with self._lock:
+            if self.spill_path:
+                row = self._spill_fetch(job_id, self._versions.get(job_id, 0) if job_id in self._jobs else 0)
+                if row is None:
+                    # Deleted or purged by another worker
+                    self._drop(job_id)
+                    raise KeyError(job_id)
+                if row is not _SPILL_ERROR:
+                    version, status, updated_at, data = row
+                    if status in FINISHED_STATUSES and time.time() - updated_at > self.ttl_seconds:
+                        self._drop(job_id)
+                        self._spill_delete(job_id)
+                        raise KeyError(job_id)
+                    if data is not None:
+                        self._put(job_id, json.loads(data), version=version)
+                    self._jobs.move_to_end(job_id)
+                    return self._jobs[job_id]
+
+            # Memory only (or the spill file is unreadable right now)
+            if job_id not in self._jobs:
+                raise KeyError(job_id)
+            if self._is_expired(job_id):
+                self._drop(job_id)
+                self._spill_delete(job_id)
+                raise KeyError(job_id)
+            self._jobs.move_to_end(job_id)
+            return self._jobs[job_id]
+
+    def __setitem__(self, job_id, job):
+        with self._lock:
+            version = self._spill_save(job_id, job)
+            self._put(job_id, job, version=version)
+
+    def __delitem__(self, job_id):
+        with self._lock:
+            found = job_id in self._jobs
+            if found:
+                self._drop(job_id)
+            if self._spill_delete(job_id):
+                found = True
+            if not found:
+                raise KeyError(job_id)
+
+    def __contains__(self, job_id):
+        try:
+            self[job_id]
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        return [job_id for job_id, _ in self._snapshot()]
+
+    def values(self):
+        """Snapshot of all jobs, including spilled ones (does not touch LRU order)"""
+        return [job for _, job in self._snapshot()]
+
+    def items(self):
+        """Snapshot of all (job_id, job) pairs, including spilled ones (does not touch LRU order)"""
+        return self._snapshot()
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+    def purge_finished(self, max_age_seconds=0):
+        """Remove finished jobs not updated for max_age_seconds, from memory and spill"""
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job.get('status') in FINISHED_STATUSES and self._touched.get(job_id, 0) <= cutoff:
+                    self._drop(job_id)
+                    removed += 1
+            removed = max(removed, self._spill_purge(cutoff))
+        return removed
+
+    def get_stats(self):
+        """Current size and eviction counters"""
+        with self._lock:
+            return {
+                'jobs': len(self._jobs),
+                'bytes': self._total_bytes,
+                'max_jobs': self.max_jobs,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'spill_path': self.spill_path
+            }
+
+    def _snapshot(self):
+        with self._lock:
+            self._expire()
+            if self.spill_path:
+                rows = self._spill_all()
+                if rows is not _SPILL_ERROR:
+                    return [(job_id, json.loads(data)) for job_id, data in rows]
+            return list(self._jobs.items())
+
+    def _put(self, job_id, job, version=None):
+        size = len(json.dumps(job, default=str))
+        if job_id in self._jobs:
+            self._total_bytes -= self._sizes.get(job_id, 0)
+        self._jobs[job_id] = job
+        self._jobs.move_to_end(job_id)
+        self._sizes[job_id] = size
+        self._touched[job_id] = time.time()
+        self._versions[job_id] = version or 0
+        self._total_bytes += size
+        self._evict()
+
+    def _drop(self, job_id):
+        self._jobs.pop(job_id, None)
+        self._total_bytes -= self._sizes.pop(job_id, 0)
+        self._touched.pop(job_id, None)
+        self._versions.pop(job_id, None)
+
+    def _is_expired(self, job_id):
+        job = self._jobs[job_id]
+        return (
+            job.get('status') in FINISHED_STATUSES
+            and time.time() - self._touched.get(job_id, 0) > self.ttl_seconds
+        )
+
+    def _expire(self):
+        for job_id in [j for j in self._jobs if self._is_expired(j)]:
+            self._drop(job_id)
+            self._spill_delete(job_id)
+
+    def _evict(self):
+        self._expire()
+        while len(self._jobs) > self.max_jobs or (self._total_bytes > self.max_bytes and len(self._jobs) > 1):
+            # Oldest finished job first; active jobs only when the spill file holds them
+            # (never the job just written, the last entry, so its final status stays readable)
+            candidates = list(self._jobs.items())[:-1]
+            victim = next((j for j, job in candidates if job.get('status') in FINISHED_STATUSES), None)
+            if victim is None and self.spill_path and candidates:
+                victim = candidates[0][0]
+            if victim is None:
+                logger.warning(
+                    f"[MEMORY JOBS] {len(self._jobs)} unfinished jobs exceed the store limits; "
+                    "keeping them (set MEMORY_JOBS_SPILL_PATH to spill)"
+                )
+                return
+            self._drop(victim)
+            self.evictions += 1
+
+    # ------------------------------------------------------------------
+    # SQLite spill file
+    # ------------------------------------------------------------------
+    def _connect(self):
+        return sqlite3.connect(self.spill_path, timeout=5)
+
+    def _init_spill(self):
+        try:
+            spill_dir = os.path.dirname(self.spill_path)
+            if spill_dir:
+                os.makedirs(spill_dir, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS memory_jobs ("
+                    "id TEXT PRIMARY KEY, status TEXT, updated_at REAL, data TEXT, "
+                    "version INTEGER NOT NULL DEFAULT 0)"
+                )
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(memory_jobs)")}
+                if 'version' not in columns:
+                    # Spill files from before versioned rows
+                    conn.execute("ALTER TABLE memory_jobs ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        except Exception as e:
+            logger.error(f"[MEMORY JOBS] Spill file unavailable, running memory-only: {e}")
+            self.spill_path = None
+
+    def _warm_from_spill(self):
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT id, version, data FROM memory_jobs ORDER BY updated_at DESC LIMIT ?", (self.max_jobs,)
+                ).fetchall()
+            for job_id, version, data in reversed(rows):
+                self._put(job_id, json.loads(data), version=version)
+            if rows:
+                logger.info(f"[MEMORY JOBS] Restored {len(rows)} jobs from {self.spill_path}")
+        except Exception as e:
+            logger.error(f"[MEMORY JOBS] Failed to restore jobs from spill file: {e}")
+
+    def _spill_save(self, job_id, job):
+        """Write a job through to the spill file; returns its new version (None if not spilled)"""
+        if not self.spill_path:
+            return None
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO memory_jobs (id, status, updated_at, data, version) VALUES (?, ?, ?, ?, 1) "
+                    "ON CONFLICT(id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at, "
+                    "data = excluded.data, version = memory_jobs.version + 1",
+                    (job_id, job.get('status'), time.time(), json.dumps(job, default=str))
+                )
+                # Same transaction: the write lock is still held, so this is our version
+                return conn.execute("SELECT version FROM memory_jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        except Exception as e:
+            logger.error(f"[MEMORY JOBS] Failed to spill job {job_id}: {e}")
+            return None
+
+    def _spill_fetch(self, job_id, known_version):
+        """(version, status, updated_at, data) for a spilled job, data only if newer than known_version
+
+        Returns None when the job is not in the file and _SPILL_ERROR when
+        the file could not be read.
+        """
+        try:
+            with self._connect() as conn:
+                return conn.execute(
+                    "SELECT version, status, updated_at, CASE WHEN version > ? THEN data END "
+                    "FROM memory_jobs WHERE id = ?",
+                    (known_version, job_id)
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"[MEMORY JOBS] Failed to load job {job_id} from spill file: {e}")
+            return _SPILL_ERROR
+
+    def _spill_all(self):
+        """(id, data) for every unexpired spilled job, or _SPILL_ERROR"""
+        try:
+            placeholders = ','.join('?' for _ in FINISHED_STATUSES)
+            with self._connect() as conn:
+                return conn.execute(
+                    f"SELECT id, data FROM memory_jobs WHERE status IS NULL OR status NOT IN ({placeholders}) "
+                    "OR updated_at > ? ORDER BY updated_at",
+                    (*FINISHED_STATUSES, time.time() - self.ttl_seconds)
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"[MEMORY JOBS] Failed to list spilled jobs: {e}")
+            return _SPILL_ERROR
+
+    def _spill_delete(self, job_id):
+        if not self.spill_path:
+            return False
+        try:
+            with self._connect() as conn:
+                return conn.execute("DELETE FROM memory_jobs WHERE id = ?", (job_id,)).rowcount > 0
+        except Exception as e:
+            logger.error(f"[MEMORY JOBS] Failed to delete job {job_id} from spill file: {e}")
+            return False
+
+    def _spill_purge(self, cutoff):
+        if not self.spill_path:
+            return 0
+        try:
+            placeholders = ','.join('?' for _ in FINISHED_STATUSES)
+            with self._connect() as conn:
+                return conn.execute(
+                    f"DELETE FROM memory_jobs WHERE status IN ({placeholders}) AND updated_at <= ?",
+                    (*FINISHED_STATUSES, cutoff)
+                ).rowcount
+        except Exception as e:
+            logger.error(f"[MEMORY JOBS] Failed to purge spill file: {e}")
+            return 0
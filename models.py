@@ -202,13 +202,28 @@ class ScrapeJob(db.Model):
     message = db.Column(db.String(500))
     start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     end_time = db.Column(db.DateTime)
-    results = db.Column(db.Text)  # JSON string
+    # Summary-only JSON; per-file and per-source rows live in JobFileResult/JobSourceResult.
+    # Deferred so job list/status queries never pull it.
+    results = db.deferred(db.Column(db.Text))
+    sources_succeeded = db.Column(db.Integer, default=0)
+    sources_failed = db.Column(db.Integer, default=0)
+    total_bytes = db.Column(db.BigInteger, default=0)
     enabled_sources = db.Column(db.Text)  # JSON array
-    live_updates = db.Column(db.Text)  # JSON array of recent updates
-    recent_files = db.Column(db.Text)  # JSON array of recent file names
+    # Legacy JSON logs, superseded by JobEvent; read only for older jobs
+    live_updates = db.deferred(db.Column(db.Text))
+    recent_files = db.deferred(db.Column(db.Text))
     sources_data = db.Column(db.Text)  # JSON object of source-specific data
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Relationships
+    file_results = db.relationship(
+        "JobFileResult", backref="job", lazy="dynamic", cascade="all, delete-orphan"
+    )
+    source_results = db.relationship(
+        "JobSourceResult", backref="job", lazy="dynamic", cascade="all, delete-orphan"
+    )
+    events = db.relationship("JobEvent", backref="job", lazy="dynamic", cascade="all, delete-orphan")
+
     def get_results(self):
         """Get results as dictionary"""
         if self.results:
@@ -235,46 +250,46 @@ class ScrapeJob(db.Model):
         """Set enabled sources from list"""
         self.enabled_sources = json.dumps(sources_list)
 
-    def get_live_updates(self):
-        """Get live updates as list"""
+    def get_live_updates(self, limit=20):
+        """Get the most recent live updates, newest first"""
+        events = (
+            self.events.filter_by(kind="update").order_by(JobEvent.id.desc()).limit(limit).all()
+        )
+        if events:
+            return [event.to_dict() for event in events]
+
+        # Jobs created before job_events existed keep their log in the legacy column
         if self.live_updates:
             try:
-                return json.loads(self.live_updates)
+                return json.loads(self.live_updates)[:limit]
             except json.JSONDecodeError:
                 return []
         return []
 
     def add_live_update(self, message):
-        """Add a live update message"""
-        updates = self.get_live_updates()
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        update = {"timestamp": timestamp, "message": message}
-        updates.insert(0, update)
-
-        # Keep only last 20 updates
-        if len(updates) > 20:
-            updates = updates[:20]
+        """Add a live update message (append-only, no read of existing updates)"""
+        db.session.add(JobEvent(job_id=self.id, kind="update", message=str(message)[:1000]))
+
+    def get_recent_files(self, limit=10):
+        """Get recent file names, newest first"""
+        events = self.events.filter_by(kind="file").order_by(JobEvent.id.desc()).limit(limit * 2).all()
+        if events:
+            files = []
+            for event in events:
+                if event.message not in files:
+                    files.append(event.message)
+            return files[:limit]
 
-        self.live_updates = json.dumps(updates)
-
-    def get_recent_files(self):
-        """Get recent files as list"""
         if self.recent_files:
             try:
-                return json.loads(self.recent_files)
+                return json.loads(self.recent_files)[:limit]
             except json.JSONDecodeError:
                 return []
         return []
 
     def add_recent_file(self, filename):
-        """Add a file to recent files"""
-        files = self.get_recent_files()
-        if filename not in files:
-            files.insert(0, filename)
-            # Keep only last 10 files
-            if len(files) > 10:
-                files = files[:10]
-            self.recent_files = json.dumps(files)
+        """Add a file to recent files (append-only)"""
+        db.session.add(JobEvent(job_id=self.id, kind="file", message=str(filename)[:1000]))
 
     def get_runtime_seconds(self):
         """Get job runtime in seconds"""
@@ -284,9 +299,15 @@ class ScrapeJob(db.Model):
             return int(runtime.total_seconds())
         return 0
 
-    def to_dict(self):
-        """Convert job to dictionary for JSON responses"""
-        return {
+    def to_dict(self, include_results=False, include_events=False):
+        """Convert job to dictionary for JSON responses
+
+        The results summary is only loaded when include_results is set; the
+        per-file list is never included (see JobFileResult). Live updates and
+        recent files cost a job_events query each, so they are only added
+        with include_events; clients tailing a job use /api/jobs/<id>/events.
+        """
+        data = {
             "id": self.id,
             "user_id": self.user_id,
             "type": self.job_type,
@@ -304,10 +325,10 @@ class ScrapeJob(db.Model):
             "message": self.message,
             "start_time": self.start_time.isoformat() if self.start_time else None,
             "end_time": self.end_time.isoformat() if self.end_time else None,
-            "results": self.get_results(),
+            "sources_succeeded": self.sources_succeeded or 0,
+            "sources_failed": self.sources_failed or 0,
+            "total_bytes": self.total_bytes or 0,
             "enabled_sources": self.get_enabled_sources(),
-            "live_updates": self.get_live_updates(),
-            "recent_files": self.get_recent_files(),
             "sources": json.loads(self.sources_data) if self.sources_data else {},
             "runtime_seconds": self.get_runtime_seconds(),
             "params": {
@@ -317,12 +338,162 @@ class ScrapeJob(db.Model):
                 "enabled_sources": self.get_enabled_sources(),
             },
         }
+        if include_results:
+            data["results"] = self.get_results()
+        if include_events:
+            data["live_updates"] = self.get_live_updates()
+            data["recent_files"] = self.get_recent_files()
+        return data
+
+
+class JobStatistic(db.Model):
+    """Rolling job counters, updated incrementally on job state transitions
+
+    One row per (scope, period): scope is "all" or "user:<id>", period is
+    "all" or the job creation day (YYYY-MM-DD). Status counters track how
+    many jobs are currently in each state, so old jobs can be deleted
+    without losing history.
+    """
+
+    __tablename__ = "job_statistics"
+    __table_args__ = (db.UniqueConstraint("scope", "period", name="uq_job_statistics_scope_period"),)
+
+    COUNTERS = ("total_jobs", "running_jobs", "completed_jobs", "failed_jobs", "cancelled_jobs", "total_downloaded")
+
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(50), nullable=False)
+    period = db.Column(db.String(10), nullable=False)
+    total_jobs = db.Column(db.Integer, nullable=False, default=0)
+    running_jobs = db.Column(db.Integer, nullable=False, default=0)
+    completed_jobs = db.Column(db.Integer, nullable=False, default=0)
+    failed_jobs = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_jobs = db.Column(db.Integer, nullable=False, default=0)
+    total_downloaded = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert counters to the get_job_statistics shape"""
+        data = {name: getattr(self, name) or 0 for name in self.COUNTERS}
+        data["period"] = self.period
+        return data
+
+
+class JobFileResult(db.Model):
+    """Per-file result row for a scrape job"""
+
+    __tablename__ = "job_file_results"
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(100), db.ForeignKey("scrape_jobs.id"), nullable=False, index=True)
+    source = db.Column(db.String(100))
+    filename = db.Column(db.String(255))
+    file_path = db.Column(db.String(500))
+    original_url = db.Column(db.Text)  # Scraped URLs can be far longer than any VARCHAR limit
+    content_type = db.Column(db.String(100))
+    file_size = db.Column(db.BigInteger)
+    extra = db.Column(db.Text)  # JSON of any remaining file_info keys
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    KNOWN_KEYS = ("source", "filename", "filepath", "original_url", "content_type", "file_size")
+
+    @classmethod
+    def from_file_info(cls, job_id, file_info):
+        """Build a row from a downloader file_info dict"""
+        extra = {k: v for k, v in file_info.items() if k not in cls.KNOWN_KEYS}
+        return cls(
+            job_id=job_id,
+            source=file_info.get("source"),
+            filename=file_info.get("filename"),
+            file_path=file_info.get("filepath"),
+            original_url=file_info.get("original_url"),
+            content_type=file_info.get("content_type"),
+            file_size=file_info.get("file_size"),
+            extra=json.dumps(extra, default=str) if extra else None,
+        )
+
+    def to_dict(self):
+        """Convert to the file_info shape the downloaders produce"""
+        data = {}
+        if self.extra:
+            try:
+                data.update(json.loads(self.extra))
+            except json.JSONDecodeError:
+                pass
+        data.update(
+            {
+                "source": self.source,
+                "filename": self.filename,
+                "filepath": self.file_path,
+                "original_url": self.original_url,
+                "content_type": self.content_type,
+                "file_size": self.file_size,
+            }
+        )
+        return data
+
+
+class JobEvent(db.Model):
+    """Append-only live log entry for a scrape job
+
+    The autoincrement id doubles as the read cursor: clients poll for
+    events with id greater than the last one they saw.
+    """
+
+    __tablename__ = "job_events"
+    __table_args__ = (db.Index("ix_job_events_job_id_id", "job_id", "id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(100), db.ForeignKey("scrape_jobs.id"), nullable=False)
+    kind = db.Column(db.String(20), nullable=False, default="update")  # update, file
+    message = db.Column(db.String(1000))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert to the live update shape used by the dashboard"""
+        created_at = self.created_at or datetime.utcnow()
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "timestamp": created_at.strftime("%H:%M:%S"),
+            "message": self.message,
+            "created_at": created_at.isoformat(),
+        }
+
+
+class JobSourceResult(db.Model):
+    """Per-source result row for a scrape job"""
+
+    __tablename__ = "job_source_results"
+    __table_args__ = (db.UniqueConstraint("job_id", "source", name="uq_job_source_results_job_source"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(100), db.ForeignKey("scrape_jobs.id"), nullable=False, index=True)
+    source = db.Column(db.String(100), nullable=False)
+    downloaded = db.Column(db.Integer, default=0)
+    images = db.Column(db.Integer, default=0)
+    videos = db.Column(db.Integer, default=0)
+    success = db.Column(db.Boolean, default=False)
+    error = db.Column(db.String(500))
+
+    def to_dict(self):
+        """Convert to the source_stats entry shape"""
+        return {
+            "downloaded": self.downloaded or 0,
+            "images": self.images or 0,
+            "videos": self.videos or 0,
+            "success": bool(self.success),
+            "error": self.error,
+        }
 
 
 class Asset(db.Model):
     """Model for tracking downloaded assets"""
 
     __tablename__ = "assets"
+    __table_args__ = (
+        db.Index("ix_assets_user_type_dims", "user_id", "is_deleted", "file_type", "width", "height"),
+        db.Index("ix_assets_user_type_duration", "user_id", "is_deleted", "file_type", "duration"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)  # Nullable for guest assets
@@ -337,6 +508,9 @@ class Asset(db.Model):
     width = db.Column(db.Integer)
     height = db.Column(db.Integer)
     duration = db.Column(db.Float)  # Video duration in seconds
+    ahash = db.Column(db.String(16))  # Perceptual hashes (64-bit hex) for near-duplicate detection
+    dhash = db.Column(db.String(16))
+    phash = db.Column(db.String(16), index=True)
     thumbnail_path = db.Column(db.String(500))
     downloaded_at = db.Column(db.DateTime, default=lambda: datetime.utcnow())
     is_deleted = db.Column(db.Boolean, default=False)
@@ -346,6 +520,7 @@ class Asset(db.Model):
     # Relationships
     job = db.relationship("ScrapeJob", backref="assets")
     media_blob = db.relationship("MediaBlob", uselist=False, back_populates="asset")
+    thumbnails = db.relationship("MediaThumbnail", lazy="dynamic", cascade="all, delete-orphan")
 
     def get_metadata(self):
         """Get metadata as dictionary"""
@@ -484,20 +659,225 @@ class OAuth(db.Model):
     user = db.relationship("User")
 
 
+class MediaThumbnail(db.Model):
+    """One encoded thumbnail of an asset: a (size, format) level of its pyramid
+
+    The whole pyramid (small/medium/large x JPEG/WebP/AVIF) is produced from a
+    single decode at ingest, so serving never has to generate anything.
+    """
+
+    __tablename__ = "media_thumbnails"
+    __table_args__ = (
+        db.UniqueConstraint("asset_id", "size", "format", name="uq_media_thumbnails_asset_size_format"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    asset_id = db.Column(db.Integer, db.ForeignKey("assets.id"), nullable=False, index=True)
+    size = db.Column(db.String(10), nullable=False)  # small, medium, large
+    format = db.Column(db.String(10), nullable=False)  # jpeg, webp, avif
+    mime_type = db.Column(db.String(50), nullable=False)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    byte_size = db.Column(db.Integer)
+    data = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def store_pyramid(cls, asset_id, variants, session=None):
+        """Replace an asset's thumbnails with generate_pyramid() output (caller commits)"""
+        session = session or db.session
+        session.query(cls).filter_by(asset_id=asset_id).delete(synchronize_session=False)
+        for variant in variants:
+            session.add(
+                cls(
+                    asset_id=asset_id,
+                    size=variant["size"],
+                    format=variant["format"],
+                    mime_type=variant["mime_type"],
+                    width=variant["width"],
+                    height=variant["height"],
+                    byte_size=len(variant["data"]),
+                    data=variant["data"],
+                )
+            )
+        return len(variants)
+
+    @classmethod
+    def find(cls, asset_id, size, formats=("jpeg",), with_data=True):
+        """Best stored thumbnail for a size, trying formats in preference order
+
+        with_data=False leaves the image bytes deferred (loaded on first access
+        of .data), so conditional requests can be answered from metadata.
+        """
+        from sqlalchemy.orm import undefer
+
+        query = cls.query.options(undefer(cls.data)) if with_data else cls.query
+        rows = (
+            query.filter(cls.asset_id == asset_id, cls.size == size, cls.format.in_(list(formats)))
+            .all()
+        )
+        by_format = {row.format: row for row in rows}
+        return next((by_format[name] for name in formats if name in by_format), None)
+
+
+class MediaContent(db.Model):
+    """Shared blob store content, referenced by one MediaBlob per asset
+
+    Identical bytes ingested by any user or job are stored once under their
+    content key; ref_count tracks how many MediaBlob rows point at it and the
+    file is garbage collected when it drops to zero. With encryption at rest
+    keys are scoped per owner, so sharing then only happens within a user.
+    """
+
+    __tablename__ = "media_contents"
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_key = db.Column(db.String(80), unique=True, nullable=False)
+    file_hash = db.Column(db.String(64), nullable=False, index=True)  # SHA-256 of the plaintext
+    byte_size = db.Column(db.BigInteger, nullable=False, default=0)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<MediaContent {self.content_key[:12]} refs={self.ref_count}>"
+
+    @classmethod
+    def _add_reference(cls, content_key):
+        """Atomically bump ref_count; returns False if no row exists"""
+        from sqlalchemy import update
+
+        stmt = (
+            update(cls)
+            .where(cls.content_key == content_key)
+            .values(ref_count=cls.ref_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return db.session.execute(stmt).rowcount > 0
+
+    @classmethod
+    def acquire_file(cls, file_path, owner_id=None):
+        """Reference the content of a file, writing it to the blob store only if new
+
+        The file is hashed first (read-only, chunked); when the content is
+        already stored only its ref_count moves. Returns (content_key, sha256_hex,
+        size, deduplicated).
+        """
+        from sqlalchemy.exc import IntegrityError
+
+        from blob_store import blob_store
+
+        file_hash, size = blob_store.hash_file(file_path)
+        content_key = blob_store.make_key(file_hash, owner_id)
+
+        if cls._add_reference(content_key):
+            if not blob_store.exists(content_key):
+                # Row survived but the file did not; restore it
+                blob_store.put_file(file_path, owner_id=owner_id)
+            return content_key, file_hash, size, True
+
+        blob_store.put_file(file_path, owner_id=owner_id)
+        try:
+            with db.session.begin_nested():
+                db.session.add(cls(content_key=content_key, file_hash=file_hash, byte_size=size, ref_count=1))
+            return content_key, file_hash, size, False
+        except IntegrityError:
+            # Another worker stored the same content first
+            cls._add_reference(content_key)
+            return content_key, file_hash, size, True
+
+    @classmethod
+    def release(cls, content_keys):
+        """Drop one reference per key and delete content nobody references
+
+        Call after the referencing MediaBlob rows have been deleted and committed.
+        Returns the number of blob files removed.
+
+        The file is unlinked before the row delete commits, while the
+        decrement still holds the row's write lock: a concurrent acquire_file
+        blocks on that lock and then either finds a live reference or no row
+        at all, in which case it writes the file again.
+        """
+        from sqlalchemy import delete, update
+
+        from blob_store import blob_store
+
+        released = 0
+        for key in (k for k in content_keys if k):
+            try:
+                stmt = (
+                    update(cls)
+                    .where(cls.content_key == key)
+                    .values(ref_count=cls.ref_count - 1)
+                    .execution_options(synchronize_session=False)
+                )
+                if db.session.execute(stmt).rowcount == 0:
+                    # Content stored before reference counting; fall back to a live count
+                    # (skipped if acquire_file has started tracking it meanwhile)
+                    unreferenced = (
+                        MediaBlob.query.filter_by(content_key=key).count() == 0
+                        and cls.query.filter_by(content_key=key).count() == 0
+                    )
+                    if unreferenced and blob_store.delete(key):
+                        released += 1
+                    continue
+                gone = db.session.execute(
+                    delete(cls)
+                    .where(cls.content_key == key, cls.ref_count <= 0)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if gone and blob_store.delete(key):
+                    released += 1
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error releasing media content {key}: {e}")
+        return released
+
+    @classmethod
+    def get_savings(cls):
+        """Bytes referenced vs bytes actually stored across all users"""
+        from sqlalchemy import func
+
+        row = db.session.query(
+            func.count(cls.id),
+            func.coalesce(func.sum(cls.byte_size), 0),
+            func.coalesce(func.sum(cls.byte_size * cls.ref_count), 0),
+            func.coalesce(func.sum(cls.ref_count), 0),
+        ).one()
+        unique_count, stored_bytes, logical_bytes, references = row
+        return {
+            "unique_files": int(unique_count),
+            "references": int(references),
+            "stored_bytes": int(stored_bytes),
+            "logical_bytes": int(logical_bytes),
+            "bytes_saved": int(logical_bytes) - int(stored_bytes),
+        }
+
+
 class MediaBlob(db.Model):
-    """Model for storing media files as BLOBs in the database for enhanced security"""
+    """Model for media file payloads
+
+    Bytes live either in the content-addressed blob store (storage_backend
+    "filesystem", keyed by content_key) or, for legacy rows and the
+    "database" backend, in media_data. Payload columns are deferred in
+    their own groups ("payload", "thumbnail") so metadata queries never pull
+    BLOBs; use undefer_group() on paths that actually serve them.
+    """
 
     __tablename__ = "media_blobs"
 
     id = db.Column(db.Integer, primary_key=True)
     asset_id = db.Column(db.Integer, db.ForeignKey("assets.id"), nullable=False, unique=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)  # Allow guest users (None)
-    media_data = db.Column(db.LargeBinary, nullable=False)  # The actual file data
+    media_data = db.deferred(db.Column(db.LargeBinary, nullable=True), group="payload")  # "database" backend data
     mime_type = db.Column(db.String(100), nullable=False)
+    byte_size = db.Column(db.BigInteger)  # Payload size, so it never has to be measured from the data
     file_hash = db.Column(db.String(64))  # SHA-256 hash for deduplication
+    content_key = db.Column(db.String(80), index=True)  # Blob store key for the "filesystem" backend
+    storage_backend = db.Column(db.String(20), default="database")  # database, filesystem
     compressed = db.Column(db.Boolean, default=False)  # Whether data is compressed
     encryption_key = db.Column(db.String(64))  # Optional encryption key
-    thumbnail_data = db.Column(db.LargeBinary)  # Thumbnail image data
+    thumbnail_data = db.deferred(db.Column(db.LargeBinary), group="thumbnail")  # Thumbnail image data
     thumbnail_mime_type = db.Column(db.String(100))  # Thumbnail MIME type
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_accessed = db.Column(db.DateTime, default=datetime.utcnow)
@@ -511,56 +891,193 @@ class MediaBlob(db.Model):
         return f"<MediaBlob id={self.id} asset_id={self.asset_id} user_id={self.user_id}>"
 
     def record_access(self):
-        """Record access to this media blob"""
-        self.last_accessed = datetime.utcnow()
-        self.access_count += 1
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error recording media blob access: {e}")
+        """Record access to this media blob (buffered, flushed in batches by access_tracker)"""
+        from access_tracker import access_tracker
+
+        access_tracker.record(self.id)
+
+    @property
+    def in_blob_store(self):
+        """Whether the payload lives in the on-disk blob store"""
+        return self.storage_backend == "filesystem" and bool(self.content_key)
 
     def get_file_data(self):
         """Get the media file data, recording access"""
         self.record_access()
+        if self.in_blob_store:
+            from blob_store import blob_store
+
+            return blob_store.read(self.content_key)
         return self.media_data
 
     def get_file_data_stream(self, chunk_size=8192):
         """Get the media file data as a generator for streaming large files"""
         self.record_access()
-        if self.media_data:
+        if self.in_blob_store:
+            from blob_store import blob_store
+
+            yield from blob_store.iter_chunks(self.content_key, chunk_size=chunk_size)
+        elif self.media_data:
             for i in range(0, len(self.media_data), chunk_size):
                 yield self.media_data[i : i + chunk_size]
 
+    def iter_range(self, start, end, chunk_size=256 * 1024):
+        """Yield payload bytes [start, end) without recording access
+
+        Blob store files are read from the window only (encrypted blobs are
+        decrypted from the nearest AES block). Database payloads are read with
+        one SUBSTRING query per chunk, so media_data is never loaded whole.
+        """
+        if self.in_blob_store:
+            from blob_store import blob_store
+
+            yield from blob_store.iter_chunks(self.content_key, start, end, chunk_size=chunk_size)
+            return
+
+        from sqlalchemy import inspect, select
+
+        if "media_data" not in inspect(self).unloaded:
+            data = self.media_data or b""
+            for offset in range(start, end, chunk_size):
+                yield data[offset : min(offset + chunk_size, end)]
+            return
+
+        column = MediaBlob.__table__.c.media_data
+        dialect = db.session.get_bind().dialect.name
+        substring = db.func.substr if dialect == "sqlite" else db.func.substring
+        for offset in range(start, end, chunk_size):
+            length = min(chunk_size, end - offset)
+            chunk = db.session.execute(
+                select(substring(column, offset + 1, length)).where(MediaBlob.__table__.c.id == self.id)
+            ).scalar()
+            if not chunk:
+                break
+            yield bytes(chunk)
+
+    def open_stream(self):
+        """Open the payload as a seekable binary file object without recording access
+
+        Plain blob store files are opened directly; encrypted blobs are decrypted
+        into a spooled temp file so memory stays bounded for large payloads.
+        """
+        if self.in_blob_store:
+            import tempfile
+
+            from blob_store import CHUNK_SIZE, blob_store
+
+            path = blob_store.plain_path(self.content_key)
+            if path:
+                return open(path, "rb")
+            spool = tempfile.SpooledTemporaryFile(max_size=CHUNK_SIZE)
+            for chunk in blob_store.iter_chunks(self.content_key):
+                spool.write(chunk)
+            spool.seek(0)
+            return spool
+        from io import BytesIO
+
+        return BytesIO(self.media_data or b"")
+
+    def write_media_stream(self, stream, chunk_size=None):
+        """Write a binary stream into media_data in chunks; returns (sha256_hex, size)
+
+        The row must already be flushed. Each chunk is appended with the
+        dialect's in-place BLOB update (SQL Server .WRITE, PostgreSQL ||,
+        MySQL CONCAT, SQLite incremental blob I/O), so only one chunk is held
+        in memory and no statement binds the whole file.
+        """
+        import hashlib
+
+        from sqlalchemy import text
+
+        from blob_store import CHUNK_SIZE
+
+        chunk_size = chunk_size or CHUNK_SIZE
+        dialect = db.session.get_bind().dialect.name
+        hasher = hashlib.sha256()
+        size = 0
+
+        if dialect == "sqlite":
+            # SQLite || works on text, so preallocate and write through the blob handle
+            start = stream.tell()
+            stream.seek(0, os.SEEK_END)
+            total = stream.tell() - start
+            stream.seek(start)
+            db.session.execute(
+                text("UPDATE media_blobs SET media_data = zeroblob(:size) WHERE id = :id"),
+                {"size": total, "id": self.id},
+            )
+            raw = db.session.connection().connection.driver_connection
+            with raw.blobopen("media_blobs", "media_data", self.id) as blob:
+                while size < total:
+                    chunk = stream.read(min(chunk_size, total - size))
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    blob.write(chunk)
+                    size += len(chunk)
+        else:
+            if dialect == "mssql":
+                append = "UPDATE media_blobs SET media_data.WRITE(:chunk, NULL, NULL) WHERE id = :id"
+            elif dialect == "mysql":
+                append = "UPDATE media_blobs SET media_data = CONCAT(media_data, :chunk) WHERE id = :id"
+            else:
+                append = "UPDATE media_blobs SET media_data = media_data || :chunk WHERE id = :id"
+            db.session.execute(
+                text("UPDATE media_blobs SET media_data = :empty WHERE id = :id"), {"empty": b"", "id": self.id}
+            )
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                db.session.execute(text(append), {"chunk": chunk, "id": self.id})
+                size += len(chunk)
+
+        # The ORM copy is stale; reload lazily only if someone asks for it
+        db.session.expire(self, ["media_data"])
+        return hasher.hexdigest(), size
+
+    def get_file_path(self):
+        """On-disk path that can be served as-is, or None (DB payload or encrypted blob)"""
+        if self.in_blob_store:
+            from blob_store import blob_store
+
+            return blob_store.plain_path(self.content_key)
+        return None
+
     def get_file_size(self):
         """Get file size without loading data into memory"""
+        if self.byte_size is not None:
+            return self.byte_size
+        if self.in_blob_store:
+            from blob_store import blob_store
+
+            return blob_store.size(self.content_key)
         return len(self.media_data) if self.media_data else 0
 
+    @classmethod
+    def release_content(cls, content_keys):
+        """Release the shared content of deleted rows (see MediaContent.release)"""
+        return MediaContent.release(content_keys)
+
     @classmethod
     def store_media_file(cls, asset_id, user_id, file_path, mime_type=None):
         """Store a file as a media blob"""
-        import hashlib
         import mimetypes
 
+        from blob_store import BACKEND_FILESYSTEM, get_storage_backend
+
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
-        # Read file data
-        with open(file_path, "rb") as f:
-            file_data = f.read()
-
-        # Calculate hash for deduplication
-        file_hash = hashlib.sha256(file_data).hexdigest()
-
         # Check if this asset already has a MediaBlob
         existing_for_asset = cls.query.filter_by(asset_id=asset_id).first()
         if existing_for_asset:
             print(f"⚠️ Asset {asset_id} already has a MediaBlob")
             return existing_for_asset
 
-        # Note: We used to check for duplicate files by hash, but this caused issues
-        # because MediaBlob has a unique constraint on asset_id. Each asset needs
-        # its own MediaBlob, even if the file content is identical.
+        # Each asset keeps its own MediaBlob (asset_id is unique); identical file
+        # content is shared underneath through MediaContent.
 
         # Determine MIME type
         if mime_type is None:
@@ -584,13 +1101,33 @@ class MediaBlob(db.Model):
                 mime_type = mime_type_map.get(ext, "application/octet-stream")
 
         # Create media blob
-        media_blob = cls(
-            asset_id=asset_id, user_id=user_id, media_data=file_data, mime_type=mime_type, file_hash=file_hash
-        )
+        if get_storage_backend() == BACKEND_FILESYSTEM:
+            content_key, file_hash, byte_size, _ = MediaContent.acquire_file(file_path, owner_id=user_id)
+            media_blob = cls(
+                asset_id=asset_id,
+                user_id=user_id,
+                mime_type=mime_type,
+                byte_size=byte_size,
+                file_hash=file_hash,
+                content_key=content_key,
+                storage_backend=BACKEND_FILESYSTEM,
+            )
+        else:
+            media_blob = cls(
+                asset_id=asset_id,
+                user_id=user_id,
+                media_data=b"",
+                mime_type=mime_type,
+            )
 
         db.session.add(media_blob)
 
         try:
+            if not media_blob.in_blob_store:
+                # Stream the file into media_data in chunks instead of one bound parameter
+                db.session.flush()
+                with open(file_path, "rb") as f:
+                    media_blob.file_hash, media_blob.byte_size = media_blob.write_media_stream(f)
             db.session.commit()
 
             # Update asset to indicate it's stored in database
@@ -616,15 +1153,18 @@ class MediaBlob(db.Model):
         old_blobs = cls.query.filter(cls.last_accessed < cutoff_date).all()
 
         deleted_count = 0
+        content_keys = []
         for blob in old_blobs:
             # Also mark the associated asset as deleted
             if blob.asset:
                 blob.asset.is_deleted = True
+            content_keys.append(blob.content_key)
             db.session.delete(blob)
             deleted_count += 1
 
         try:
             db.session.commit()
+            cls.release_content(content_keys)
             return deleted_count
         except Exception as e:
             db.session.rollback()
@@ -2,29 +2,30 @@
 """
 Regenerate thumbnails for all assets in the database
 This script will:
-1. Query all assets without thumbnails
-2. Generate thumbnail for each asset
-3. Update MediaBlob records with thumbnail data
-4. Print progress and statistics
+1. Walk assets without thumbnails in id order (keyset pagination, so rows
+   fixed along the way never shift the window)
+2. Render each asset's thumbnail pyramid in a process pool
+3. Store the pyramids (all sizes/formats) in media_thumbnails, one commit per batch
+4. Record the last committed asset id so an interrupted run resumes there
+5. Print progress, statistics and throughput
 """
 
 import os
 import sys
 import json
-import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from io import BytesIO
-from PIL import Image
 import logging
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, select
 from sqlalchemy.orm import sessionmaker
-from models import Asset, MediaBlob, db
-from db_asset_manager import generate_thumbnail
+from sqlalchemy import exists
+from models import Asset, MediaBlob, MediaThumbnail, db
 
 # Setup logging
 logging.basicConfig(
@@ -36,13 +37,94 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-def regenerate_thumbnails(batch_size=50, force_regenerate=False):
+PROGRESS_FILE = os.path.join('downloads', '.thumbnail_regeneration.json')
+
+# Per-worker database engine for payloads stored in media_blobs.media_data
+_worker_engine = None
+
+
+def _init_worker(database_url):
+    global _worker_engine
+    _worker_engine = create_engine(database_url)
+
+
+def _render_pyramid(task):
+    """Pool worker: build one asset's pyramid; returns (asset_id, variants, error)
+
+    The main process only sends where the media lives (file path, blob store
+    key or MediaBlob id), never the payload itself.
+    """
+    from db_asset_manager import generate_thumbnail_pyramid
+
+    asset_id, mime_type, path, content_key, blob_id = task
+    try:
+        if path:
+            return asset_id, generate_thumbnail_pyramid(path, mime_type), None
+        if content_key:
+            blob = MediaBlob(content_key=content_key, storage_backend='filesystem')
+            with blob.open_stream() as source:
+                return asset_id, generate_thumbnail_pyramid(source, mime_type), None
+        with _worker_engine.connect() as conn:
+            data = conn.execute(
+                select(MediaBlob.__table__.c.media_data).where(MediaBlob.__table__.c.id == blob_id)
+            ).scalar()
+        if not data:
+            return asset_id, [], 'no media data'
+        return asset_id, generate_thumbnail_pyramid(data, mime_type), None
+    except Exception as e:
+        return asset_id, [], str(e)
+
+
+def load_progress(progress_file, restart=False):
+    """Last committed asset id and running counts from an interrupted run"""
+    if not restart:
+        try:
+            with open(progress_file) as f:
+                progress = json.load(f)
+            if not progress.get('completed'):
+                return progress
+        except (OSError, ValueError):
+            pass
+    return {'last_id': 0, 'processed': 0, 'success': 0, 'errors': 0, 'skipped': 0}
+
+
+def save_progress(progress_file, progress):
+    """Write progress atomically so a crash never leaves a truncated file"""
+    os.makedirs(os.path.dirname(progress_file) or '.', exist_ok=True)
+    progress['updated_at'] = datetime.utcnow().isoformat()
+    tmp_path = progress_file + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, progress_file)
+
+
+def _build_task(row):
+    """Pool task for an asset row, or None if its media can't be found"""
+    asset_id, asset_path, blob_id, mime_type, content_key, storage_backend = row
+    if storage_backend == 'filesystem' and content_key:
+        from blob_store import blob_store
+
+        # Plain blobs are opened by path; encrypted ones are decrypted by the worker
+        path = blob_store.plain_path(content_key)
+        return asset_id, mime_type, path, None if path else content_key, None
+    if blob_id is not None:
+        return asset_id, mime_type, None, None, blob_id
+    if asset_path and os.path.exists(asset_path):
+        return asset_id, mime_type, asset_path, None, None
+    return None
+
+
+def regenerate_thumbnails(batch_size=50, force_regenerate=False, workers=None,
+                          progress_file=PROGRESS_FILE, restart=False):
     """
     Regenerate thumbnails for all assets
 
     Args:
-        batch_size: Number of assets to process in each batch
+        batch_size: Number of assets per keyset page and per commit
         force_regenerate: If True, regenerate thumbnails even if they already exist
+        workers: Worker processes (default: CPU count)
+        progress_file: JSON file recording the last committed asset id
+        restart: Ignore saved progress and start from the first asset
     """
 
     # Get database URL
@@ -56,115 +138,102 @@ def regenerate_thumbnails(batch_size=50, force_regenerate=False):
     Session = sessionmaker(bind=engine)
     session = Session()
 
+    progress = load_progress(progress_file, restart)
+    if progress['last_id']:
+        logger.info(f"Resuming after asset {progress['last_id']} ({progress['processed']} already processed)")
+
+    # Only ids and locations: payload columns are never loaded in this process
+    assets_query = session.query(
+        Asset.id, Asset.file_path, MediaBlob.id, MediaBlob.mime_type,
+        MediaBlob.content_key, MediaBlob.storage_backend
+    ).join(MediaBlob, Asset.id == MediaBlob.asset_id).filter(Asset.is_deleted == False)  # noqa: E712
+    if not force_regenerate:
+        assets_query = assets_query.filter(~exists().where(MediaThumbnail.asset_id == Asset.id))
+
+    pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                               initializer=_init_worker, initargs=(database_url,))
+    started = time.monotonic()
+    run_processed = 0
+
     try:
-        # Count total assets
-        total_assets = session.query(Asset).filter_by(is_deleted=False).count()
-        logger.info(f"Total assets in database: {total_assets}")
-
-        # Query assets that need thumbnails
-        if force_regenerate:
-            assets_query = session.query(Asset).filter_by(is_deleted=False)
-        else:
-            # Get assets without thumbnails
-            assets_query = session.query(Asset).filter_by(is_deleted=False).join(
-                MediaBlob, Asset.id == MediaBlob.asset_id
-            ).filter(MediaBlob.thumbnail_data == None)
-
-        assets_to_process = assets_query.count()
+        assets_to_process = assets_query.filter(Asset.id > progress['last_id']).count()
         logger.info(f"Assets to process: {assets_to_process}")
 
         if assets_to_process == 0:
             logger.info("No assets need thumbnail generation")
             return
 
-        # Process in batches
-        processed = 0
-        success_count = 0
-        error_count = 0
-        skipped_count = 0
-
-        for offset in range(0, assets_to_process, batch_size):
-            batch = assets_query.offset(offset).limit(batch_size).all()
-
-            for asset in batch:
-                processed += 1
-                try:
-                    # Get MediaBlob
-                    media_blob = session.query(MediaBlob).filter_by(asset_id=asset.id).first()
-
-                    if not media_blob:
-                        logger.warning(f"Asset {asset.id} has no MediaBlob, skipping")
-                        skipped_count += 1
-                        continue
-
-                    # Check if thumbnail already exists (unless forcing)
-                    if not force_regenerate and media_blob.thumbnail_data:
-                        logger.debug(f"Asset {asset.id} already has thumbnail, skipping")
-                        skipped_count += 1
-                        continue
-
-                    # Get media data
-                    if not media_blob.media_data:
-                        # Try to read from file if not in database
-                        if asset.file_path and os.path.exists(asset.file_path):
-                            with open(asset.file_path, 'rb') as f:
-                                file_data = f.read()
-                        else:
-                            logger.warning(f"Asset {asset.id} has no media data, skipping")
-                            skipped_count += 1
-                            continue
-                    else:
-                        file_data = media_blob.media_data
-
-                    # Generate thumbnail
-                    logger.info(f"[{processed}/{assets_to_process}] Generating thumbnail for asset {asset.id} ({asset.filename})")
-                    thumbnail_data, thumbnail_mime = generate_thumbnail(file_data, media_blob.mime_type)
-
-                    if thumbnail_data:
-                        # Update MediaBlob with thumbnail
-                        media_blob.thumbnail_data = thumbnail_data
-                        media_blob.thumbnail_mime_type = thumbnail_mime
-
-                        # Update asset metadata
-                        metadata = json.loads(asset.asset_metadata) if asset.asset_metadata else {}
-                        metadata['has_thumbnail'] = True
-                        metadata['thumbnail_generated_at'] = datetime.utcnow().isoformat()
-                        asset.asset_metadata = json.dumps(metadata)
-
-                        success_count += 1
-                        logger.info(f"Successfully generated thumbnail for asset {asset.id}")
-                    else:
-                        logger.warning(f"Failed to generate thumbnail for asset {asset.id}")
-                        error_count += 1
-
-                except Exception as e:
-                    logger.error(f"Error processing asset {asset.id}: {e}")
-                    error_count += 1
-                    continue
-
-            # Commit batch
+        while True:
+            rows = assets_query.filter(Asset.id > progress['last_id']).order_by(Asset.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            tasks = []
+            for row in rows:
+                task = _build_task(row)
+                if task:
+                    tasks.append(task)
+                else:
+                    logger.warning(f"Asset {row[0]} has no media data, skipping")
+                    progress['skipped'] += 1
+
+            for asset_id, variants, error in pool.map(_render_pyramid, tasks):
+                if variants:
+                    # Store every size/format from the single decode
+                    MediaThumbnail.store_pyramid(asset_id, variants, session=session)
+
+                    # Update asset metadata
+                    asset = session.get(Asset, asset_id)
+                    metadata = json.loads(asset.asset_metadata) if asset.asset_metadata else {}
+                    metadata['has_thumbnail'] = True
+                    metadata['thumbnail_generated_at'] = datetime.utcnow().isoformat()
+                    asset.asset_metadata = json.dumps(metadata)
+                    progress['success'] += 1
+                else:
+                    logger.warning(f"Failed to generate thumbnail for asset {asset_id}: {error or 'unsupported media'}")
+                    progress['errors'] += 1
+
+            # Commit batch, then move the resume point past it
             try:
                 session.commit()
-                logger.info(f"Committed batch {offset//batch_size + 1}, processed {min(offset + batch_size, assets_to_process)}/{assets_to_process}")
             except Exception as e:
-                logger.error(f"Failed to commit batch: {e}")
+                logger.error(f"Failed to commit batch ending at asset {rows[-1][0]}: {e}")
                 session.rollback()
+                raise
+
+            progress['last_id'] = rows[-1][0]
+            progress['processed'] += len(rows)
+            run_processed += len(rows)
+            save_progress(progress_file, progress)
+
+            rate = run_processed / max(time.monotonic() - started, 1e-6)
+            logger.info(
+                f"Committed through asset {progress['last_id']}: "
+                f"{run_processed}/{assets_to_process} this run, {rate:.1f} assets/sec"
+            )
+
+        progress['completed'] = True
+        save_progress(progress_file, progress)
 
+        elapsed = time.monotonic() - started
         # Print summary
         logger.info("=" * 60)
         logger.info("THUMBNAIL REGENERATION COMPLETE")
         logger.info("=" * 60)
-        logger.info(f"Total assets processed: {processed}")
-        logger.info(f"Thumbnails generated: {success_count}")
-        logger.info(f"Errors: {error_count}")
-        logger.info(f"Skipped: {skipped_count}")
+        logger.info(f"Total assets processed: {progress['processed']}")
+        logger.info(f"Thumbnails generated: {progress['success']}")
+        logger.info(f"Errors: {progress['errors']}")
+        logger.info(f"Skipped: {progress['skipped']}")
+        logger.info(f"Throughput: {run_processed / max(elapsed, 1e-6):.1f} assets/sec ({elapsed:.1f}s)")
         logger.info("=" * 60)
 
     except Exception as e:
         logger.error(f"Fatal error: {e}")
+        logger.error(f"Progress saved in {progress_file}; rerun to resume after asset {progress['last_id']}")
         session.rollback()
         sys.exit(1)
     finally:
+        pool.shutdown(cancel_futures=True)
         session.close()
 
 
@@ -189,10 +258,10 @@ def check_thumbnail_stats():
             MediaBlob, Asset.id == MediaBlob.asset_id
         ).count()
 
-        # Assets with thumbnails
+        # Assets with a thumbnail pyramid
         assets_with_thumbnails = session.query(Asset).filter_by(is_deleted=False).join(
             MediaBlob, Asset.id == MediaBlob.asset_id
-        ).filter(MediaBlob.thumbnail_data != None).count()
+        ).filter(exists().where(MediaThumbnail.asset_id == Asset.id)).count()
 
         # Image assets
         image_assets = session.query(Asset).filter_by(is_deleted=False, file_type='image').count()
@@ -222,7 +291,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Regenerate thumbnails for assets')
     parser.add_argument('--force', action='store_true', help='Force regenerate all thumbnails')
     parser.add_argument('--stats', action='store_true', help='Show thumbnail statistics only')
-    parser.add_argument('--batch-size', type=int, default=50, help='Batch size for processing')
+    parser.add_argument('--batch-size', type=int, default=50, help='Assets per page and per commit')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--progress-file', default=PROGRESS_FILE, help='Resume state file')
+    parser.add_argument('--restart', action='store_true', help='Ignore saved progress and start over')
 
     args = parser.parse_args()
 
@@ -232,5 +304,8 @@ if __name__ == "__main__":
         print("Starting thumbnail regeneration...")
         print(f"Force regenerate: {args.force}")
         print(f"Batch size: {args.batch_size}")
+        print(f"Workers: {args.workers or os.cpu_count()}")
         print()
-        regenerate_thumbnails(batch_size=args.batch_size, force_regenerate=args.force)
\ No newline at end of file
+        regenerate_thumbnails(batch_size=args.batch_size, force_regenerate=args.force,
+                              workers=args.workers, progress_file=args.progress_file,
+                              restart=args.restart)
\ No newline at end of file
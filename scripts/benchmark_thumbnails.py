@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Utility: Compare full-resolution and reduced (JPEG draft) thumbnail decoding.
+Each mode runs in a fresh process so peak RSS reflects only that mode
+(measured with resource on Unix, psutil on Windows if installed).
+
+Usage:
+    python scripts/benchmark_thumbnails.py [image.jpg ...] [--iterations N] [--size medium]
+
+Without image paths a synthetic 24 MP (6000x4000) JPEG is generated.
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from PIL import Image  # noqa: E402
+
+try:
+    import resource  # Unix only
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+try:
+    import psutil  # Windows: peak working set
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+from utils.thumbnail_generator import THUMBNAIL_SIZES, open_for_thumbnail  # noqa: E402
+
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in MB, or None if it can't be measured"""
+    if RESOURCE_AVAILABLE:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    if PSUTIL_AVAILABLE:
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+        if peak is not None:
+            return peak / (1024 * 1024)
+    return None
+
+
+def _run_mode(path, target, reduced, iterations, results):
+    with open(path, 'rb') as f:
+        data = f.read()
+    baseline = _peak_rss_mb()
+
+    timings = []
+    decoded = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        img = open_for_thumbnail(data, target, reduced=reduced)
+        decoded = img.size
+        img.thumbnail(target, Image.Resampling.LANCZOS)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    results.put({
+        'median_ms': statistics.median(timings),
+        'min_ms': min(timings),
+        'decoded': decoded,
+        'rss_mb': None if baseline is None else _peak_rss_mb() - baseline
+    })
+
+
+def benchmark(path, target, iterations):
+    ctx = multiprocessing.get_context('spawn')
+    rows = {}
+    for label, reduced in (('full', False), ('draft', True)):
+        results = ctx.Queue()
+        proc = ctx.Process(target=_run_mode, args=(path, target, reduced, iterations, results))
+        proc.start()
+        rows[label] = results.get()
+        proc.join()
+    return rows
+
+
+def _synthetic_jpeg(width=6000, height=4000):
+    # Smooth gradient plus noise: realistic entropy without a sample asset
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    img = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    fd, path = tempfile.mkstemp(suffix='.jpg')
+    os.close(fd)
+    img.save(path, 'JPEG', quality=90)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', nargs='*')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--size', choices=sorted(THUMBNAIL_SIZES), default='medium')
+    args = parser.parse_args()
+
+    target = THUMBNAIL_SIZES[args.size]
+    paths = args.images
+    synthetic = None
+    if not paths:
+        synthetic = _synthetic_jpeg()
+        paths = [synthetic]
+
+    try:
+        for path in paths:
+            with Image.open(path) as img:
+                source_size = img.size
+            rows = benchmark(path, target, args.iterations)
+            print(f"\n{os.path.basename(path)}  {source_size[0]}x{source_size[1]} -> {args.size} {target}")
+            print(f"  {'mode':6s} {'median ms':>10s} {'min ms':>8s} {'decoded':>12s} {'peak RSS +MB':>13s}")
+            for label, row in rows.items():
+                decoded = f"{row['decoded'][0]}x{row['decoded'][1]}"
+                rss = 'n/a' if row['rss_mb'] is None else f"{row['rss_mb']:.1f}"
+                print(f"  {label:6s} {row['median_ms']:10.1f} {row['min_ms']:8.1f} {decoded:>12s} {rss:>13s}")
+            speedup = rows['full']['median_ms'] / max(rows['draft']['median_ms'], 0.001)
+            print(f"  speedup: {speedup:.1f}x")
+    finally:
+        if synthetic:
+            os.remove(synthetic)
+
+
+if __name__ == '__main__':
+    main()
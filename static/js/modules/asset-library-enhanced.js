@@ -9,6 +9,9 @@ class AssetLibraryEnhanced {
         this.focusedIndex = 0;
         this.hoveredVideo = null;
         this.selectAllUsed = false; // Track if Select All was clicked
+        this.thumbnailQueue = new Map(); // asset id -> <img> waiting for the next batch
+        this.thumbnailTimer = null;
+        this.thumbnailUrls = new Map(); // asset id -> object URL from ThumbnailBatch
 
         this.init();
     }
@@ -282,6 +285,7 @@ class AssetLibraryEnhanced {
     }
     
     renderThumbnailView(container) {
+        this.releaseThumbnails();
         container.innerHTML = `
             <div class="asset-grid-container square-grid">
                 ${this.assets.map((asset, index) => this.createSquareThumbnailCard(asset, index)).join('')}
@@ -311,7 +315,11 @@ class AssetLibraryEnhanced {
                         const element = entry.target;
                         const src = element.getAttribute('data-src');
 
-                        if (src) {
+                        if (element.dataset.thumbId && window.ThumbnailBatch) {
+                            this.queueThumbnail(element);
+                            element.classList.remove('lazy-load');
+                            observer.unobserve(element);
+                        } else if (src) {
                             element.src = src;
                             element.classList.remove('lazy-load');
                             observer.unobserve(element);
@@ -330,10 +338,70 @@ class AssetLibraryEnhanced {
             // Fallback for browsers without Intersection Observer
             lazyElements.forEach(element => {
                 const src = element.getAttribute('data-src');
-                if (src) element.src = src;
+                if (element.dataset.thumbId && window.ThumbnailBatch) {
+                    this.queueThumbnail(element);
+                } else if (src) {
+                    element.src = src;
+                }
             });
         }
     }
+
+    queueThumbnail(element) {
+        // Images scrolled into view together are fetched in one /api/media/thumbnails request
+        this.thumbnailQueue.set(Number(element.dataset.thumbId), element);
+        if (!this.thumbnailTimer) {
+            this.thumbnailTimer = setTimeout(() => this.flushThumbnails(), 50);
+        }
+    }
+
+    async flushThumbnails() {
+        const queued = this.thumbnailQueue;
+        this.thumbnailQueue = new Map();
+        this.thumbnailTimer = null;
+
+        const ids = Array.from(queued.keys());
+        for (let start = 0; start < ids.length; start += 200) {  // MAX_BATCH_THUMBNAILS
+            const batch = ids.slice(start, start + 200);
+            let result;
+            try {
+                result = await ThumbnailBatch.load(batch, { size: 'medium' });
+            } catch (error) {
+                console.error('Batch thumbnail load failed:', error);
+                result = { urls: new Map(), missing: batch };
+            }
+
+            result.urls.forEach((url, id) => {
+                const element = queued.get(id);
+                if (!element || !element.isConnected) {
+                    // Grid was re-rendered while the batch was in flight
+                    URL.revokeObjectURL(url);
+                    return;
+                }
+                element.src = url;
+                this.thumbnailUrls.set(id, url);
+            });
+            // No stored thumbnail (or the batch failed): load the file itself
+            result.missing.forEach(id => {
+                const element = queued.get(id);
+                if (element && element.isConnected && element.dataset.src) {
+                    element.src = element.dataset.src;
+                }
+            });
+        }
+    }
+
+    releaseThumbnails() {
+        if (this.thumbnailTimer) {
+            clearTimeout(this.thumbnailTimer);
+            this.thumbnailTimer = null;
+        }
+        this.thumbnailQueue.clear();
+        if (window.ThumbnailBatch) {
+            ThumbnailBatch.release(this.thumbnailUrls);
+        }
+        this.thumbnailUrls.clear();
+    }
     
     createSquareThumbnailCard(asset, index) {
         const fileType = (asset.file_type || asset.type || '').toLowerCase();
@@ -354,7 +422,7 @@ class AssetLibraryEnhanced {
         if (isImage) {
             thumbnailContent = `
                 <div class="thumbnail-media">
-                    <img data-src="${mediaUrl}" alt="${fileName}" loading="lazy" class="lazy-load">
+                    <img data-src="${mediaUrl}" data-thumb-id="${asset.id}" alt="${fileName}" loading="lazy" class="lazy-load">
                 </div>
             `;
         } else if (isVideo) {
@@ -0,0 +1,85 @@
+/**
+ * ============================================================================
+ * THUMBNAIL BATCH LOADER
+ * ============================================================================
+ *
+ * Loads a page of thumbnails with one request to /api/media/thumbnails and
+ * unpacks the response into object URLs for <img> elements
+ */
+
+class ThumbnailBatch {
+    /**
+     * Fetch thumbnails for many assets at once
+     * @param {number[]} ids - Asset ids, in display order
+     * @param {Object} options - { size: 'small'|'medium'|'large', format: 'jpeg'|'webp'|'avif' (optional) }
+     * @returns {Promise<{urls: Map<number, string>, missing: number[]}>} - Object URLs by
+     *     asset id, and ids to load from /api/media/<id>/thumbnail instead
+     */
+    static async load(ids, options = {}) {
+        const base = (typeof window !== 'undefined' && window.APP_BASE) ? window.APP_BASE : '';
+        const params = new URLSearchParams({
+            ids: ids.join(','),
+            size: options.size || 'medium'
+        });
+        if (options.format) {
+            // Otherwise the server picks WebP/AVIF from the Accept header
+            params.set('format', options.format);
+        }
+        // fetch() sends Accept: */*, so name the image formats this browser decodes
+        const response = await fetch(`${base}/api/media/thumbnails?${params}`, {
+            credentials: 'same-origin',
+            headers: { Accept: ThumbnailBatch.acceptHeader() }
+        });
+        if (!response.ok) {
+            return { urls: new Map(), missing: ids.slice() };
+        }
+        return ThumbnailBatch.unpack(await response.arrayBuffer());
+    }
+
+    /**
+     * Accept header listing WebP when the browser can encode it (a reliable proxy for decoding)
+     * @returns {string}
+     */
+    static acceptHeader() {
+        if (ThumbnailBatch._accept === undefined) {
+            const canvas = document.createElement('canvas');
+            canvas.width = canvas.height = 1;
+            const webp = canvas.toDataURL('image/webp').startsWith('data:image/webp');
+            ThumbnailBatch._accept = webp ? 'image/webp,image/*;q=0.8,*/*;q=0.5' : 'image/*,*/*;q=0.5';
+        }
+        return ThumbnailBatch._accept;
+    }
+
+    /**
+     * Split a thumbnail pack into object URLs
+     * Layout: 4-byte big-endian index length, JSON index, concatenated images
+     * @param {ArrayBuffer} buffer - Response body
+     * @returns {{urls: Map<number, string>, missing: number[]}}
+     */
+    static unpack(buffer) {
+        const indexLength = new DataView(buffer).getUint32(0);
+        const index = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, indexLength)));
+        const dataStart = 4 + indexLength;
+
+        const urls = new Map();
+        for (const item of index.items) {
+            const start = dataStart + item.offset;
+            const blob = new Blob([buffer.slice(start, start + item.length)], { type: item.mime_type });
+            urls.set(item.id, URL.createObjectURL(blob));
+        }
+        return { urls, missing: index.missing || [] };
+    }
+
+    /**
+     * Release object URLs created by load()/unpack()
+     * @param {Map<number, string>} urls
+     */
+    static release(urls) {
+        for (const url of urls.values()) {
+            URL.revokeObjectURL(url);
+        }
+    }
+}
+
+// Export to global scope
+window.ThumbnailBatch = ThumbnailBatch;
@@ -0,0 +1,287 @@
+"""
+HTTP Range Responses
+Single- and multi-range (206) responses over any byte source that can read
+a window, so only the requested bytes are read from disk or the database
+"""
+import logging
+import os
+import secrets
+
+from flask import Response, request
+from werkzeug.http import http_date, is_resource_modified, parse_date
+from werkzeug.wsgi import wrap_file
+
+logger = logging.getLogger(__name__)
+
+# More ranges than this is treated as abuse and answered with the full body
+MAX_RANGES = 16
+# Ranges closer together than this are merged into one part
+COALESCE_GAP = 80
+
+CHUNK_SIZE = 256 * 1024
+
+# Front-end file offload: the worker answers with a header naming the file
+# and the web server sends the bytes itself (including Range handling)
+OFFLOAD_HEADERS = {
+    'x-sendfile': 'X-Sendfile',              # Apache mod_xsendfile, lighttpd, Caddy
+    'x-accel-redirect': 'X-Accel-Redirect',  # nginx internal location
+    'iis': 'X-Sendfile',                     # IIS X-Sendfile modules (native Windows paths)
+}
+OFFLOAD_MODE = os.getenv('MEDIA_OFFLOAD_MODE', 'off').strip().lower()
+OFFLOAD_HEADER = os.getenv('MEDIA_OFFLOAD_HEADER') or OFFLOAD_HEADERS.get(OFFLOAD_MODE)
+# Only files under this directory are offloaded; X-Accel-Redirect maps it to OFFLOAD_PREFIX
+OFFLOAD_ROOT = os.path.abspath(os.getenv('MEDIA_OFFLOAD_ROOT', '.'))
+OFFLOAD_PREFIX = os.getenv('MEDIA_OFFLOAD_PREFIX', '/protected-media/')
+
+
+def parse_byte_ranges(header, size):
+    """Byte windows requested by a Range header
+
+    Returns:
+        list of (start, end) with end exclusive, sorted and coalesced;
+        [] if no range is satisfiable; None if the header is absent,
+        malformed or not worth honouring (serve the full body)
+    """
+    if not header or size <= 0:
+        return None
+    units, _, spec = header.partition('=')
+    if units.strip().lower() != 'bytes' or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        first, dash, last = part.strip().partition('-')
+        if not dash:
+            return None
+        try:
+            if not first:
+                # Suffix range: the last N bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                ranges.append((max(size - length, 0), size))
+                continue
+            start = int(first)
+            end = int(last) + 1 if last else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and end <= start):
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end or size, size)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + COALESCE_GAP:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def quote_etag(etag):
+    """ETag header value: strong tags are quoted, weak (W/) ones left alone"""
+    return etag if etag.startswith(('"', 'W/')) else f'"{etag}"'
+
+
+def not_modified_response(etag=None, last_modified=None, headers=None):
+    """304 Not Modified for a conditional GET/HEAD whose validators match, or None
+
+    Call it as soon as the validators are known and before any payload is
+    loaded. If-None-Match takes precedence over If-Modified-Since.
+    """
+    if request.method not in ('GET', 'HEAD') or not (etag or last_modified):
+        return None
+    if not (request.headers.get('If-None-Match') or request.headers.get('If-Modified-Since')):
+        return None
+    unquoted = etag.strip('"') if etag and not etag.startswith('W/') else None
+    if is_resource_modified(request.environ, etag=unquoted, last_modified=last_modified):
+        return None
+
+    # A 304 repeats the caching headers of the 200 it stands for, no body headers
+    response_headers = {
+        key: value for key, value in (headers or {}).items()
+        if key in ('Cache-Control', 'Expires', 'Vary', 'Content-Location')
+    }
+    if etag:
+        response_headers['ETag'] = quote_etag(etag)
+    if last_modified:
+        response_headers['Last-Modified'] = http_date(last_modified)
+    response = Response(status=304, headers=response_headers)
+    response.automatically_set_content_length = False
+    return response
+
+
+def if_range_matches(etag=None, last_modified=None):
+    """Whether an If-Range precondition (if any) lets the Range header apply
+
+    Only strong validators count: a weak ETag or an unknown validator means
+    the client gets the full, current representation.
+    """
+    header = request.headers.get('If-Range')
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('W/'):
+        return False
+    if header.startswith('"'):
+        return bool(etag) and header == f'"{etag.strip(chr(34))}"'
+    date = parse_date(header)
+    return bool(date and last_modified) and int(date.timestamp()) == int(last_modified.timestamp())
+
+
+def range_response(size, read_range, mimetype, etag=None, last_modified=None, headers=None,
+                   open_file=None):
+    """Response for a byte source, honouring Range and If-Range
+
+    Args:
+        size: Total length in bytes
+        read_range: Callable (start, end) -> iterable of byte chunks for [start, end);
+            it runs after the view returns, outside the request context
+        mimetype: Content type of the representation
+        etag: Entity tag (quoted or not) sent with every response
+        last_modified: Optional datetime for Last-Modified and If-Range dates
+        headers: Extra headers (Content-Disposition, Cache-Control, ...)
+        open_file: Optional callable returning the source as an open binary
+            file; full-body responses then go through wsgi.file_wrapper so
+            servers that support it use sendfile()
+
+    Returns:
+        304 when the client's copy is current, 200 with the full body, 206
+        with one range or multipart/byteranges, or 416 when nothing
+        requested is satisfiable. Bodies are generators,
+        so HEAD requests never read the source.
+    """
+    base_headers = dict(headers or {})
+    base_headers['Accept-Ranges'] = 'bytes'
+    if etag:
+        base_headers['ETag'] = quote_etag(etag)
+    if last_modified:
+        base_headers['Last-Modified'] = http_date(last_modified)
+
+    not_modified = not_modified_response(etag, last_modified, base_headers)
+    if not_modified:
+        return not_modified
+
+    ranges = None
+    if request.method in ('GET', 'HEAD') and if_range_matches(etag, last_modified):
+        ranges = parse_byte_ranges(request.headers.get('Range'), size)
+
+    if ranges is None:
+        base_headers['Content-Length'] = str(size)
+        body = wrap_file(request.environ, open_file()) if open_file else read_range(0, size)
+        return Response(body, status=200, mimetype=mimetype, headers=base_headers)
+
+    if not ranges:
+        base_headers['Content-Range'] = f'bytes */{size}'
+        base_headers.pop('Content-Disposition', None)
+        return Response(b'', status=416, headers=base_headers)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        base_headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+        base_headers['Content-Length'] = str(end - start)
+        body = read_range(start, end)
+        return Response(body, status=206, mimetype=mimetype, headers=base_headers)
+
+    boundary = secrets.token_hex(16)
+    part_headers = [
+        (
+            f'\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n'
+            f'Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n'
+        ).encode('latin-1')
+        for start, end in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode('latin-1')
+    length = sum(len(h) for h in part_headers) + sum(end - start for start, end in ranges) + len(closing)
+
+    def generate():
+        for head, (start, end) in zip(part_headers, ranges):
+            yield head
+            yield from read_range(start, end)
+        yield closing
+
+    base_headers['Content-Length'] = str(length)
+    body = generate()
+    return Response(body, status=206, mimetype=f'multipart/byteranges; boundary={boundary}', headers=base_headers)
+
+
+def file_reader(path, chunk_size=CHUNK_SIZE):
+    """read_range callable for a file on disk (seeks, reads only the window)"""
+    def read_range(start, end):
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    return read_range
+
+
+def bytes_reader(data, chunk_size=CHUNK_SIZE):
+    """read_range callable for an in-memory payload"""
+    view = memoryview(data)
+
+    def read_range(start, end):
+        for offset in range(start, end, chunk_size):
+            yield bytes(view[offset:min(offset + chunk_size, end)])
+    return read_range
+
+
+def file_range_response(path, mimetype, etag=None, headers=None, last_modified=None):
+    """range_response() for a file, with Last-Modified from its mtime unless given
+
+    The whole file goes out through wsgi.file_wrapper (sendfile() where the
+    server supports it); ranges are read with seeks.
+    """
+    from datetime import datetime, timezone
+
+    stat = os.stat(path)
+    if last_modified is None:
+        last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+    return range_response(stat.st_size, file_reader(path), mimetype, etag=etag,
+                          last_modified=last_modified, headers=headers,
+                          open_file=lambda: open(path, 'rb'))
+
+
+def offload_response(path, mimetype, etag=None, headers=None, last_modified=None):
+    """Hand a file to the front-end server via MEDIA_OFFLOAD_MODE, or None
+
+    Returns None when offload is off or the file lies outside
+    MEDIA_OFFLOAD_ROOT, so the caller serves it from Python instead.
+    """
+    if not OFFLOAD_HEADER:
+        return None
+    path = os.path.abspath(path)
+    if os.path.commonpath([path, OFFLOAD_ROOT]) != OFFLOAD_ROOT:
+        logger.debug(f"[OFFLOAD] {path} is outside {OFFLOAD_ROOT}; serving from Python")
+        return None
+
+    if OFFLOAD_HEADER == 'X-Accel-Redirect':
+        from urllib.parse import quote
+
+        relative = os.path.relpath(path, OFFLOAD_ROOT).replace(os.sep, '/')
+        target = OFFLOAD_PREFIX.rstrip('/') + '/' + quote(relative)
+    elif OFFLOAD_MODE == 'iis':
+        target = path.replace('/', '\\')
+    else:
+        target = path
+
+    response_headers = dict(headers or {})
+    response_headers[OFFLOAD_HEADER] = target
+    if etag:
+        response_headers['ETag'] = quote_etag(etag)
+    if last_modified:
+        response_headers['Last-Modified'] = http_date(last_modified)
+    response = Response(status=200, mimetype=mimetype, headers=response_headers)
+    # The front end computes the length of the file it substitutes
+    response.automatically_set_content_length = False
+    response.headers.pop('Content-Length', None)
+    return response
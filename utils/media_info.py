@@ -0,0 +1,130 @@
+"""
+Media Info
+Width/height/duration from file headers and container metadata, without decoding pixels
+"""
+import logging
+import struct
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# MP4/MOV boxes that contain the boxes we need
+MP4_CONTAINER_BOXES = {b'moov', b'trak', b'mdia'}
+MP4_MAX_BOXES = 4096
+
+
+def get_image_info(source):
+    """(width, height) from the image header; PIL does not decode pixels for .size"""
+    try:
+        with Image.open(source) as img:
+            return img.size
+    except Exception as e:
+        logger.debug(f"[MEDIA INFO] Could not read image header: {e}")
+        return None, None
+
+
+def _iter_boxes(f, start, end):
+    """Yield (type, payload_offset, payload_size) for ISO-BMFF boxes in [start, end)"""
+    offset = start
+    count = 0
+    while offset + 8 <= end and count < MP4_MAX_BOXES:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, size - header_size
+        offset += size
+        count += 1
+
+
+def get_mp4_info(path):
+    """(width, height, duration) from the moov/mvhd/tkhd boxes of an MP4/MOV file
+
+    Only box headers are read; the media data (mdat) is skipped with seeks,
+    so this is cheap even for very large files.
+    """
+    width = height = duration = None
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, 2)
+            file_end = f.tell()
+            stack = [(0, file_end)]
+            while stack:
+                start, end = stack.pop()
+                for box_type, payload, size in _iter_boxes(f, start, end):
+                    if box_type in MP4_CONTAINER_BOXES:
+                        stack.append((payload, payload + size))
+                    elif box_type == b'mvhd':
+                        f.seek(payload)
+                        version = f.read(1)[0]
+                        if version == 1:
+                            f.seek(payload + 20)
+                            timescale, length = struct.unpack('>IQ', f.read(12))
+                        else:
+                            f.seek(payload + 12)
+                            timescale, length = struct.unpack('>II', f.read(8))
+                        if timescale:
+                            duration = length / timescale
+                    elif box_type == b'tkhd':
+                        # Track width/height are the last 8 bytes, 16.16 fixed point
+                        f.seek(payload + size - 8)
+                        track_width, track_height = struct.unpack('>II', f.read(8))
+                        if track_width and track_height and not width:
+                            width, height = track_width >> 16, track_height >> 16
+    except Exception as e:
+        logger.debug(f"[MEDIA INFO] Could not parse MP4 boxes of {path}: {e}")
+    return width, height, duration
+
+
+def get_video_info_cv2(path):
+    """(width, height, duration) via OpenCV container properties, if available"""
+    try:
+        import cv2
+    except ImportError:
+        return None, None, None
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None, None, None
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or None
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or None
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        duration = frames / fps if fps and frames and frames > 0 else None
+        return width, height, duration
+    finally:
+        cap.release()
+
+
+def probe_media(path, content_type):
+    """Width, height and duration for an ingested file
+
+    Returns:
+        dict with 'width', 'height', 'duration' (None where unknown)
+    """
+    info = {'width': None, 'height': None, 'duration': None}
+    if not content_type:
+        return info
+
+    if content_type.startswith('image/'):
+        info['width'], info['height'] = get_image_info(path)
+    elif content_type.startswith('video/'):
+        width = height = duration = None
+        if content_type in ('video/mp4', 'video/quicktime', 'video/x-m4v', 'video/3gpp'):
+            width, height, duration = get_mp4_info(path)
+        if not width or duration is None:
+            cv_width, cv_height, cv_duration = get_video_info_cv2(path)
+            width, height = width or cv_width, height or cv_height
+            duration = duration if duration is not None else cv_duration
+        info.update(width=width, height=height, duration=round(duration, 3) if duration else duration)
+    return info
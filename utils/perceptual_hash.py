@@ -0,0 +1,213 @@
+"""
+Perceptual Hashing
+aHash/dHash/pHash fingerprints and a BK-tree index for near-duplicate lookup
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    logger.warning("NumPy not available - perceptual hashing disabled")
+
+HASH_SIZE = 8  # 8x8 = 64-bit hashes, stored as 16 hex chars
+PHASH_SIZE = 32  # pHash takes the DCT of a 32x32 image
+
+# Default pHash Hamming distance for "same picture"
+NEAR_DUPLICATE_DISTANCE = int(os.getenv('NEAR_DUPLICATE_DISTANCE', '8'))
+
+
+def _bits_to_hex(bits):
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bit)
+    return f"{value:016x}"
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis, so pHash needs only NumPy"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0, :] = np.sqrt(1.0 / n)
+    return matrix
+
+
+_DCT = _dct_matrix(PHASH_SIZE) if NUMPY_AVAILABLE else None
+
+
+def _grayscale(img, size):
+    return np.asarray(img.resize(size, Image.Resampling.LANCZOS), dtype=np.float64)
+
+
+def average_hash(img):
+    """aHash: pixels of an 8x8 grayscale thumbnail above their mean"""
+    pixels = _grayscale(img, (HASH_SIZE, HASH_SIZE))
+    return _bits_to_hex(pixels > pixels.mean())
+
+
+def difference_hash(img):
+    """dHash: horizontal gradient signs of a 9x8 grayscale thumbnail"""
+    pixels = _grayscale(img, (HASH_SIZE + 1, HASH_SIZE))
+    return _bits_to_hex(pixels[:, 1:] > pixels[:, :-1])
+
+
+def perceptual_hash(img):
+    """pHash: low-frequency DCT coefficients of a 32x32 grayscale image above their median"""
+    pixels = _grayscale(img, (PHASH_SIZE, PHASH_SIZE))
+    dct = _DCT @ pixels @ _DCT.T
+    low = dct[:HASH_SIZE, :HASH_SIZE]
+    # The DC term only encodes overall brightness; leave it out of the median
+    median = np.median(low.flatten()[1:])
+    return _bits_to_hex(low > median)
+
+
+def compute_hashes(source):
+    """Compute all perceptual hashes for an image
+
+    Args:
+        source: File path or readable binary file object
+
+    Returns:
+        dict with 'ahash', 'dhash', 'phash' hex strings, or None if the image
+        can't be decoded or NumPy is missing
+    """
+    if not NUMPY_AVAILABLE:
+        return None
+    try:
+        with Image.open(source) as img:
+            # Let JPEG decode at reduced scale; hashes only need a tiny image
+            img.draft('L', (PHASH_SIZE * 2, PHASH_SIZE * 2))
+            gray = img.convert('L')
+        return {
+            'ahash': average_hash(gray),
+            'dhash': difference_hash(gray),
+            'phash': perceptual_hash(gray)
+        }
+    except Exception as e:
+        logger.debug(f"[PHASH] Could not hash {source}: {e}")
+        return None
+
+
+def hamming_distance(hash_a, hash_b):
+    """Number of differing bits between two hex hashes"""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes with Hamming distance
+
+    search() only descends into children whose edge distance is within
+    max_distance of the query's distance to the node (triangle inequality),
+    so lookups touch a small fraction of the entries.
+    """
+
+    def __init__(self):
+        self._root = None  # [hash_int, [items], {distance: child}]
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def add(self, hash_hex, item):
+        value = int(hash_hex, 16)
+        with self._lock:
+            self.size += 1
+            if self._root is None:
+                self._root = [value, [item], {}]
+                return
+            node = self._root
+            while True:
+                distance = bin(value ^ node[0]).count('1')
+                if distance == 0:
+                    node[1].append(item)
+                    return
+                child = node[2].get(distance)
+                if child is None:
+                    node[2][distance] = [value, [item], {}]
+                    return
+                node = child
+
+    def search(self, hash_hex, max_distance):
+        """All (distance, item) pairs within max_distance, closest first"""
+        value = int(hash_hex, 16)
+        results = []
+        with self._lock:
+            stack = [self._root] if self._root else []
+            while stack:
+                node = stack.pop()
+                distance = bin(value ^ node[0]).count('1')
+                if distance <= max_distance:
+                    results.extend((distance, item) for item in node[1])
+                low, high = distance - max_distance, distance + max_distance
+                stack.extend(child for edge, child in node[2].items() if low <= edge <= high)
+        results.sort(key=lambda pair: pair[0])
+        return results
+
+
+class PerceptualIndex:
+    """Per-user BK-trees of asset pHashes, built lazily from the assets table
+
+    Trees for the most recently used users are kept in memory and new
+    assets are added as they are ingested. Deleted assets may linger in a
+    tree, so callers re-check results against the database.
+    """
+
+    def __init__(self, max_users=50):
+        self.max_users = max_users
+        self._trees = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tree_for(self, user_id):
+        with self._lock:
+            if user_id in self._trees:
+                self._trees.move_to_end(user_id)
+                return self._trees[user_id]
+
+        from models import Asset
+
+        tree = BKTree()
+        query = Asset.query.with_entities(Asset.id, Asset.phash).filter(
+            Asset.is_deleted == False, Asset.phash.isnot(None)  # noqa: E712
+        )
+        query = query.filter(Asset.user_id.is_(None)) if user_id is None else query.filter(Asset.user_id == user_id)
+        for asset_id, phash in query:
+            tree.add(phash, asset_id)
+
+        with self._lock:
+            self._trees[user_id] = tree
+            while len(self._trees) > self.max_users:
+                self._trees.popitem(last=False)
+        return tree
+
+    def add(self, user_id, asset_id, phash):
+        """Register a newly ingested asset if its user's tree is loaded"""
+        with self._lock:
+            tree = self._trees.get(user_id)
+        if tree is not None and phash:
+            tree.add(phash, asset_id)
+
+    def find(self, user_id, phash, max_distance=NEAR_DUPLICATE_DISTANCE):
+        """[(distance, asset_id)] for the user's assets near a pHash"""
+        if not phash:
+            return []
+        return self._tree_for(user_id).search(phash, max_distance)
+
+    def invalidate(self, user_id):
+        """Drop a user's cached tree so it is rebuilt on next use"""
+        with self._lock:
+            self._trees.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._trees.clear()
+
+
+# Global index instance
+perceptual_index = PerceptualIndex()
@@ -0,0 +1,441 @@
+"""
+Thumbnail Cache
+Size-bounded on-disk LRU cache for generated thumbnails, with sharded
+directories, an append-only access journal and an in-memory index
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Each process appends to its own journal.<pid>.log; journal.log is the
+# shared journal written by versions before per-process journals
+JOURNAL_NAME = 'journal.log'
+JOURNAL_PREFIX = 'journal.'
+JOURNAL_SUFFIX = '.log'
+# Rewrite a journal once it holds this many lines per live entry
+JOURNAL_COMPACT_RATIO = 4
+# Hit records are buffered; adds and deletes are flushed immediately
+JOURNAL_FLUSH_EVERY = 64
+# Keys ending in one of these name their own file; all others are stored as .jpg
+KEY_SUFFIXES = ('.webp', '.avif')
+
+
+class ThumbnailCache:
+    """LRU thumbnail files under root/ab/cd/<key>.jpg within a byte budget
+
+    Keys ending in .webp or .avif are stored under their own name instead.
+
+    The index (key -> size, in LRU order) lives in memory, so lookups, size
+    and hit-rate stats never walk the directory. Every add, hit and delete is
+    appended, with a timestamp, to a journal owned by the current process
+    (journal.<pid>.log), so no file is ever rewritten while another process
+    appends to it. On startup all journals are merged by timestamp to
+    restore the LRU order (a directory scan is only needed when there is no
+    journal, e.g. the first run after upgrading from the flat cache layout).
+    Before evicting, and on a miss, the other processes' journals are
+    tailed, so max_bytes bounds the directory shared by all of them.
+    """
+
+    def __init__(self, root, max_bytes=512 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._stamps = {}  # key -> time of its latest record (tombstones included)
+        self._offsets = {}  # other journal path -> (inode, bytes applied)
+        self._journal = None
+        self._journal_pid = None
+        self._journal_lines = 0
+        self._unflushed = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache from THUMBNAIL_CACHE_* environment variables"""
+        return cls(
+            root=os.getenv('THUMBNAIL_CACHE_DIR', os.path.join('downloads', '.thumbnails')),
+            max_bytes=int(float(os.getenv('THUMBNAIL_CACHE_MAX_MB', '512')) * 1024 * 1024)
+        )
+
+    # ------------------------------------------------------------------
+    # Keys and paths
+    # ------------------------------------------------------------------
+    @staticmethod
+    def make_key(image_path, size):
+        """Cache key for a source path and thumbnail size"""
+        return f"{hashlib.md5(image_path.encode()).hexdigest()}_{size}"
+
+    def path_for(self, key):
+        """Sharded path for a key: root/ab/cd/<key>.jpg (or root/ab/cd/<key> for .webp/.avif keys)"""
+        filename = key if key.endswith(KEY_SUFFIXES) else f"{key}.jpg"
+        return os.path.join(self.root, key[:2], key[2:4], filename)
+
+    # ------------------------------------------------------------------
+    # Lookups and writes
+    # ------------------------------------------------------------------
+    def get(self, key):
+        """Path of a cached thumbnail (marking it most recently used), or None"""
+        with self._lock:
+            self._ensure_loaded()
+            if key not in self._index:
+                # Possibly generated by another process
+                self._sync()
+            if key in self._index:
+                path = self.path_for(key)
+                if os.path.exists(path):
+                    self._index.move_to_end(key)
+                    self.hits += 1
+                    self._log('H', key)
+                    return path
+                # Removed behind our back (another process or by hand)
+                self._forget(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """Store thumbnail bytes atomically, evicting LRU entries over budget; returns the path"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.incoming_', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._ensure_loaded()
+            self._total_bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._total_bytes += len(data)
+            self._log('A', key, len(data))
+            self._sync()
+            self._evict(keep=key)
+        return path
+
+    def discard(self, key):
+        """Remove one entry; returns True if it was cached"""
+        with self._lock:
+            self._ensure_loaded()
+            if key not in self._index:
+                return False
+            self._remove(key)
+            return True
+
+    def retain(self, keep):
+        """Remove every entry whose key fails keep(key); returns the number removed
+
+        Runs over the in-memory index, not the directory.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            doomed = [key for key in self._index if not keep(key)]
+            for key in doomed:
+                self._remove(key)
+            return len(doomed)
+
+    def clear(self):
+        """Delete every cached thumbnail and reset the journal; returns the number removed"""
+        with self._lock:
+            self._close_journal()
+            removed = len(self._index)
+            if os.path.isdir(self.root):
+                shutil.rmtree(self.root, ignore_errors=True)
+            self._index.clear()
+            self._stamps.clear()
+            self._offsets.clear()
+            self._total_bytes = 0
+            self._journal_lines = 0
+            self._loaded = True
+            return removed
+
+    # ------------------------------------------------------------------
+    # Stats (O(1): maintained incrementally)
+    # ------------------------------------------------------------------
+    @property
+    def total_bytes(self):
+        with self._lock:
+            self._ensure_loaded()
+            return self._total_bytes
+
+    def get_stats(self):
+        with self._lock:
+            self._ensure_loaded()
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._index),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions
+            }
+
+    # ------------------------------------------------------------------
+    # Internals (callers hold self._lock)
+    # ------------------------------------------------------------------
+    def _evict(self, keep=None):
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key = next(iter(self._index))
+            if key == keep:
+                break
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"[THUMB CACHE] Failed to remove {key}: {e}")
+        self._forget(key)
+
+    def _forget(self, key):
+        self._total_bytes -= self._index.pop(key, 0)
+        self._log('D', key)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        os.makedirs(self.root, exist_ok=True)
+        journals = self._journal_paths()
+        if journals:
+            self._replay(journals)
+        else:
+            self._scan()
+        self._compact()
+        self._evict()
+
+    def _own_journal_path(self):
+        return os.path.join(self.root, f"{JOURNAL_PREFIX}{os.getpid()}{JOURNAL_SUFFIX}")
+
+    def _journal_paths(self):
+        """Every journal in the root (all processes, plus a legacy journal.log)"""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return [
+            os.path.join(self.root, name) for name in names
+            if name.startswith(JOURNAL_PREFIX) and name.endswith(JOURNAL_SUFFIX)
+        ]
+
+    @staticmethod
+    def _parse(line):
+        """(op, key, size, stamp) for a journal line, or None
+
+        Lines are "<op> <key> <size|-> <stamp>"; lines from the legacy
+        journal have no stamp (replayed first, in file order).
+        """
+        parts = line.split()
+        if len(parts) < 2 or parts[0] not in ('A', 'H', 'D'):
+            return None
+        op, key = parts[0], parts[1]
+        size = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else None
+        if op == 'A' and size is None:
+            return None
+        try:
+            stamp = float(parts[3]) if len(parts) > 3 else 0.0
+        except ValueError:
+            return None
+        return op, key, size, stamp
+
+    def _apply(self, op, key, size, stamp):
+        # Records older than what is already known for the key change nothing
+        if stamp:
+            if stamp < self._stamps.get(key, 0):
+                return
+            self._stamps[key] = stamp
+        if op == 'A':
+            self._total_bytes -= self._index.pop(key, 0)
+            self._index[key] = size
+            self._total_bytes += size
+        elif op == 'H' and key in self._index:
+            self._index.move_to_end(key)
+        elif op == 'D':
+            self._total_bytes -= self._index.pop(key, 0)
+
+    def _read_journal(self, path, offset=0):
+        """(inode, records, end offset) for the complete lines of a journal from offset"""
+        try:
+            with open(path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return None, [], offset
+        # A partially written last line is picked up on the next read
+        complete = data[:data.rfind(b'\n') + 1]
+        records = []
+        for line in complete.decode('ascii', errors='ignore').splitlines():
+            record = self._parse(line)
+            if record:
+                records.append(record)
+        return inode, records, offset + len(complete)
+
+    def _replay(self, journal_paths):
+        """Rebuild the LRU index by merging every journal in timestamp order"""
+        own = self._own_journal_path()
+        records = []
+        for path in journal_paths:
+            inode, journal_records, end = self._read_journal(path)
+            records.extend(journal_records)
+            if path != own:
+                self._offsets[path] = (inode, end)
+        # Stable sort: legacy (unstamped) lines keep their file order, first
+        records.sort(key=lambda record: record[3])
+        for record in records:
+            self._apply(*record)
+
+    def _sync(self):
+        """Apply records other processes appended since the last sync"""
+        own = self._own_journal_path()
+        for path in self._journal_paths():
+            if path == own:
+                continue
+            inode, offset = self._offsets.get(path, (None, 0))
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.st_ino != inode or stat.st_size < offset:
+                # New journal, or compacted by its owner: read it again from the start
+                offset = 0
+            elif stat.st_size == offset:
+                continue
+            inode, records, end = self._read_journal(path, offset)
+            for record in records:
+                self._apply(*record)
+            self._offsets[path] = (inode, end)
+
+    def _scan(self):
+        """One-time index build from disk, oldest access first
+
+        Files from the old flat layout (root/<md5>_<size>.jpg) are moved into
+        their shard directories on the way.
+        """
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+                if filename.endswith('.jpg'):
+                    key = filename[:-4]
+                elif filename.endswith(KEY_SUFFIXES):
+                    key = filename
+                else:
+                    continue
+                path = os.path.join(dirpath, filename)
+                target = self.path_for(key)
+                try:
+                    if path != target:
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        os.replace(path, target)
+                    stat = os.stat(target)
+                except OSError:
+                    continue
+                entries.append((max(stat.st_atime, stat.st_mtime), key, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        if entries:
+            logger.info(f"[THUMB CACHE] Indexed {len(entries)} cached thumbnails ({self._total_bytes} bytes)")
+
+    def _compact(self):
+        """Rewrite this process's journal as one add per live entry, in LRU order
+
+        Only the process's own journal is replaced. Journals of processes
+        that have exited are folded into the snapshot and removed.
+        """
+        self._close_journal()
+        self._sync()
+        journal_path = self._own_journal_path()
+        tmp_path = journal_path + '.tmp'
+        now = time.time()
+        try:
+            with open(tmp_path, 'w', encoding='ascii') as f:
+                for key, size in self._index.items():
+                    f.write(f"A {key} {size} {self._stamps.get(key) or now:.6f}\n")
+            os.replace(tmp_path, journal_path)
+        except OSError as e:
+            # e.g. another process is reading the journal on Windows; retry at the next compaction
+            logger.debug(f"[THUMB CACHE] Journal compaction skipped: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        self._journal_lines = len(self._index)
+        # Tombstones only need to outlive records still sitting in other journals
+        self._stamps = {key: stamp for key, stamp in self._stamps.items() if key in self._index}
+
+        for path in list(self._offsets):
+            if self._journal_stale(path):
+                try:
+                    os.remove(path)
+                    del self._offsets[path]
+                except OSError:
+                    pass  # Still open in a live process (Windows)
+
+    @staticmethod
+    def _journal_stale(path):
+        """True if the journal's process has exited (always tried on Windows, where removal fails while open)"""
+        pid = os.path.basename(path)[len(JOURNAL_PREFIX):-len(JOURNAL_SUFFIX)]
+        if not pid.isdigit() or os.name == 'nt':
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass  # Exists but owned by another user
+        return False
+
+    def _log(self, op, key, size=None):
+        if self._journal is not None and self._journal_pid != os.getpid():
+            # Forked: the parent's journal handle is not ours to write
+            self._journal = None
+            self._offsets.clear()
+        if self._journal is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._journal = open(self._own_journal_path(), 'a', encoding='ascii')
+            self._journal_pid = os.getpid()
+        stamp = time.time()
+        self._stamps[key] = stamp
+        self._journal.write(f"{op} {key} {size if size is not None else '-'} {stamp:.6f}\n")
+        self._journal_lines += 1
+        self._unflushed += 1
+        if op != 'H' or self._unflushed >= JOURNAL_FLUSH_EVERY:
+            self._journal.flush()
+            self._unflushed = 0
+        if self._journal_lines > JOURNAL_COMPACT_RATIO * max(len(self._index), 256):
+            self._compact()
+
+    def _close_journal(self):
+        if self._journal is not None:
+            try:
+                self._journal.close()
+            except OSError:
+                pass
+            self._journal = None
+            self._unflushed = 0
+
+
+# Global cache instance
+thumbnail_cache = ThumbnailCache.from_env()
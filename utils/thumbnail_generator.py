@@ -8,6 +8,8 @@ from PIL import Image
 from io import BytesIO
 import logging
 
+from utils.thumbnail_cache import thumbnail_cache
+
 logger = logging.getLogger(__name__)
 
 # Thumbnail configurations
@@ -20,8 +22,192 @@ THUMBNAIL_SIZES = {
 THUMBNAIL_QUALITY = 85  # JPEG quality (1-100)
 THUMBNAIL_FORMAT = 'JPEG'  # or 'WEBP' for better compression
 
-# Cache directory for thumbnails
-THUMBNAIL_CACHE_DIR = os.path.join('downloads', '.thumbnails')
+# Reduced JPEG decodes stay at least this many times the thumbnail size
+# (same headroom Pillow's reducing_gap uses) so downsampling quality is kept
+DRAFT_GAP = 2.0
+
+# Cache directory for thumbnails (size-bounded LRU, see utils.thumbnail_cache)
+THUMBNAIL_CACHE_DIR = thumbnail_cache.root
+
+# Encodings for the ingest-time pyramid: name -> (PIL format, MIME type, save options)
+PYRAMID_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': THUMBNAIL_QUALITY, 'optimize': True}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'avif': ('AVIF', 'image/avif', {'quality': 60}),
+}
+
+# Requested pyramid encodings (JPEG is always produced as the fallback)
+PYRAMID_FORMAT_NAMES = [
+    name.strip().lower()
+    for name in os.getenv('THUMBNAIL_FORMATS', 'jpeg,webp,avif').split(',')
+    if name.strip()
+]
+
+
+# Formats offered to browsers whose Accept header lists them, best first.
+# Thumbnails are small enough for AVIF; full-size images (watermarked
+# renditions) default to WebP because AVIF encodes take seconds at 12 MP.
+NEGOTIATED_THUMBNAIL_FORMATS = [
+    name.strip().lower()
+    for name in os.getenv('THUMBNAIL_NEGOTIATE_FORMATS', 'avif,webp').split(',')
+    if name.strip()
+]
+NEGOTIATED_IMAGE_FORMATS = [
+    name.strip().lower()
+    for name in os.getenv('IMAGE_NEGOTIATE_FORMATS', 'webp').split(',')
+    if name.strip()
+]
+
+
+def can_encode(name):
+    """Whether this Pillow build can write a PYRAMID_FORMATS encoding"""
+    Image.init()
+    return name in PYRAMID_FORMATS and PYRAMID_FORMATS[name][0] in Image.SAVE
+
+
+def negotiate_format(accept, candidates):
+    """First candidate encoding the client explicitly accepts, else 'jpeg'
+
+    Wildcards (image/*, */*) do not count: every browser sends them, and
+    JPEG is the safe answer for those. Browsers that decode WebP or AVIF
+    name them explicitly.
+
+    Args:
+        accept: werkzeug MIMEAccept (request.accept_mimetypes)
+        candidates: Encoding names in preference order
+    """
+    listed = {value.lower() for value, quality in accept if quality > 0}
+    for name in candidates:
+        if can_encode(name) and PYRAMID_FORMATS[name][1] in listed:
+            return name
+    return 'jpeg'
+
+
+def encode_image(img, name, **options):
+    """Encode a PIL image with a PYRAMID_FORMATS encoding (options override the defaults)"""
+    pil_format, _, defaults = PYRAMID_FORMATS[name]
+    if pil_format == 'JPEG':
+        img = _flatten_to_rgb(img)
+    output = BytesIO()
+    img.save(output, pil_format, **{**defaults, **options})
+    return output.getvalue()
+
+
+def transcode_image(data, name):
+    """Re-encode encoded image bytes as another PYRAMID_FORMATS encoding, or None"""
+    try:
+        with Image.open(BytesIO(data)) as img:
+            img.load()
+            return encode_image(_flatten_to_rgb(img), name)
+    except Exception as e:
+        logger.warning(f"Failed to transcode image to {name}: {e}")
+        return None
+
+
+def get_pyramid_formats():
+    """Pyramid encodings this Pillow build can actually write"""
+    formats = ['jpeg']
+    for name in PYRAMID_FORMAT_NAMES:
+        if name not in formats and can_encode(name):
+            formats.append(name)
+    return formats
+
+
+def _flatten_to_rgb(img):
+    """RGB copy of an image, compositing transparency onto white"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _draft_request(size, target):
+    """Smallest decode size that still leaves DRAFT_GAP x headroom over the fitted thumbnail"""
+    ratio = min(target[0] / size[0], target[1] / size[1])
+    if ratio * DRAFT_GAP >= 1:
+        return None
+    return max(1, int(size[0] * ratio * DRAFT_GAP)), max(1, int(size[1] * ratio * DRAFT_GAP))
+
+
+def open_for_thumbnail(source, target, reduced=True):
+    """Decode an image no larger than a thumbnail of `target` needs, as RGB
+
+    For JPEGs, Image.draft() makes libjpeg scale by 1/2, 1/4 or 1/8 in the
+    DCT, so a 24 MP photo is never materialised at full resolution: decode
+    time and memory drop roughly with the square of the scale. The decode
+    keeps DRAFT_GAP x the final size so the LANCZOS pass still has real
+    pixels to filter. Other formats decode normally.
+
+    Args:
+        source: File path, readable binary file object, or raw bytes
+        target: (width, height) box the thumbnail must fit
+        reduced: False forces a full-resolution decode (for benchmarking)
+
+    Returns:
+        Loaded RGB PIL image, independent of the source file
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    with Image.open(source) as img:
+        if reduced and img.format == 'JPEG':
+            request = _draft_request(img.size, target)
+            if request:
+                img.draft(None, request)
+        img.load()
+        rgb = _flatten_to_rgb(img)
+        return img.copy() if rgb is img else rgb
+
+
+def generate_pyramid(source, formats=None):
+    """Decode an image once and encode every thumbnail size and format from it
+
+    The source is decoded at reduced resolution for the largest size (see
+    open_for_thumbnail), then sizes are produced largest first, each one
+    resampled from the previous level.
+
+    Args:
+        source: File path, readable binary file object, or raw bytes
+        formats: Encodings to emit (default: get_pyramid_formats())
+
+    Returns:
+        list of dicts with 'size', 'format', 'mime_type', 'width', 'height',
+        'data'; empty if the image could not be decoded
+    """
+    formats = formats or get_pyramid_formats()
+    levels = sorted(THUMBNAIL_SIZES.items(), key=lambda item: -item[1][0] * item[1][1])
+
+    variants = []
+    try:
+        level = open_for_thumbnail(source, levels[0][1])
+
+        for size, target in levels:
+            level.thumbnail(target, Image.Resampling.LANCZOS)
+            for name in formats:
+                pil_format, mime_type, options = PYRAMID_FORMATS[name]
+                output = BytesIO()
+                try:
+                    level.save(output, pil_format, **options)
+                except Exception as e:
+                    logger.warning(f"Failed to encode {size} thumbnail as {name}: {e}")
+                    continue
+                variants.append({
+                    'size': size,
+                    'format': name,
+                    'mime_type': mime_type,
+                    'width': level.width,
+                    'height': level.height,
+                    'data': output.getvalue()
+                })
+    except Exception as e:
+        logger.error(f"Failed to generate thumbnail pyramid: {e}")
+        return []
+
+    return variants
 
 
 def ensure_thumbnail_dir():
@@ -38,15 +224,9 @@ def get_thumbnail_path(image_path, size='medium'):
         size: Thumbnail size ('small', 'medium', 'large')
 
     Returns:
-        Path to thumbnail file
+        Path to thumbnail file (sharded: <cache>/ab/cd/<md5>_<size>.jpg)
     """
-    ensure_thumbnail_dir()
-
-    # Create hash of original path for unique filename
-    path_hash = hashlib.md5(image_path.encode()).hexdigest()
-    filename = f"{path_hash}_{size}.jpg"
-
-    return os.path.join(THUMBNAIL_CACHE_DIR, filename)
+    return thumbnail_cache.path_for(thumbnail_cache.make_key(image_path, size))
 
 
 def generate_thumbnail(image_path, size='medium', force_regenerate=False):
@@ -62,43 +242,36 @@ def generate_thumbnail(image_path, size='medium', force_regenerate=False):
         Path to thumbnail file, or None if generation failed
     """
     try:
-        # Check if thumbnail already exists
-        thumbnail_path = get_thumbnail_path(image_path, size)
+        # Get target size
+        if size not in THUMBNAIL_SIZES:
+            size = 'medium'
+        target_size = THUMBNAIL_SIZES[size]
 
-        if os.path.exists(thumbnail_path) and not force_regenerate:
-            return thumbnail_path
+        # Check if thumbnail already exists (counts as a cache hit)
+        cache_key = thumbnail_cache.make_key(image_path, size)
+        if not force_regenerate:
+            thumbnail_path = thumbnail_cache.get(cache_key)
+            if thumbnail_path:
+                return thumbnail_path
 
         # Check if original image exists
         if not os.path.exists(image_path):
             logger.warning(f"Original image not found: {image_path}")
             return None
 
-        # Get target size
-        if size not in THUMBNAIL_SIZES:
-            size = 'medium'
-        target_size = THUMBNAIL_SIZES[size]
-
-        # Open and process image
-        with Image.open(image_path) as img:
-            # Convert RGBA to RGB if necessary
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # Create white background
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
+        # Decode near the target size (JPEG DCT scaling) and flatten to RGB
+        img = open_for_thumbnail(image_path, target_size)
 
-            # Calculate thumbnail size maintaining aspect ratio
-            img.thumbnail(target_size, Image.Resampling.LANCZOS)
+        # Calculate thumbnail size maintaining aspect ratio
+        img.thumbnail(target_size, Image.Resampling.LANCZOS)
 
-            # Save thumbnail
-            img.save(thumbnail_path, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY, optimize=True)
+        # Save thumbnail into the cache (evicts least recently used over budget)
+        output = BytesIO()
+        img.save(output, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY, optimize=True)
+        thumbnail_path = thumbnail_cache.put(cache_key, output.getvalue())
 
-            logger.info(f"Generated thumbnail: {thumbnail_path} ({img.size})")
-            return thumbnail_path
+        logger.info(f"Generated thumbnail: {thumbnail_path} ({img.size})")
+        return thumbnail_path
 
     except Exception as e:
         logger.error(f"Failed to generate thumbnail for {image_path}: {e}")
@@ -122,27 +295,18 @@ def generate_thumbnail_from_bytes(image_bytes, size='medium'):
             size = 'medium'
         target_size = THUMBNAIL_SIZES[size]
 
-        # Open image from bytes
-        with Image.open(BytesIO(image_bytes)) as img:
-            # Convert RGBA to RGB if necessary
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
+        # Decode near the target size (JPEG DCT scaling) and flatten to RGB
+        img = open_for_thumbnail(image_bytes, target_size)
 
-            # Calculate thumbnail size maintaining aspect ratio
-            img.thumbnail(target_size, Image.Resampling.LANCZOS)
+        # Calculate thumbnail size maintaining aspect ratio
+        img.thumbnail(target_size, Image.Resampling.LANCZOS)
 
-            # Save to bytes
-            output = BytesIO()
-            img.save(output, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY, optimize=True)
-            output.seek(0)
+        # Save to bytes
+        output = BytesIO()
+        img.save(output, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY, optimize=True)
+        output.seek(0)
 
-            return output.read()
+        return output.read()
 
     except Exception as e:
         logger.error(f"Failed to generate thumbnail from bytes: {e}")
@@ -157,35 +321,11 @@ def cleanup_orphaned_thumbnails(asset_paths):
         asset_paths: List of current asset file paths
     """
     try:
-        ensure_thumbnail_dir()
-
         # Create set of valid thumbnail hashes
-        valid_hashes = set()
-        for path in asset_paths:
-            path_hash = hashlib.md5(path.encode()).hexdigest()
-            valid_hashes.add(path_hash)
-
-        # Scan thumbnail directory
-        removed_count = 0
-        for filename in os.listdir(THUMBNAIL_CACHE_DIR):
-            if not filename.endswith('.jpg'):
-                continue
-
-            # Extract hash from filename (format: hash_size.jpg)
-            parts = filename.split('_')
-            if len(parts) < 2:
-                continue
-
-            file_hash = parts[0]
-
-            # Remove if hash not in valid set
-            if file_hash not in valid_hashes:
-                thumbnail_path = os.path.join(THUMBNAIL_CACHE_DIR, filename)
-                try:
-                    os.remove(thumbnail_path)
-                    removed_count += 1
-                except Exception as e:
-                    logger.warning(f"Failed to remove orphaned thumbnail {filename}: {e}")
+        valid_hashes = {hashlib.md5(path.encode()).hexdigest() for path in asset_paths}
+
+        # Filter the in-memory index (keys are <hash>_<size>); no directory walk
+        removed_count = thumbnail_cache.retain(lambda key: key.split('_')[0] in valid_hashes)
 
         if removed_count > 0:
             logger.info(f"Cleaned up {removed_count} orphaned thumbnails")
@@ -199,38 +339,25 @@ def get_cache_size():
     Get total size of thumbnail cache in bytes
 
     Returns:
-        Total cache size in bytes
+        Total cache size in bytes (from the cache index, O(1))
     """
     try:
-        ensure_thumbnail_dir()
-
-        total_size = 0
-        for filename in os.listdir(THUMBNAIL_CACHE_DIR):
-            file_path = os.path.join(THUMBNAIL_CACHE_DIR, filename)
-            if os.path.isfile(file_path):
-                total_size += os.path.getsize(file_path)
-
-        return total_size
+        return thumbnail_cache.total_bytes
 
     except Exception as e:
         logger.error(f"Failed to calculate cache size: {e}")
         return 0
 
 
+def get_cache_stats():
+    """Entries, bytes, budget, hits/misses/hit rate and evictions of the thumbnail cache"""
+    return thumbnail_cache.get_stats()
+
+
 def clear_cache():
     """Clear all thumbnails from cache"""
     try:
-        ensure_thumbnail_dir()
-
-        removed_count = 0
-        for filename in os.listdir(THUMBNAIL_CACHE_DIR):
-            file_path = os.path.join(THUMBNAIL_CACHE_DIR, filename)
-            try:
-                os.remove(file_path)
-                removed_count += 1
-            except Exception as e:
-                logger.warning(f"Failed to remove {filename}: {e}")
-
+        removed_count = thumbnail_cache.clear()
         logger.info(f"Cleared {removed_count} thumbnails from cache")
         return removed_count
 
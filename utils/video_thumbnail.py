@@ -0,0 +1,155 @@
+"""
+Video Thumbnail Engine
+Grabs a representative frame straight from the source file (ffmpeg, else OpenCV)
+in a bounded process pool
+"""
+import atexit
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_PATH = os.getenv('FFMPEG_BINARY') or shutil.which('ffmpeg')
+FFPROBE_PATH = os.getenv('FFPROBE_BINARY') or shutil.which('ffprobe')
+
+# Fraction of the duration to seek to; frame 0 is often black or a title card
+SEEK_FRACTION = float(os.getenv('VIDEO_THUMBNAIL_POSITION', '0.1'))
+WORKERS = int(os.getenv('VIDEO_THUMBNAIL_WORKERS', '2'))
+TIMEOUT = float(os.getenv('VIDEO_THUMBNAIL_TIMEOUT', '30'))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_duration(path):
+    """Duration in seconds from ffprobe, MP4 headers or OpenCV (None if unknown)"""
+    if FFPROBE_PATH:
+        try:
+            out = subprocess.run(
+                [FFPROBE_PATH, '-v', 'error', '-show_entries', 'format=duration',
+                 '-of', 'default=noprint_wrappers=1:nokey=1', path],
+                capture_output=True, timeout=15, check=True
+            ).stdout.strip()
+            return float(out) if out else None
+        except (subprocess.SubprocessError, ValueError, OSError) as e:
+            logger.debug(f"[VIDEO THUMB] ffprobe failed for {path}: {e}")
+
+    from utils.media_info import get_mp4_info, get_video_info_cv2
+    _, _, duration = get_mp4_info(path)
+    if duration is None:
+        _, _, duration = get_video_info_cv2(path)
+    return duration
+
+
+def _frame_ffmpeg(path, seconds, max_size):
+    """JPEG bytes of the frame near `seconds`, scaled by ffmpeg
+
+    -ss before -i makes ffmpeg seek by keyframe index instead of decoding
+    everything before the target.
+    """
+    scale = (f"scale='min({max_size[0]},iw)':'min({max_size[1]},ih)'"
+             ":force_original_aspect_ratio=decrease")
+    result = subprocess.run(
+        [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-ss', f'{seconds:.3f}', '-i', path,
+         '-frames:v', '1', '-vf', scale, '-f', 'image2pipe', '-vcodec', 'mjpeg', '-q:v', '4', '-'],
+        capture_output=True, timeout=TIMEOUT
+    )
+    return result.stdout or None
+
+
+def _frame_cv2(path, seconds):
+    """PIL image of the frame near `seconds` via OpenCV, falling back to frame 0"""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if seconds:
+            cap.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000)
+        ret, frame = cap.read()
+        if not ret and seconds:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = cap.read()
+        if not ret:
+            return None
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    finally:
+        cap.release()
+
+
+def extract_thumbnail(path, max_size=(200, 200), duration=None):
+    """Thumbnail JPEG bytes for a video file (runs in a pool worker)
+
+    Returns:
+        bytes or None
+    """
+    if duration is None:
+        duration = get_duration(path)
+    seconds = duration * SEEK_FRACTION if duration else 0
+
+    if FFMPEG_PATH:
+        try:
+            data = _frame_ffmpeg(path, seconds, max_size)
+            if not data and seconds:
+                data = _frame_ffmpeg(path, 0, max_size)
+            if data:
+                return data
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.debug(f"[VIDEO THUMB] ffmpeg failed for {path}: {e}")
+
+    try:
+        img = _frame_cv2(path, seconds)
+    except ImportError:
+        logger.warning("Neither ffmpeg nor OpenCV available for video thumbnail generation")
+        return None
+    if img is None:
+        return None
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=85, optimize=True)
+    return output.getvalue()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, WORKERS))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def generate_video_thumbnail(path, max_size=(200, 200), duration=None, timeout=TIMEOUT):
+    """Thumbnail JPEG bytes for a video, extracted in the bounded worker pool
+
+    At most VIDEO_THUMBNAIL_WORKERS decodes run at once, whatever the number
+    of ingest threads; a stuck decode is abandoned after `timeout` seconds.
+    """
+    global _pool
+    pool = _get_pool()
+    try:
+        future = pool.submit(extract_thumbnail, path, tuple(max_size), duration)
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        logger.warning(f"[VIDEO THUMB] Timed out after {timeout}s: {path}")
+        return None
+    except BrokenProcessPool as e:
+        # A worker died (e.g. a decoder crash): replace the pool and decode inline once
+        logger.warning(f"[VIDEO THUMB] Worker pool broken ({e}); decoding inline")
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        return extract_thumbnail(path, max_size, duration)
+    except Exception as e:
+        # Raised by the extraction itself; the pool is fine
+        logger.warning(f"[VIDEO THUMB] Failed to extract thumbnail from {path}: {e}")
+        return None
@@ -0,0 +1,288 @@
+"""
+ZIP Streaming
+Writes a ZIP archive straight into a response body as its entries are read,
+without a temp file or whole-file buffers
+"""
+import io
+import logging
+import os
+import queue
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Bytes of archive output buffered before a chunk is handed to the server
+FLUSH_SIZE = 256 * 1024
+
+# Earliest timestamp a ZIP header can hold
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# Upcoming entries read ahead in background threads, and the chunks each may
+# buffer (memory bound: (PREFETCH + 1) x PREFETCH_CHUNKS x chunk size)
+PREFETCH = int(os.getenv('BULK_DOWNLOAD_PREFETCH', '4'))
+PREFETCH_CHUNKS = 16
+
+# Already-compressed payloads: deflating them costs CPU for ~0% gain
+STORED_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/avif', 'image/heic',
+                'image/heif', 'video/', 'audio/', 'application/zip', 'application/gzip',
+                'application/x-7z-compressed', 'application/x-rar-compressed', 'application/pdf')
+# Payloads that reliably deflate well
+DEFLATED_TYPES = ('text/', 'image/svg+xml', 'image/bmp', 'image/tiff', 'application/json',
+                  'application/xml', 'application/javascript')
+
+# Unknown types: deflate only if level 1 shrinks a sample below this ratio
+SAMPLE_SIZE = 64 * 1024
+DEFLATE_RATIO = 0.9
+
+
+def choose_compression(mime_type, sample=b''):
+    """ZIP_STORED or ZIP_DEFLATED for an entry, from its MIME type or a sample
+
+    Known types decide directly; anything else is deflated only if a fast
+    zlib pass over the first SAMPLE_SIZE bytes saves at least 10%.
+    """
+    mime_type = (mime_type or '').lower()
+    if mime_type.startswith(STORED_TYPES):
+        return zipfile.ZIP_STORED
+    if mime_type.startswith(DEFLATED_TYPES):
+        return zipfile.ZIP_DEFLATED
+    sample = sample[:SAMPLE_SIZE]
+    if not sample:
+        return zipfile.ZIP_DEFLATED
+    ratio = len(zlib.compress(sample, 1)) / len(sample)
+    return zipfile.ZIP_DEFLATED if ratio < DEFLATE_RATIO else zipfile.ZIP_STORED
+
+
+class ZipEntry:
+    """One archive member: a name, its size if known, and a chunk source
+
+    Args:
+        name: Path inside the archive
+        open_chunks: Callable returning an iterable of byte chunks; it is
+            called when the entry is reached, so nothing is read up front
+        size: Uncompressed size, or None if unknown (the entry then always
+            gets ZIP64 sizes)
+        modified: datetime for the entry header (default: now)
+        mime_type: Content type, used to pick the compression
+        compress_type: zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED; None
+            picks one with choose_compression()
+    """
+
+    def __init__(self, name, open_chunks, size=None, modified=None, mime_type=None, compress_type=None):
+        self.name = name
+        self.open_chunks = open_chunks
+        self.size = size
+        self.modified = modified
+        self.mime_type = mime_type
+        self.compress_type = compress_type
+
+    def zip_info(self, sample=b''):
+        if self.modified:
+            date_time = self.modified.timetuple()[:6]
+        else:
+            date_time = time.localtime()[:6]
+        info = zipfile.ZipInfo(self.name, date_time=max(date_time, ZIP_EPOCH))
+        info.compress_type = self.compress_type
+        if info.compress_type is None:
+            info.compress_type = choose_compression(self.mime_type, sample)
+        info.external_attr = 0o644 << 16
+        if self.size is not None:
+            # Lets zipfile decide up front whether the entry needs ZIP64 sizes
+            info.file_size = self.size
+        return info
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only, non-seekable file that collects output until drained
+
+    zipfile sees an unseekable file and so writes each entry with a data
+    descriptor (CRC and sizes after the data) instead of seeking back to
+    patch the local header.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._buffered = 0
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._buffered += len(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    @property
+    def buffered(self):
+        return self._buffered
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self._buffered = 0
+        return data
+
+
+_END = object()
+
+
+class _Prefetcher:
+    """Reads one entry's chunks in a pool thread into a bounded queue"""
+
+    def __init__(self, entry, max_chunks=PREFETCH_CHUNKS):
+        self.entry = entry
+        self._queue = queue.Queue(max_chunks)
+        self._cancelled = threading.Event()
+
+    def run(self):
+        source = None
+        try:
+            source = iter(self.entry.open_chunks())
+            for chunk in source:
+                if not self._put(chunk):
+                    return
+            self._put(_END)
+        except Exception as e:
+            self._put(e)
+        finally:
+            close = getattr(source, 'close', None)
+            if close:
+                close()
+
+    def _put(self, item):
+        # Blocks while the consumer is behind; gives up once cancelled
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def chunks(self):
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+def _direct_sources(entries):
+    for entry in entries:
+        yield entry, lambda entry=entry: iter(entry.open_chunks())
+
+
+def _prefetched_sources(entries, prefetch):
+    """(entry, open) pairs whose sources are already being read ahead
+
+    The current entry and the next `prefetch` ones each have a reader in
+    the pool (one worker each); the next reader is submitted once the
+    current entry is written.
+    """
+    pool = ThreadPoolExecutor(max_workers=prefetch + 1, thread_name_prefix='zip-prefetch')
+    pending = []
+    try:
+        upcoming = iter(entries)
+        for entry in upcoming:
+            pending.append(_Prefetcher(entry))
+            pool.submit(pending[-1].run)
+            if len(pending) > prefetch:
+                break
+        while pending:
+            current = pending.pop(0)
+            try:
+                yield current.entry, current.chunks
+            finally:
+                current.cancel()
+            next_entry = next(upcoming, None)
+            if next_entry is not None:
+                pending.append(_Prefetcher(next_entry))
+                pool.submit(pending[-1].run)
+    finally:
+        for prefetcher in pending:
+            prefetcher.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_zip(entries, on_entry=None, flush_size=FLUSH_SIZE, prefetch=PREFETCH):
+    """Yield a ZIP archive of `entries` chunk by chunk
+
+    Output starts with the first entry's local header. Entries larger than
+    4 GiB and archives past 4 GiB or 65535 entries get ZIP64 records. An
+    entry whose source fails before yielding any data is left out; a failure
+    partway through an entry ends the archive early (its bytes are already
+    on the wire). Entries without a compress_type are stored or deflated
+    per choose_compression(), sampling their first chunk.
+
+    Args:
+        entries: Iterable of ZipEntry
+        on_entry: Optional callback(entry, ok) after each entry is written
+            or skipped
+        flush_size: Output is yielded once at least this many bytes are buffered
+        prefetch: Upcoming entries to read ahead in a thread pool while the
+            current one is written (0 reads each entry only when reached)
+
+    Yields:
+        bytes
+    """
+    sink = _StreamSink()
+    sources = _prefetched_sources(entries, prefetch) if prefetch > 0 else _direct_sources(entries)
+    try:
+        with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+            for entry, open_source in sources:
+                try:
+                    chunks = open_source()
+                    first = next(chunks, b'')
+                except Exception as e:
+                    logger.warning(f"[ZIP STREAM] Skipping {entry.name}: {e}")
+                    if on_entry:
+                        on_entry(entry, False)
+                    continue
+
+                with archive.open(entry.zip_info(first), 'w', force_zip64=entry.size is None) as dest:
+                    dest.write(first)
+                    for chunk in chunks:
+                        dest.write(chunk)
+                        if sink.buffered >= flush_size:
+                            yield sink.drain()
+                if on_entry:
+                    on_entry(entry, True)
+                if sink.buffered >= flush_size:
+                    yield sink.drain()
+        # Central directory (and ZIP64 end records) written by close()
+        yield sink.drain()
+    finally:
+        # Stops read-ahead threads if the client goes away mid-archive
+        sources.close()
+
+
+def file_chunks(path, chunk_size=FLUSH_SIZE):
+    """open_chunks callable for a file on disk"""
+    def open_chunks():
+        f = open(path, 'rb')
+
+        def read():
+            with f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+        return read()
+    return open_chunks
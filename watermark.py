@@ -3,103 +3,206 @@ Watermark Overlay Module - Fixed for Alpine Linux compatibility
 Handles watermark generation and application for trial users
 """
 
+import hashlib
+import math
+import os
+import threading
+from functools import lru_cache
 from io import BytesIO
 
 from PIL import Image, ImageDraw, ImageFont
 
+from utils.thumbnail_cache import ThumbnailCache
 
-class WatermarkOverlay:
-    """Class for handling watermark overlays on images"""
+# Bump when rendering changes so cached variants from the old engine are not served
+WATERMARK_ENGINE_VERSION = 2
 
-    def __init__(self, app_name="MediaScraper"):
-        self.app_name = app_name
-        self.watermark_text = f"Subscribe for Full Access - {app_name}"
-        self.font_size = 48
-        self.opacity = 0.3
+# Rendered watermarked JPEGs, LRU within a byte budget (same layout as the thumbnail cache)
+watermark_cache = ThumbnailCache(
+    root=os.getenv('WATERMARK_CACHE_DIR', os.path.join('downloads', '.watermarked')),
+    max_bytes=int(float(os.getenv('WATERMARK_CACHE_MAX_MB', '1024')) * 1024 * 1024)
+)
 
-    def create_text_watermark(self, size):
-        """Create a text-based watermark"""
-        width, height = size
+FONT_PATHS = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "DejaVuSans-Bold.ttf",
+    "arialbd.ttf",  # Windows
+)
+
+# Size buckets by the image's longer side: (max side, font scale). Each
+# bucket gets one tile, rendered once and reused for every image in it.
+SIZE_BUCKETS = ((640, 0.5), (1280, 0.75), (2560, 1.0), (None, 1.5))
 
-        # Create transparent overlay
-        watermark = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(watermark)
 
-        # Try to load a font
+@lru_cache(maxsize=8)
+def _load_font(size):
+    """TrueType font at a pixel size, loaded once per size"""
+    for path in FONT_PATHS:
         try:
-            # Try to use a truetype font
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", self.font_size)
-        except:
-            try:
-                # Fallback to default font
-                font = ImageFont.load_default()
-            except:
-                font = None
-
-        text = self.watermark_text
-
-        # Get text dimensions
-        if font:
-            bbox = draw.textbbox((0, 0), text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-        else:
-            text_width = len(text) * 10
-            text_height = 20
-
-        # Create diagonal pattern
-        spacing = max(text_width, text_height) + 50
-        positions = []
-
-        # Calculate starting positions
-        start_x = -text_width
-        start_y = height
-
-        while start_x < width or start_y > -text_height:
-            positions.append((start_x, start_y))
-            start_x += spacing
-            start_y -= spacing
-
-        # Draw watermarks
-        for x, y in positions:
-            if font:
-                draw.text((x, y), text, fill=(255, 255, 255, int(255 * self.opacity)),
-                         font=font, stroke_width=2, stroke_fill=(0, 0, 0, int(255 * self.opacity)))
-            else:
-                draw.text((x, y), text, fill=(255, 255, 255, int(255 * self.opacity)))
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        # Pillow < 10.1: bitmap default font has a single size
+        return ImageFont.load_default()
 
-        # Rotate the entire watermark image
-        watermark = watermark.rotate(45, expand=1)
 
-        # Crop to original size
-        new_width, new_height = watermark.size
-        left = (new_width - width) // 2
-        top = (new_height - height) // 2
-        right = left + width
-        bottom = top + height
-        watermark = watermark.crop((left, top, right, bottom))
+def should_watermark_for(user):
+    """Whether media served to (or owned by) this user gets the watermark
 
-        return watermark
+    Anonymous visitors, trial users and users without an active
+    subscription see watermarked images.
+    """
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return True
+    return user.subscription_plan == "trial" or not user.is_subscribed()
 
-    def apply_watermark_to_image(self, image_path, output_path=None):
-        """Apply watermark to an image file"""
-        try:
-            # Open the image
-            img = Image.open(image_path)
 
-            # Convert to RGBA if necessary
-            if img.mode != 'RGBA':
-                img = img.convert('RGBA')
+class WatermarkOverlay:
+    """Class for handling watermark overlays on images
 
-            # Create watermark
-            watermark = self.create_text_watermark(img.size)
+    The diagonal text is rendered once per size bucket into a square tile
+    that repeats seamlessly. Compositing pastes that tile (converted to the
+    image's mode, with its alpha as mask) over the image on a grid, so only
+    the small per-bucket tiles are cached and no full-resolution overlay or
+    RGBA copy is ever built.
+    """
 
-            # Composite the watermark onto the image
-            watermarked = Image.alpha_composite(img, watermark)
+    def __init__(self, app_name="MediaScraper"):
+        self.app_name = app_name
+        self.watermark_text = f"Subscribe for Full Access - {app_name}"
+        self.font_size = 48
+        self.opacity = 0.3
+        self._tiles = {}
+        self._tile_parts = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Short hash of everything that affects the rendered output"""
+        config = f"{WATERMARK_ENGINE_VERSION}|{self.watermark_text}|{self.font_size}|{self.opacity}"
+        return hashlib.sha1(config.encode()).hexdigest()[:12]
+
+    def variant_key(self, content_hash, size="full", image_format="jpeg"):
+        """Cache key for a watermarked rendition of some content"""
+        key = f"{content_hash}_{size}_{self.version}"
+        return key if image_format == "jpeg" else f"{key}.{image_format}"
+
+    def get_cached_variant(self, content_hash, load_image_bytes, size="full", image_format="jpeg"):
+        """Path to the watermarked image for some content, rendered on a cache miss
+
+        Args:
+            content_hash: SHA-256 hex of the original bytes
+            load_image_bytes: Callable returning the original bytes (only
+                called on a miss)
+            size: Rendition label, part of the key
+            image_format: Output encoding ('jpeg', 'webp', 'avif'); each one
+                is rendered from the original, never from another rendition
+
+        Returns:
+            Path in watermark_cache, or None if the image can't be watermarked
+        """
+        key = self.variant_key(content_hash, size, image_format)
+        path = watermark_cache.get(key)
+        if path:
+            return path
+        original = load_image_bytes()
+        watermarked = self.apply_watermark_to_image_bytes(original, image_format)
+        if not watermarked or watermarked is original:
+            return None
+        return watermark_cache.put(key, watermarked)
+
+    # ------------------------------------------------------------------
+    # Overlay rendering
+    # ------------------------------------------------------------------
+    def _bucket(self, size):
+        longest = max(size)
+        for index, (max_side, _) in enumerate(SIZE_BUCKETS):
+            if max_side is None or longest <= max_side:
+                return index
+        return len(SIZE_BUCKETS) - 1
+
+    def _render_tile(self, bucket):
+        """Square RGBA tile holding one 45-degree label, meant to be repeated"""
+        scale = SIZE_BUCKETS[bucket][1]
+        font = _load_font(max(8, int(self.font_size * scale)))
+        stroke = max(1, int(2 * scale))
+        alpha = int(255 * self.opacity)
+
+        bbox = ImageDraw.Draw(Image.new('L', (1, 1))).textbbox(
+            (0, 0), self.watermark_text, font=font, stroke_width=stroke
+        )
+        text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+        label = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
+        ImageDraw.Draw(label).text(
+            (-bbox[0], -bbox[1]), self.watermark_text, font=font,
+            fill=(255, 255, 255, alpha), stroke_width=stroke, stroke_fill=(0, 0, 0, alpha)
+        )
+        label = label.rotate(45, expand=True, resample=Image.Resampling.BICUBIC)
+
+        # Period: neighbours along the text direction clear the text length,
+        # parallel rows clear its height; the label fits inside one period,
+        # so repeating the tile never cuts a label
+        period = max(int(text_width / math.sqrt(2) + text_height + 50 * scale), label.width, label.height)
+        tile = Image.new('RGBA', (period, period), (0, 0, 0, 0))
+        tile.paste(label, ((period - label.width) // 2, (period - label.height) // 2))
+        return tile
+
+    def _tile(self, bucket):
+        # Keyed by version too, so changing text/size/opacity re-renders
+        key = (bucket, self.version)
+        tile = self._tiles.get(key)
+        if tile is None:
+            tile = self._render_tile(bucket)
+            with self._lock:
+                self._tiles[key] = tile
+        return tile
+
+    def create_text_watermark(self, size):
+        """RGBA overlay of the given size: the bucket's tile repeated across it"""
+        tile = self._tile(self._bucket(size))
+        overlay = Image.new('RGBA', tuple(size), (0, 0, 0, 0))
+        for x in range(0, size[0], tile.width):
+            for y in range(0, size[1], tile.height):
+                overlay.paste(tile, (x, y))
+        return overlay
+
+    def _tile_source(self, bucket, mode):
+        """(tile in `mode`, tile alpha mask) for a size bucket"""
+        key = (bucket, mode, self.version)
+        parts = self._tile_parts.get(key)
+        if parts is None:
+            tile = self._tile(bucket)
+            parts = (tile.convert(mode), tile.getchannel('A'))
+            with self._lock:
+                self._tile_parts[key] = parts
+        return parts
+
+    def _composite(self, img):
+        """Watermark an RGB or L image in place; returns the image"""
+        source, mask = self._tile_source(self._bucket(img.size), img.mode)
+        # paste() with a mask blends source over img by the mask, in C, in img's
+        # mode; tiles past the right/bottom edge are clipped
+        for x in range(0, img.width, source.width):
+            for y in range(0, img.height, source.height):
+                img.paste(source, (x, y), mask)
+        return img
+
+    def _prepare(self, img):
+        img.load()
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        return img
 
-            # Convert back to RGB for saving as JPEG
-            if output_path and output_path.lower().endswith(('.jpg', '.jpeg')):
-                watermarked = watermarked.convert('RGB')
+    def apply_watermark_to_image(self, image_path, output_path=None):
+        """Apply watermark to an image file"""
+        try:
+            with Image.open(image_path) as img:
+                watermarked = self._composite(self._prepare(img))
+                if watermarked is img:
+                    watermarked = img.copy()
 
             # Save or return
             if output_path:
@@ -112,31 +215,22 @@ class WatermarkOverlay:
             print(f"Error applying watermark to image: {e}")
             return None
 
-    def apply_watermark_to_image_bytes(self, image_bytes):
-        """Apply watermark to image bytes and return watermarked bytes"""
+    def apply_watermark_to_image_bytes(self, image_bytes, image_format="jpeg"):
+        """Apply watermark to image bytes and return watermarked bytes (JPEG unless asked otherwise)"""
         try:
             # Open image from bytes
-            img = Image.open(BytesIO(image_bytes))
-
-            # Convert to RGBA if necessary
-            if img.mode != 'RGBA':
-                img = img.convert('RGBA')
-
-            # Create watermark
-            watermark = self.create_text_watermark(img.size)
-
-            # Composite the watermark onto the image
-            watermarked = Image.alpha_composite(img, watermark)
+            with Image.open(BytesIO(image_bytes)) as img:
+                watermarked = self._composite(self._prepare(img))
 
-            # Convert back to RGB
-            watermarked = watermarked.convert('RGB')
+                if image_format != "jpeg":
+                    from utils.thumbnail_generator import encode_image
 
-            # Save to bytes
-            output = BytesIO()
-            watermarked.save(output, format='JPEG', quality=90)
-            output.seek(0)
+                    return encode_image(watermarked, image_format)
 
-            return output.getvalue()
+                # Save to bytes
+                output = BytesIO()
+                watermarked.save(output, format='JPEG', quality=90)
+                return output.getvalue()
 
         except Exception as e:
             print(f"Error applying watermark to image bytes: {e}")